@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import struct
+from array import array
+
+from . import db
+
+logger = logging.getLogger(__name__)
+
+
+def pack_counts(counts) -> bytes:
+    """Variantlar hisoblagichlarini ixcham BLOB ga (little-endian uint32) o'giradi."""
+    return struct.pack(f"<{len(counts)}I", *counts)
+
+
+def unpack_counts(blob: bytes) -> list[int]:
+    return list(struct.unpack(f"<{len(blob) // 4}I", blob))
+
+
+class QuizStats:
+    """Bitta (quiz, group) uchun savollar statistikasi.
+
+    Barcha savollarning variant hisoblagichlari bitta tekis `array('I')` da
+    (savol i ning variantlari `offsets[i]:offsets[i + 1]` oralig'ida), javob
+    berganlar soni esa alohida massivda saqlanadi — har bir javob O(1).
+    """
+
+    __slots__ = ("questions", "offsets", "counts", "answerers")
+
+    def __init__(self, questions):
+        # [(savol matni, variantlar, to'g'ri javob), ...]
+        self.questions = [(q.question, tuple(q.options), q.correct_index) for q in questions]
+        self.offsets = array("I", [0])
+        for _, options, _ in self.questions:
+            self.offsets.append(self.offsets[-1] + len(options))
+        self.counts = array("I", bytes(4 * self.offsets[-1]))
+        self.answerers = array("I", bytes(4 * len(self.questions)))
+
+    def record(self, q_index: int, option_ids):
+        start, end = self.offsets[q_index], self.offsets[q_index + 1]
+        for option in option_ids:
+            if 0 <= option < end - start:
+                self.counts[start + option] += 1
+        self.answerers[q_index] += 1
+
+    def load(self, rows):
+        """DB dagi qatorlardan (restartdan keyin) hisoblagichlarni tiklaydi."""
+        for q_index, _, _, _, answerers, counts in rows:
+            if not 0 <= q_index < len(self.questions):
+                continue
+            start, end = self.offsets[q_index], self.offsets[q_index + 1]
+            values = unpack_counts(counts)
+            if len(values) == end - start:
+                self.counts[start:end] = array("I", values)
+                self.answerers[q_index] = answerers
+
+    def summary(self):
+        """[(q_index, savol, variantlar, to'g'ri javob, javob berganlar, [variant soni, ...]), ...]"""
+        return [
+            (i, text, options, correct, self.answerers[i],
+             self.counts[self.offsets[i]:self.offsets[i + 1]].tolist())
+            for i, (text, options, correct) in enumerate(self.questions)
+        ]
+
+
+class QuestionAnalytics:
+    """Faol viktorinalar savol statistikasi; DB ga har bir savol uchun bitta qator yoziladi.
+
+    Hisoblagichlar xotirada to'planadi va `flush_interval` soniyada faqat
+    o'zgargan viktorinalar qayta yoziladi (INSERT OR REPLACE).
+    """
+
+    def __init__(self, flush_interval: float = 5.0):
+        self.flush_interval = flush_interval
+        # {(quiz_id, group_id): QuizStats}
+        self._stats = {}
+        self._dirty = set()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def __contains__(self, key):
+        return key in self._stats
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def open(self, quiz, rows=()):
+        key = (quiz.quiz_id, quiz.group_id)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = QuizStats(quiz.questions)
+            if rows:
+                stats.load(rows)
+        return stats
+
+    def record(self, quiz_id: int, group_id: int, q_index: int, option_ids):
+        stats = self._stats.get((quiz_id, group_id))
+        if stats is not None:
+            stats.record(q_index, option_ids)
+            self._dirty.add((quiz_id, group_id))
+
+    async def drop(self, quiz_id: int, group_id: int):
+        """Viktorina tugaganda: oxirgi holatni yozib, xotiradan o'chiradi."""
+        await self.flush([(quiz_id, group_id)])
+        self._stats.pop((quiz_id, group_id), None)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception("QuestionAnalytics flush xato: %s", e)
+
+    async def flush(self, keys=None):
+        async with self._lock:
+            keys = self._dirty if keys is None else self._dirty.intersection(keys)
+            if not keys:
+                return
+            keys = list(keys)
+            self._dirty.difference_update(keys)
+            rows = []
+            for quiz_id, group_id in keys:
+                stats = self._stats.get((quiz_id, group_id))
+                if stats is None:
+                    continue
+                for i, text, options, correct, answerers, counts in stats.summary():
+                    rows.append((quiz_id, group_id, i, text, options, correct, answerers, pack_counts(counts)))
+            try:
+                await db.save_question_stats(rows)
+            except Exception as e:
+                logger.error("Savol statistikasi saqlanmadi (%s qator): %s", len(rows), e)
+                self._dirty.update(keys)
+
+    async def get(self, quiz_id: int, group_id: int):
+        """Xotirada bo'lsa darhol, aks holda DB dan — QuizStats.summary() formatida."""
+        stats = self._stats.get((quiz_id, group_id))
+        if stats is not None:
+            return stats.summary()
+        return [
+            (i, text, tuple(options), correct, answerers, unpack_counts(counts))
+            for i, text, options, correct, answerers, counts in await db.get_question_stats(quiz_id, group_id)
+        ]
@@ -1,189 +1,823 @@
-import sqlite3
+import asyncio
+import hashlib
+import json
+import logging
 import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import migrations
+from .metrics import metrics, DB_SECONDS, DB_ERRORS
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = os.getenv("DB_FILE", "cyberquiz.db")
+
+READ_POOL_SIZE = 4          # o'qish uchun ulanishlar soni
+BUSY_TIMEOUT_MS = 5000      # SQLite ichki kutish vaqti
+LOCK_RETRIES = 5            # "database is locked" bo'lsa necha marta qayta urinish
+LOCK_BACKOFF = 0.05         # birinchi kutish (soniya), har safar 2 baravar oshadi
+CACHED_STATEMENTS = 256     # har bir ulanishdagi tayyor (prepared) so'rovlar keshi
+
+# Har bir ishchi oqim o'z ulanishini saqlaydi
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
 
-DB_FILE = "cyberquiz.db"
-
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-
-    # user_groups jadvali
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_groups (
-            user_id INTEGER NOT NULL,
-            group_id INTEGER NOT NULL,
-            group_title TEXT,
-            PRIMARY KEY (user_id, group_id)
-        )
-    """)
-
-    # quiz_results jadvali
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS quiz_results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            quiz_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            group_id INTEGER NOT NULL,
-            correct_answers INTEGER DEFAULT 0,
-            total_answers INTEGER DEFAULT 0,
-            CONSTRAINT unique_quiz_user_group UNIQUE (quiz_id, user_id, group_id)
-        )
-    """)
-
-    # quizzes jadvali
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS quizzes (
-            quiz_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT,
-            group_id INTEGER NOT NULL,
-            start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    conn.commit()
-    conn.close()
-    print("DB initialized successfully!")
+# init_db da aniqlanadi (questions_fts mavjudmi)
+FTS_ENABLED = True
+
+# Yozish — bitta alohida oqimda, o'qish — kichik pulda
+_writer = None
+_readers = None
 
 
 # --------------------------
-# Guruhlar bilan ishlash
+# Ulanishlar va ishchi oqimlar
 # --------------------------
 
-def save_group(user_id: int, group_id: int, group_title: str = None):
-    """Foydalanuvchiga tegishli guruhni saqlaydi."""
+def _connect(readonly: bool = False) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DB_FILE,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=CACHED_STATEMENTS,
+    )
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    else:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    with _connections_lock:
+        _connections.append(conn)
+    return conn
+
+
+def _init_writer_thread():
+    _local.conn = _connect()
+
+
+def _init_reader_thread():
+    _local.conn = _connect(readonly=True)
+
+
+def _start():
+    global _writer, _readers
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer",
+                                     initializer=_init_writer_thread)
+    if _readers is None:
+        _readers = ThreadPoolExecutor(max_workers=READ_POOL_SIZE, thread_name_prefix="db-reader",
+                                      initializer=_init_reader_thread)
+
+
+def _is_locked(e: sqlite3.OperationalError) -> bool:
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+
+def _call(fn, *args):
+    """fn(conn, *args) ni oqimning ulanishida bajaradi, band bo'lsa qayta urinadi."""
+    conn = _local.conn
+    delay = LOCK_BACKOFF
+    for attempt in range(1, LOCK_RETRIES + 1):
+        try:
+            return fn(conn, *args)
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if not _is_locked(e) or attempt == LOCK_RETRIES:
+                raise
+            logger.warning("DB.%s band (%s), %.2fs dan keyin qayta urinamiz", fn.__name__, e, delay)
+            time.sleep(delay)
+            delay *= 2
+
+
+async def _submit(pool, fn, args):
+    # Vaqt navbatda kutish bilan birga o'lchanadi — handler aynan shuncha kutadi
+    name = fn.__name__.lstrip("_")
+    started = time.perf_counter()
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT OR REPLACE INTO user_groups (user_id, group_id, group_title)
-            VALUES (?, ?, ?)
-        """, (user_id, group_id, group_title))
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"DB.save_group xato: {e}")
+        return await asyncio.get_running_loop().run_in_executor(pool, _call, fn, *args)
+    except Exception:
+        metrics.inc(DB_ERRORS, name)
+        raise
     finally:
-        conn.close()
+        metrics.observe(DB_SECONDS, name, time.perf_counter() - started)
+
+
+async def _write(fn, *args):
+    _start()
+    return await _submit(_writer, fn, args)
+
+
+async def _read(fn, *args):
+    _start()
+    return await _submit(_readers, fn, args)
+
+
+async def close_db():
+    """Ishchi oqimlarni to'xtatib, barcha ulanishlarni yopadi."""
+    global _writer, _readers
+    for pool in (_writer, _readers):
+        if pool is not None:
+            await asyncio.to_thread(pool.shutdown, wait=True)
+    _writer = _readers = None
+    with _connections_lock:
+        while _connections:
+            _connections.pop().close()
 
 
-def get_groups(user_id: int):
+# --------------------------
+# Sxema
+# --------------------------
+
+def _init_db(conn):
+    """Sxemani oxirgi versiyagacha yangilaydi (app/migrations.py)."""
+    global FTS_ENABLED
+    migrations.migrate(conn)
+    FTS_ENABLED = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'questions_fts'"
+    ).fetchone() is not None
+    if not FTS_ENABLED:
+        logger.warning("FTS5 indeksi yo'q, savollar LIKE bilan qidiriladi")
+
+
+async def init_db():
+    await _write(_init_db)
+    logger.info("DB initialized successfully!")
+
+
+# --------------------------
+# Guruhlar bilan ishlash
+# --------------------------
+
+SQL_SAVE_GROUP = """
+    INSERT OR REPLACE INTO user_groups (user_id, group_id, group_title)
+    VALUES (?, ?, ?)
+"""
+SQL_GET_GROUPS = "SELECT group_id, group_title FROM user_groups WHERE user_id = ?"
+SQL_GET_GROUP = """
+    SELECT group_id, group_title
+    FROM user_groups
+    WHERE user_id = ?
+    ORDER BY rowid DESC LIMIT 1
+"""
+SQL_REMOVE_GROUP = "DELETE FROM user_groups WHERE group_id = ?"
+SQL_GET_ALL_GROUPS = "SELECT user_id, group_id, group_title FROM user_groups ORDER BY rowid"
+SQL_SET_GROUP_TITLE = "UPDATE user_groups SET group_title = ? WHERE group_id = ?"
+# Mavjud bog'lanish (va uning nomi) o'zgarmaydi
+SQL_ADD_GROUP = "INSERT OR IGNORE INTO user_groups (user_id, group_id) VALUES (?, ?)"
+
+
+def _save_group(conn, user_id, group_id, group_title):
+    with conn:
+        conn.execute(SQL_SAVE_GROUP, (user_id, group_id, group_title))
+
+
+async def save_group(user_id: int, group_id: int, group_title: str = None):
+    """Foydalanuvchiga tegishli guruhni saqlaydi."""
+    await _write(_save_group, user_id, group_id, group_title)
+
+
+def _get_groups(conn, user_id):
+    return conn.execute(SQL_GET_GROUPS, (user_id,)).fetchall()
+
+
+async def get_groups(user_id: int):
     """Foydalanuvchiga tegishli barcha guruhlarni (id + title) qaytaradi."""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cur = conn.cursor()
-        cur.execute("SELECT group_id, group_title FROM user_groups WHERE user_id = ?", (user_id,))
-        rows = cur.fetchall()
-        return rows if rows else []
-    except sqlite3.Error as e:
-        print(f"DB.get_groups xato: {e}")
-        return []
-    finally:
-        conn.close()
+    return await _read(_get_groups, user_id)
+
+
+def _add_groups(conn, rows):
+    with conn:
+        return conn.executemany(SQL_ADD_GROUP, rows).rowcount
+
+
+async def add_groups(rows) -> int:
+    """rows: (user_id, group_id) lar; yangi qo'shilganlar sonini qaytaradi."""
+    rows = list(rows)
+    if not rows:
+        return 0
+    return await _write(_add_groups, rows)
+
 
+def _get_group(conn, user_id):
+    return conn.execute(SQL_GET_GROUP, (user_id,)).fetchone()
 
-def get_group(user_id: int):
+
+async def get_group(user_id: int):
     """Eski moslik uchun — faqat oxirgi qo‘shilgan guruhni qaytaradi."""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT group_id, group_title 
-            FROM user_groups 
-            WHERE user_id = ? 
-            ORDER BY rowid DESC LIMIT 1
-        """, (user_id,))
-        row = cur.fetchone()
-        return row if row else None
-    except sqlite3.Error as e:
-        print(f"DB.get_group xato: {e}")
-        return None
-    finally:
-        conn.close()
+    return await _read(_get_group, user_id)
 
 
-def remove_group(group_id: int):
+def _remove_group(conn, group_id):
+    with conn:
+        conn.execute(SQL_REMOVE_GROUP, (group_id,))
+
+
+async def remove_group(group_id: int):
     """Guruhni bazadan o‘chirish."""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cur = conn.cursor()
-        cur.execute("DELETE FROM user_groups WHERE group_id = ?", (group_id,))
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"DB.remove_group xato: {e}")
-    finally:
-        conn.close()
+    await _write(_remove_group, group_id)
+
+
+def _get_all_groups(conn):
+    return conn.execute(SQL_GET_ALL_GROUPS).fetchall()
+
+
+async def get_all_groups():
+    """Barcha (user_id, group_id, group_title) yozuvlarini qo'shilish tartibida qaytaradi."""
+    return await _read(_get_all_groups)
+
+
+def _set_group_title(conn, group_id, group_title):
+    with conn:
+        conn.execute(SQL_SET_GROUP_TITLE, (group_title, group_id))
+
+
+async def set_group_title(group_id: int, group_title: str):
+    """Guruh nomini barcha foydalanuvchilar uchun yangilaydi."""
+    await _write(_set_group_title, group_id, group_title)
 
 
 # --------------------------
 # Natijalar bilan ishlash
 # --------------------------
 
-def add_result(quiz_id: int, user_id: int, group_id: int, is_correct: bool):
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cur = conn.cursor()
-
-        # Avval foydalanuvchi uchun yozuv yo‘q bo‘lsa, qo‘shib qo‘yamiz
-        cur.execute("""
-            INSERT OR IGNORE INTO quiz_results 
-            (quiz_id, user_id, group_id, correct_answers, total_answers)
-            VALUES (?, ?, ?, 0, 0)
-        """, (quiz_id, user_id, group_id))
-
-        # Har bir javobda total +1, agar to‘g‘ri bo‘lsa correct +1
-        cur.execute("""
-            UPDATE quiz_results
-            SET correct_answers = correct_answers + ?,
-                total_answers   = total_answers + 1
-            WHERE quiz_id = ? AND user_id = ? AND group_id = ?
-        """, (1 if is_correct else 0, quiz_id, user_id, group_id))
-
-        conn.commit()
-        return True
-
-    except sqlite3.Error as e:
-        print(f"DB.add_result xato: {e}")
-        return False
+SQL_UPSERT_RESULT = """
+    INSERT INTO quiz_results
+    (quiz_id, user_id, group_id, correct_answers, total_answers)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (quiz_id, user_id, group_id) DO UPDATE SET
+        correct_answers = correct_answers + excluded.correct_answers,
+        total_answers   = total_answers + excluded.total_answers
+    RETURNING total_answers
+"""
+SQL_UPSERT_STATS = """
+    INSERT INTO user_group_stats
+    (user_id, group_id, correct_answers, total_answers, quizzes_played)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, group_id) DO UPDATE SET
+        correct_answers = correct_answers + excluded.correct_answers,
+        total_answers   = total_answers + excluded.total_answers,
+        quizzes_played  = quizzes_played + excluded.quizzes_played
+"""
+SQL_GET_USER_STATS = """
+    SELECT group_id, correct_answers, total_answers, quizzes_played
+    FROM user_group_stats
+    WHERE user_id = ?
+"""
+SQL_GET_GROUP_STATS = """
+    SELECT user_id, correct_answers, total_answers, quizzes_played
+    FROM user_group_stats
+    WHERE group_id = ?
+    ORDER BY correct_answers DESC, total_answers ASC
+    LIMIT ? OFFSET ?
+"""
+SQL_GET_LEADERBOARD = """
+    SELECT user_id, correct_answers, total_answers
+    FROM quiz_results
+    WHERE quiz_id = ? AND group_id = ?
+    ORDER BY correct_answers DESC, total_answers ASC
+    LIMIT ?
+"""
+SQL_GET_RANK = """
+    SELECT COUNT(*)
+    FROM quiz_results
+    WHERE quiz_id = ? AND group_id = ?
+      AND (correct_answers > ? OR (correct_answers = ? AND total_answers < ?))
+"""
+# Bir nechta guruhga yuborilgan viktorina: guruhlar bo'yicha va umumiy natijalar
+SQL_GET_QUIZ_GROUPS = """
+    SELECT group_id, COUNT(*), SUM(correct_answers), SUM(total_answers)
+    FROM quiz_results
+    WHERE quiz_id = ?
+    GROUP BY group_id
+"""
+SQL_GET_COMBINED_LEADERBOARD = """
+    SELECT user_id, SUM(correct_answers) AS correct, SUM(total_answers) AS total
+    FROM quiz_results
+    WHERE quiz_id = ?
+    GROUP BY user_id
+    ORDER BY correct DESC, total ASC
+    LIMIT ? OFFSET ?
+"""
 
-    finally:
-        conn.close()
 
+def _add_results(conn, rows):
+    # {(user_id, group_id): [correct, total, quizzes_played]}
+    stats = {}
+    with conn:
+        for quiz_id, user_id, group_id, correct, total in rows:
+            row_total = conn.execute(SQL_UPSERT_RESULT, (quiz_id, user_id, group_id, correct, total)).fetchone()[0]
+            s = stats.setdefault((user_id, group_id), [0, 0, 0])
+            s[0] += correct
+            s[1] += total
+            # Yozuv hozir yaratilgan bo'lsa — bu foydalanuvchi uchun yangi viktorina
+            if row_total == total:
+                s[2] += 1
+        conn.executemany(SQL_UPSERT_STATS, [
+            (user_id, group_id, c, t, played) for (user_id, group_id), (c, t, played) in stats.items()
+        ])
 
-def get_leaderboard(quiz_id: int, group_id: int, limit: int = 10):
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT user_id, correct_answers, total_answers
-            FROM quiz_results
-            WHERE quiz_id = ? AND group_id = ?
-            ORDER BY correct_answers DESC, total_answers ASC
-            LIMIT ?
-        """, (quiz_id, group_id, limit))
-        rows = cur.fetchall()
-        return rows
-    except sqlite3.Error as e:
-        print(f"DB.get_leaderboard xato: {e}")
+
+async def add_result(quiz_id: int, user_id: int, group_id: int, is_correct: bool):
+    # Har bir javobda total +1, agar to‘g‘ri bo‘lsa correct +1
+    await _write(_add_results, [(quiz_id, user_id, group_id, 1 if is_correct else 0, 1)])
+
+
+async def add_results(rows):
+    """Bir nechta javoblarni bitta tranzaksiyada yozadi.
+
+    rows: (quiz_id, user_id, group_id, correct_delta, total_delta) lar ro'yxati.
+    """
+    await _write(_add_results, list(rows))
+
+
+def _get_results(conn, quiz_id, group_id, user_ids):
+    placeholders = ",".join("?" * len(user_ids))
+    return conn.execute(f"""
+        SELECT user_id, correct_answers, total_answers
+        FROM quiz_results
+        WHERE quiz_id = ? AND group_id = ? AND user_id IN ({placeholders})
+    """, (quiz_id, group_id, *user_ids)).fetchall()
+
+
+async def get_results(quiz_id: int, group_id: int, user_ids):
+    """Berilgan foydalanuvchilarning shu viktorinadagi natijalarini qaytaradi."""
+    user_ids = list(user_ids)
+    if not user_ids:
         return []
-    finally:
-        conn.close()
+    return await _read(_get_results, quiz_id, group_id, user_ids)
+
+
+def _get_leaderboard(conn, quiz_id, group_id, limit):
+    return conn.execute(SQL_GET_LEADERBOARD, (quiz_id, group_id, limit)).fetchall()
+
+
+async def get_leaderboard(quiz_id: int, group_id: int, limit: int = 10):
+    return await _read(_get_leaderboard, quiz_id, group_id, limit)
+
+
+def _get_rank(conn, quiz_id, group_id, user_id):
+    row = _get_results(conn, quiz_id, group_id, [user_id])
+    if not row:
+        return None
+    _, correct, total = row[0]
+    better = conn.execute(SQL_GET_RANK, (quiz_id, group_id, correct, correct, total)).fetchone()[0]
+    return better + 1, correct, total
+
+
+async def get_rank(quiz_id: int, group_id: int, user_id: int):
+    """Foydalanuvchining (o'rni, correct, total) ni qaytaradi yoki None."""
+    return await _read(_get_rank, quiz_id, group_id, user_id)
+
+
+def _get_quiz_groups(conn, quiz_id):
+    return conn.execute(SQL_GET_QUIZ_GROUPS, (quiz_id,)).fetchall()
+
+
+async def get_quiz_groups(quiz_id: int):
+    """[(group_id, qatnashchilar, correct, total), ...] — viktorina yuborilgan har bir guruh bo'yicha."""
+    return await _read(_get_quiz_groups, quiz_id)
+
+
+def _get_combined_leaderboard(conn, quiz_id, limit, offset):
+    return conn.execute(SQL_GET_COMBINED_LEADERBOARD, (quiz_id, limit, offset)).fetchall()
+
+
+async def get_combined_leaderboard(quiz_id: int, limit: int = 10, offset: int = 0):
+    """Barcha guruhlar bo'yicha umumiy reyting: [(user_id, correct, total), ...]."""
+    return await _read(_get_combined_leaderboard, quiz_id, limit, offset)
+
+
+def _get_user_stats(conn, user_id):
+    return conn.execute(SQL_GET_USER_STATS, (user_id,)).fetchall()
+
+
+async def get_user_stats(user_id: int):
+    """Foydalanuvchining har bir guruhdagi umumiy natijalari:
+    [(group_id, correct, total, quizzes_played), ...]"""
+    return await _read(_get_user_stats, user_id)
+
+
+def _get_group_stats(conn, group_id, limit, offset):
+    return conn.execute(SQL_GET_GROUP_STATS, (group_id, limit, offset)).fetchall()
+
+
+async def get_group_stats(group_id: int, limit: int = 10, offset: int = 0):
+    """Guruhning umumiy (barcha viktorinalar) reytingi:
+    [(user_id, correct, total, quizzes_played), ...]"""
+    return await _read(_get_group_stats, group_id, limit, offset)
 
 
 # --------------------------
-# Migration
+# Viktorinalar tarixi
 # --------------------------
 
-def migrate_db():
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    try:
-        cur.execute("ALTER TABLE user_groups ADD COLUMN group_title TEXT")
-        conn.commit()
-        print("Migration: group_title ustuni qo'shildi ✅")
-    except sqlite3.OperationalError as e:
-        print("Migration xato yoki allaqachon mavjud:", e)
-    finally:
-        conn.close()
+SQL_CREATE_QUIZ = "INSERT INTO quizzes (owner_id, group_id, size) VALUES (?, ?, ?) RETURNING quiz_id"
+SQL_START_RUN = """
+    INSERT OR IGNORE INTO quiz_runs (quiz_id, group_id, questions, started_at)
+    VALUES (?, ?, ?, ?)
+"""
+# Yakuniy reyting bir marta yoziladi — keyingi chaqiruvlar uni o'zgartirmaydi
+SQL_END_RUN = """
+    INSERT INTO quiz_runs (quiz_id, group_id, ended_at, participants, leaderboard)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (quiz_id, group_id) DO UPDATE SET
+        ended_at = excluded.ended_at,
+        participants = excluded.participants,
+        leaderboard = excluded.leaderboard
+    WHERE ended_at IS NULL
+"""
+SQL_COUNT_PLAYERS = "SELECT COUNT(*) FROM quiz_results WHERE quiz_id = ? AND group_id = ?"
+SQL_GET_RUN = """
+    SELECT r.quiz_id, r.group_id, q.owner_id, r.questions, r.started_at, r.ended_at,
+           r.participants, r.leaderboard
+    FROM quiz_runs r
+    LEFT JOIN quizzes q ON q.quiz_id = r.quiz_id
+    WHERE r.quiz_id = ? AND r.group_id = ?
+"""
+SQL_GET_QUIZ_RUNS = """
+    SELECT r.quiz_id, r.group_id, q.owner_id, r.questions, r.started_at, r.ended_at,
+           r.participants, r.leaderboard
+    FROM quiz_runs r
+    LEFT JOIN quizzes q ON q.quiz_id = r.quiz_id
+    WHERE r.quiz_id = ?
+"""
+HISTORY_MAX_ID = 2 ** 63 - 1  # birinchi sahifa uchun kursor
+# Keyset (kursor) sahifalash: OFFSET yo'q, sahifa indeksdagi kursor joyidan o'qiladi —
+# N-sahifa ham 1-sahifa kabi arzon. before — eskiroqlar (kamayish), after — yangiroqlar.
+SQL_GROUP_HISTORY_BEFORE = """
+    SELECT quiz_id, questions, started_at, ended_at, participants
+    FROM quiz_runs
+    WHERE group_id = ? AND quiz_id < ?
+    ORDER BY quiz_id DESC
+    LIMIT ?
+"""
+SQL_GROUP_HISTORY_AFTER = """
+    SELECT quiz_id, questions, started_at, ended_at, participants
+    FROM quiz_runs
+    WHERE group_id = ? AND quiz_id > ?
+    ORDER BY quiz_id ASC
+    LIMIT ?
+"""
+# Egasining viktorinalari: faqat guruhga yuborilganlari (bekor qilingan qoralamalarsiz)
+SQL_OWNER_HISTORY_BEFORE = """
+    SELECT q.quiz_id, q.size, q.start_time,
+           (SELECT COUNT(*) FROM quiz_runs r WHERE r.quiz_id = q.quiz_id),
+           (SELECT SUM(participants) FROM quiz_runs r WHERE r.quiz_id = q.quiz_id)
+    FROM quizzes q
+    WHERE q.owner_id = ? AND q.quiz_id < ?
+      AND EXISTS (SELECT 1 FROM quiz_runs r WHERE r.quiz_id = q.quiz_id)
+    ORDER BY q.quiz_id DESC
+    LIMIT ?
+"""
+SQL_OWNER_HISTORY_AFTER = """
+    SELECT q.quiz_id, q.size, q.start_time,
+           (SELECT COUNT(*) FROM quiz_runs r WHERE r.quiz_id = q.quiz_id),
+           (SELECT SUM(participants) FROM quiz_runs r WHERE r.quiz_id = q.quiz_id)
+    FROM quizzes q
+    WHERE q.owner_id = ? AND q.quiz_id > ?
+      AND EXISTS (SELECT 1 FROM quiz_runs r WHERE r.quiz_id = q.quiz_id)
+    ORDER BY q.quiz_id ASC
+    LIMIT ?
+"""
+
+
+def _create_quiz(conn, owner_id, group_id, size):
+    with conn:
+        return conn.execute(SQL_CREATE_QUIZ, (owner_id, group_id, size)).fetchone()[0]
+
+
+async def create_quiz(owner_id: int, group_id: int, size: int) -> int:
+    """Yangi viktorinani `quizzes` ga yozadi va uning (takrorlanmas) quiz_id sini qaytaradi."""
+    return await _write(_create_quiz, owner_id, group_id, size)
+
+
+def _start_run(conn, quiz_id, group_id, questions, started_at):
+    with conn:
+        conn.execute(SQL_START_RUN, (quiz_id, group_id, questions, started_at))
+
+
+async def start_run(quiz_id: int, group_id: int, questions: int):
+    """Viktorina guruhga yuborilganini qayd etadi."""
+    await _write(_start_run, quiz_id, group_id, questions, time.time())
+
+
+def _end_run(conn, quiz_id, group_id, ended_at, participants, leaderboard):
+    with conn:
+        conn.execute(SQL_END_RUN, (quiz_id, group_id, ended_at, participants, leaderboard))
+
+
+async def end_run(quiz_id: int, group_id: int, participants: int, leaderboard):
+    """Yakuniy reytingni muzlatib saqlaydi. leaderboard: [(user_id, ism, correct, total), ...]"""
+    await _write(_end_run, quiz_id, group_id, time.time(), participants,
+                 json.dumps([list(row) for row in leaderboard], ensure_ascii=False))
+
+
+def _count_players(conn, quiz_id, group_id):
+    return conn.execute(SQL_COUNT_PLAYERS, (quiz_id, group_id)).fetchone()[0]
+
+
+async def count_players(quiz_id: int, group_id: int) -> int:
+    return await _read(_count_players, quiz_id, group_id)
+
+
+def _decode_run(row):
+    *head, leaderboard = row
+    return (*head, json.loads(leaderboard) if leaderboard else [])
+
+
+def _get_run(conn, quiz_id, group_id):
+    row = conn.execute(SQL_GET_RUN, (quiz_id, group_id)).fetchone()
+    return _decode_run(row) if row else None
+
+
+async def get_run(quiz_id: int, group_id: int):
+    """(quiz_id, group_id, owner_id, questions, started_at, ended_at, participants, leaderboard) yoki None."""
+    return await _read(_get_run, quiz_id, group_id)
+
+
+def _get_quiz_runs(conn, quiz_id):
+    return [_decode_run(row) for row in conn.execute(SQL_GET_QUIZ_RUNS, (quiz_id,))]
+
+
+async def get_quiz_runs(quiz_id: int):
+    """Viktorinaning barcha guruhlardagi o'tkazilishlari (get_run formatida)."""
+    return await _read(_get_quiz_runs, quiz_id)
+
+
+def _history_page(conn, sql_before, sql_after, key, before, after, limit):
+    """Bir sahifa + bor-yo'qligi: (qatorlar, eskiroqlari bormi, yangiroqlari bormi).
+
+    Qatorlar har doim yangidan eskiga tartiblangan; limit + 1 ta o'qib,
+    so'rov yo'nalishida yana sahifa borligi aniqlanadi.
+    """
+    if after is not None:
+        rows = conn.execute(sql_after, (key, after, limit + 1)).fetchall()
+        newer = len(rows) > limit
+        return rows[:limit][::-1], True, newer
+    rows = conn.execute(sql_before, (key, before if before is not None else HISTORY_MAX_ID, limit + 1)).fetchall()
+    return rows[:limit], len(rows) > limit, before is not None
+
+
+async def get_group_history(group_id: int, before: int = None, after: int = None, limit: int = 10):
+    """Guruh tarixi sahifasi: ([(quiz_id, questions, started_at, ended_at, participants), ...], older, newer)."""
+    return await _read(_history_page, SQL_GROUP_HISTORY_BEFORE, SQL_GROUP_HISTORY_AFTER,
+                       group_id, before, after, limit)
+
+
+async def get_owner_history(owner_id: int, before: int = None, after: int = None, limit: int = 10):
+    """Egasining viktorinalari sahifasi: ([(quiz_id, size, start_time, guruhlar, qatnashchilar), ...], older, newer)."""
+    return await _read(_history_page, SQL_OWNER_HISTORY_BEFORE, SQL_OWNER_HISTORY_AFTER,
+                       owner_id, before, after, limit)
+
+
+# --------------------------
+# Savollar banki
+# --------------------------
+
+SQL_SAVE_QUESTION = """
+    INSERT OR IGNORE INTO questions (content_hash, question, options, correct_index, author_id)
+    VALUES (?, ?, ?, ?, ?)
+"""
+SQL_GET_QUESTION = "SELECT id, question, options, correct_index FROM questions WHERE id = ?"
+# bm25 faqat eng yangi SEARCH_CANDIDATES ta moslik uchun hisoblanadi —
+# juda umumiy so'zlarda ham qidiruv bank hajmiga bog'liq bo'lmaydi
+SEARCH_CANDIDATES = 500
+SQL_SEARCH_QUESTIONS_FTS = """
+    SELECT q.id, q.question, q.options, q.correct_index
+    FROM (
+        SELECT rowid AS id, bm25(questions_fts) AS score
+        FROM questions_fts
+        WHERE questions_fts MATCH ?
+        ORDER BY rowid DESC
+        LIMIT ?
+    ) f
+    JOIN questions q ON q.id = f.id
+    ORDER BY f.score
+    LIMIT ?
+"""
+SQL_SEARCH_QUESTIONS_LIKE = """
+    SELECT id, question, options, correct_index
+    FROM questions
+    WHERE question LIKE ? ESCAPE '\\'
+    ORDER BY id DESC
+    LIMIT ?
+"""
+
+
+def question_hash(question: str, options) -> bytes:
+    """Savol + variantlar bo'yicha kontent xeshi (katta-kichik harf va bo'shliqlarga befarq)."""
+    norm = "\x1f".join(" ".join(part.split()).casefold() for part in (question, *options))
+    return hashlib.sha256(norm.encode("utf-8")).digest()[:16]
+
+
+def _save_questions(conn, rows):
+    with conn:
+        conn.executemany(SQL_SAVE_QUESTION, rows)
+
+
+async def save_questions(items):
+    """items: (question, options, correct_index, author_id) lar; takrorlari e'tiborsiz qoldiriladi."""
+    rows = [
+        (question_hash(question, options), question, json.dumps(list(options), ensure_ascii=False),
+         correct_index, author_id)
+        for question, options, correct_index, author_id in items
+    ]
+    if rows:
+        await _write(_save_questions, rows)
+
+
+def _decode_question(row):
+    qid, question, options, correct_index = row
+    return qid, question, json.loads(options), correct_index
+
+
+def _get_question(conn, qid):
+    row = conn.execute(SQL_GET_QUESTION, (qid,)).fetchone()
+    return _decode_question(row) if row else None
+
+
+async def get_question(qid: int):
+    """(id, question, options, correct_index) yoki None."""
+    return await _read(_get_question, qid)
+
+
+def _fts_query(text: str) -> str:
+    # Har bir so'z prefiks sifatida qidiriladi: "sql"* "inj"*
+    return " ".join(f'"{token}"*' for token in re.findall(r"\w+", text))
+
+
+def _search_questions(conn, text, limit):
+    if FTS_ENABLED:
+        query = _fts_query(text)
+        if not query:
+            return []
+        rows = conn.execute(SQL_SEARCH_QUESTIONS_FTS, (query, SEARCH_CANDIDATES, limit)).fetchall()
+    else:
+        pattern = "%" + re.sub(r"([%_\\])", r"\\\1", text.strip()) + "%"
+        rows = conn.execute(SQL_SEARCH_QUESTIONS_LIKE, (pattern, limit)).fetchall()
+    return [_decode_question(row) for row in rows]
+
+
+async def search_questions(text: str, limit: int = 10):
+    """Savollar bankidan qidiradi: [(id, question, options, correct_index), ...]"""
+    return await _read(_search_questions, text, limit)
+
+
+# --------------------------
+# Savollar statistikasi
+# --------------------------
+
+SQL_SAVE_QUESTION_STATS = """
+    INSERT OR REPLACE INTO question_stats
+        (quiz_id, group_id, q_index, question, options, correct_index, answerers, counts)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SQL_GET_QUESTION_STATS = """
+    SELECT q_index, question, options, correct_index, answerers, counts
+    FROM question_stats
+    WHERE quiz_id = ? AND group_id = ?
+    ORDER BY q_index
+"""
+SQL_GET_LAST_STATS_QUIZ = "SELECT MAX(quiz_id) FROM question_stats WHERE group_id = ?"
+
+
+def _save_question_stats(conn, rows):
+    with conn:
+        conn.executemany(SQL_SAVE_QUESTION_STATS, rows)
+
+
+async def save_question_stats(rows):
+    """rows: (quiz_id, group_id, q_index, savol, variantlar, to'g'ri javob, javob berganlar, counts_blob)."""
+    rows = [
+        (quiz_id, group_id, i, q, json.dumps(list(options), ensure_ascii=False), correct, answerers, counts)
+        for quiz_id, group_id, i, q, options, correct, answerers, counts in rows
+    ]
+    if rows:
+        await _write(_save_question_stats, rows)
+
+
+def _get_question_stats(conn, quiz_id, group_id):
+    return [
+        (i, q, json.loads(options), correct, answerers, counts)
+        for i, q, options, correct, answerers, counts
+        in conn.execute(SQL_GET_QUESTION_STATS, (quiz_id, group_id))
+    ]
+
+
+async def get_question_stats(quiz_id: int, group_id: int):
+    """[(q_index, savol, variantlar, to'g'ri javob, javob berganlar, counts_blob), ...]"""
+    return await _read(_get_question_stats, quiz_id, group_id)
+
+
+def _get_last_stats_quiz(conn, group_id):
+    return conn.execute(SQL_GET_LAST_STATS_QUIZ, (group_id,)).fetchone()[0]
+
+
+async def get_last_stats_quiz(group_id: int):
+    """Guruhdagi statistikasi bor eng oxirgi viktorina id si (yoki None)."""
+    return await _read(_get_last_stats_quiz, group_id)
+
+
+# --------------------------
+# Vaqtli viktorina taymerlari
+# --------------------------
+
+SQL_SAVE_TIMER = "INSERT OR REPLACE INTO quiz_timers (group_id, quiz_id, deadline) VALUES (?, ?, ?)"
+# quiz_id ham tekshiriladi: eski viktorina taymeri guruhdagi yangi viktorinaning qatorini o'chirmasin
+SQL_DELETE_TIMER = "DELETE FROM quiz_timers WHERE group_id = ? AND quiz_id = ?"
+SQL_GET_TIMERS = "SELECT group_id, quiz_id, deadline FROM quiz_timers"
+
+
+def _save_timer(conn, group_id, quiz_id, deadline):
+    with conn:
+        conn.execute(SQL_SAVE_TIMER, (group_id, quiz_id, deadline))
+
+
+async def save_timer(group_id: int, quiz_id: int, deadline: float):
+    await _write(_save_timer, group_id, quiz_id, deadline)
+
+
+def _delete_timer(conn, group_id, quiz_id):
+    with conn:
+        conn.execute(SQL_DELETE_TIMER, (group_id, quiz_id))
+
+
+async def delete_timer(group_id: int, quiz_id: int):
+    await _write(_delete_timer, group_id, quiz_id)
+
+
+def _get_timers(conn):
+    return conn.execute(SQL_GET_TIMERS).fetchall()
+
+
+async def get_timers():
+    """[(group_id, quiz_id, deadline), ...]"""
+    return await _read(_get_timers)
+
+
+# --------------------------
+# FSM holatlari
+# --------------------------
+
+SQL_FSM_GET = "SELECT state, data, updated_at FROM fsm_states WHERE key = ?"
+SQL_FSM_KEYS = "SELECT key FROM fsm_states WHERE updated_at >= ?"
+SQL_FSM_SAVE = """
+    INSERT OR REPLACE INTO fsm_states (key, state, data, updated_at)
+    VALUES (?, ?, ?, ?)
+"""
+SQL_FSM_DELETE = "DELETE FROM fsm_states WHERE key = ?"
+SQL_FSM_PURGE = "DELETE FROM fsm_states WHERE updated_at < ?"
+
+
+def _fsm_get(conn, key):
+    return conn.execute(SQL_FSM_GET, (key,)).fetchone()
+
+
+async def fsm_get(key: str):
+    """(state, data_json, updated_at) yoki None qaytaradi."""
+    return await _read(_fsm_get, key)
+
+
+def _fsm_keys(conn, since):
+    return [row[0] for row in conn.execute(SQL_FSM_KEYS, (since,))]
+
+
+async def fsm_keys(since: float) -> list:
+    """`since` dan beri yozilgan (muddati o'tmagan) holatlar kalitlari."""
+    return await _read(_fsm_keys, since)
+
+
+def _fsm_write(conn, rows, deleted):
+    with conn:
+        if rows:
+            conn.executemany(SQL_FSM_SAVE, rows)
+        if deleted:
+            conn.executemany(SQL_FSM_DELETE, [(key,) for key in deleted])
+
+
+async def fsm_write(rows, deleted=()):
+    """rows: (key, state, data_json, updated_at); deleted: o'chiriladigan kalitlar."""
+    await _write(_fsm_write, list(rows), list(deleted))
+
+
+def _fsm_purge(conn, before):
+    with conn:
+        return conn.execute(SQL_FSM_PURGE, (before,)).rowcount
+
+
+async def fsm_purge(before: float) -> int:
+    """`before` dan eski holatlarni o'chiradi, o'chirilganlar sonini qaytaradi."""
+    return await _write(_fsm_purge, before)
 
 
 if __name__ == "__main__":
-    init_db()
+    asyncio.run(init_db())
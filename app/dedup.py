@@ -0,0 +1,99 @@
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+
+class TTLSet:
+    """Cheklangan hajmdagi TTL to'plam.
+
+    Kalitlar qo'shilish tartibida saqlanadi, shuning uchun eng eski yozuvlar
+    har doim boshida turadi: qo'shish va eskirganlarni tozalash O(1) (amortizatsiya).
+    `max_size` dan oshsa eng eski kalit muddatidan oldin chiqarib yuboriladi.
+    """
+
+    __slots__ = ("ttl", "max_size", "_items")
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        # {key: qo'shilgan vaqt (monotonic)}
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _expire(self, now):
+        items = self._items
+        deadline = now - self.ttl
+        while items:
+            key, ts = next(iter(items.items()))
+            if ts > deadline and len(items) < self.max_size:
+                break
+            items.popitem(last=False)
+
+    def add(self, key) -> bool:
+        """Kalit yangi bo'lsa qo'shib True, muddati o'tmagan holda bor bo'lsa False qaytaradi."""
+        now = time.monotonic()
+        self._expire(now)
+        ts = self._items.get(key)
+        if ts is not None and now - ts < self.ttl:
+            return False
+        self._items[key] = now
+        self._items.move_to_end(key)
+        return True
+
+
+def semantic_key(update: Update):
+    """Bir xil hodisa boshqa update_id bilan kelsa ham uni taniydigan kalit."""
+    event_type = update.event_type
+    event = update.event
+    if event_type in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        return event_type, event.chat.id, event.message_id, getattr(event, "edit_date", None)
+    if event_type == "callback_query":
+        return event_type, event.id
+    if event_type == "poll_answer":
+        voter = event.user.id if event.user else event.voter_chat.id
+        return event_type, event.poll_id, voter
+    if event_type in ("my_chat_member", "chat_member"):
+        return event_type, event.chat.id, event.new_chat_member.user.id, event.new_chat_member.status, event.date
+    return None
+
+
+class DedupMiddleware(BaseMiddleware):
+    """Takroriy update larni (Telegram qayta yuborganlarini) handlerlarga yetkazmaydi.
+
+    Dispatcher ga outer middleware sifatida ulanadi:
+    ``dp.update.outer_middleware(DedupMiddleware())``.
+    Xotira `max_size` bilan cheklangan; `hits` — nechta takror ushlangani.
+    """
+
+    def __init__(self, ttl: float = 600, max_size: int = 100_000):
+        self._update_ids = TTLSet(ttl, max_size)
+        self._semantic = TTLSet(ttl, max_size)
+        self.seen = 0
+        # {"update_id": n, "semantic": n}
+        self.hits = {"update_id": 0, "semantic": 0}
+        # {event_type: n} — qaysi turdagi update lar ko'p takrorlanadi
+        self.hits_by_type = {}
+
+    def _hit(self, kind, update):
+        self.hits[kind] += 1
+        event_type = update.event_type
+        self.hits_by_type[event_type] = self.hits_by_type.get(event_type, 0) + 1
+        logger.debug("Takroriy update o'tkazib yuborildi (%s, %s): %s", kind, event_type, update.update_id)
+
+    async def __call__(self, handler, event: Update, data):
+        self.seen += 1
+        if not self._update_ids.add(event.update_id):
+            self._hit("update_id", event)
+            return None
+        key = semantic_key(event)
+        if key is not None and not self._semantic.add(key):
+            self._hit("semantic", event)
+            return None
+        return await handler(event, data)
@@ -0,0 +1,197 @@
+import asyncio
+import copy
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from . import db
+
+logger = logging.getLogger(__name__)
+
+
+class _Record:
+    __slots__ = ("state", "data", "updated_at")
+
+    def __init__(self, state=None, data=None, updated_at=0.0):
+        self.state = state
+        self.data = data if data is not None else {}
+        self.updated_at = updated_at
+
+    def is_empty(self):
+        return self.state is None and not self.data
+
+
+class SQLiteStorage(BaseStorage):
+    """Bot bazasidagi `fsm_states` jadvaliga asoslangan FSM storage.
+
+    Faol kalitlar xotirada (LRU) saqlanadi; o'zgarishlar `flush_interval`
+    soniyada bir marta partiyalab yoziladi, shuning uchun ketma-ket
+    `update_data` chaqiruvlari bitta yozuvga birlashadi. `ttl` soniyadan
+    beri o'zgarmagan holatlar muddati o'tgan deb hisoblanadi va o'chiriladi.
+
+    Bazada qatori bor kalitlar to'plami (`_stored`) xotirada yuritiladi: FSMContext
+    har bir update da (jumladan poll_answer da) get_state chaqiradi, ammo holati
+    yo'q foydalanuvchi uchun DB ga borilmaydi va bo'sh yozuv keshga qo'shilmaydi.
+    """
+
+    def __init__(self, ttl: float = 24 * 3600, flush_interval: float = 1.0,
+                 max_cached: int = 10_000, purge_interval: float = 600,
+                 key_builder: Optional[KeyBuilder] = None):
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.max_cached = max_cached
+        self.purge_interval = purge_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._cache = OrderedDict()
+        self._dirty = set()
+        # Bazada qatori bor kalitlar; None — hali yuklanmagan
+        self._stored = None
+        self._stored_lock = asyncio.Lock()
+        self._task = None
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def sessions(self) -> int:
+        """Xotiradagi faol (bo'sh bo'lmagan) sessiyalar soni."""
+        return sum(1 for r in self._cache.values() if not r.is_empty())
+
+    def _expired(self, record: _Record, now: float) -> bool:
+        return record.updated_at + self.ttl < now
+
+    async def _load_stored(self):
+        async with self._stored_lock:
+            if self._stored is None:
+                self._stored = set(await db.fsm_keys(time.time() - self.ttl))
+
+    async def _get(self, key: StorageKey, create: bool = False) -> _Record:
+        """Kalit yozuvi. Bazada ham, keshda ham bo'lmasa: `create` bo'lsa keshga
+        yangi yozuv qo'shiladi, aks holda keshlanmaydigan bo'sh yozuv qaytadi."""
+        k = self.key_builder.build(key)
+        now = time.time()
+        record = self._cache.get(k)
+        if record is None:
+            if self._stored is None:
+                await self._load_stored()
+            row = await db.fsm_get(k) if k in self._stored else None
+            # Kutish paytida boshqa handler yozgan bo'lishi mumkin
+            record = self._cache.get(k)
+            if record is None:
+                if row is not None and row[2] + self.ttl >= now:
+                    record = _Record(row[0], json.loads(row[1]) if row[1] else {}, row[2])
+                elif create:
+                    record = _Record(updated_at=now)
+                else:
+                    return _Record(updated_at=now)
+                self._cache[k] = record
+                self._evict()
+        elif self._expired(record, now):
+            record.state, record.data, record.updated_at = None, {}, now
+            self._dirty.add(k)
+        self._cache.move_to_end(k)
+        return record
+
+    def _touch(self, key: StorageKey, record: _Record):
+        record.updated_at = time.time()
+        self._dirty.add(self.key_builder.build(key))
+        self._ensure_task()
+
+    def _evict(self):
+        # Faqat yozib bo'lingan (toza) yozuvlar xotiradan chiqariladi
+        if len(self._cache) <= self.max_cached:
+            return
+        for k in list(self._cache):
+            if len(self._cache) <= self.max_cached:
+                break
+            if k not in self._dirty:
+                del self._cache[k]
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._get(key, create=True)
+        record.state = state.state if isinstance(state, State) else state
+        self._touch(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._get(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._get(key, create=True)
+        record.data = copy.deepcopy(data)
+        self._touch(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return copy.deepcopy((await self._get(key)).data)
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        record = await self._get(key, create=True)
+        record.data.update(copy.deepcopy(data))
+        self._touch(key, record)
+        return copy.deepcopy(record.data)
+
+    # --------------------------
+    # Fon yozish va tozalash
+    # --------------------------
+
+    def _ensure_task(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        last_purge = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if time.monotonic() - last_purge >= self.purge_interval:
+                    last_purge = time.monotonic()
+                    await self.purge()
+            except Exception as e:
+                logger.exception("SQLiteStorage fon yozish xato: %s", e)
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            keys, self._dirty = self._dirty, set()
+            rows, deleted = [], []
+            for k in keys:
+                record = self._cache.get(k)
+                if record is None or record.is_empty():
+                    deleted.append(k)
+                else:
+                    rows.append((k, record.state, json.dumps(record.data, ensure_ascii=False),
+                                 record.updated_at))
+            try:
+                await db.fsm_write(rows, deleted)
+            except Exception:
+                self._dirty |= keys
+                raise
+            if self._stored is not None:
+                self._stored.update(row[0] for row in rows)
+                self._stored.difference_update(deleted)
+            self._evict()
+
+    async def purge(self):
+        now = time.time()
+        for k in [k for k, r in self._cache.items() if k not in self._dirty and self._expired(r, now)]:
+            del self._cache[k]
+        async with self._flush_lock:
+            removed = await db.fsm_purge(now - self.ttl)
+            if removed:
+                self._stored = set(await db.fsm_keys(now - self.ttl))
+        if removed:
+            logger.info("SQLiteStorage: %s ta eskirgan FSM holati o'chirildi", removed)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -1,5 +1,10 @@
 # handlers.py
+import asyncio
+import html
 import logging
+import os
+import tempfile
+from pathlib import Path
 from aiogram import Router, F
 from aiogram.types import (
     ChatMemberUpdated, Message, CallbackQuery, PollAnswer,
@@ -15,22 +20,48 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
 
-from .keyboards import quiz_size_keyboard, confirm_quiz_keyboard, end_quiz_keyboard
+from .keyboards import (
+    quiz_size_keyboard, confirm_quiz_keyboard, end_quiz_keyboard, pace_period_keyboard, PACE_PERIODS, MAX_QUIZ_SIZE,
+    broadcast_groups_keyboard, broadcast_results_keyboard, history_keyboard
+)
+from .analytics import QuestionAnalytics
+from .journal import QuizJournal
+from .leaderboard import Leaderboards, LeaderboardService, QUIZ, GROUP, COMBINED, MEDALS, short_name
+from .membership import MembershipCache
+from .metrics import summary as metrics_summary
+from .outbound import OutboundScheduler
+from .profiles import ProfileCache
 from .quiz_manager import QuizManager
+from .result_writer import ResultWriter
 from .states import QuizCreation
-from . import db  # db.get_groups, db.save_group, db.add_result, db.get_leaderboard
+from .timers import TimerHeap
+from . import importer
+from . import db  # db.get_user_stats, db.get_group_stats, db.search_questions
 
 logger = logging.getLogger(__name__)
 router = Router()
 quiz_manager = QuizManager()
+# Viktorinalar holati restartdan keyin jurnal + snapshotdan tiklanadi (restore_quizzes)
+quiz_journal = QuizJournal()
+result_writer = ResultWriter()
+leaderboards = Leaderboards(result_writer)
+analytics = QuestionAnalytics()
+profiles = ProfileCache()
+membership = MembershipCache()
+# Reyting xabarlari: sahifalangan, keshlangan (har bir javobda eskiradi)
+leaderboard_pages = LeaderboardService(leaderboards, result_writer, profiles, membership.get_title)
+outbound = OutboundScheduler()
+# Vaqtli rejimdagi barcha guruhlar uchun bitta umumiy taymer
+timers = TimerHeap()
 
 
 # ----------------------------
 # Safe send helpers
+# (hammasi outbound navbati orqali — flood limitlar va retry_after hisobga olinadi)
 # ----------------------------
 async def safe_send_message(bot, chat_id, text, **kwargs):
     try:
-        return await bot.send_message(chat_id, text, **kwargs)
+        return await outbound.send(chat_id, lambda: bot.send_message(chat_id, text, **kwargs))
     except (TelegramForbiddenError, TelegramBadRequest):
         logger.warning(f"⚠️ Bot bu chatga yozolmadi: {chat_id}")
     except Exception as e:
@@ -38,7 +69,7 @@ async def safe_send_message(bot, chat_id, text, **kwargs):
 
 async def safe_send_poll(bot, chat_id, **kwargs):
     try:
-        return await bot.send_poll(chat_id, **kwargs)
+        return await outbound.send(chat_id, lambda: bot.send_poll(chat_id, **kwargs))
     except (TelegramForbiddenError, TelegramBadRequest):
         logger.warning(f"⚠️ Bot bu chatga poll yuborolmadi: {chat_id}")
     except Exception as e:
@@ -46,13 +77,42 @@ async def safe_send_poll(bot, chat_id, **kwargs):
 
 async def safe_answer(message: Message, text: str, **kwargs):
     try:
-        return await message.answer(text, **kwargs)
+        return await outbound.send(message.chat.id, lambda: message.answer(text, **kwargs))
     except (TelegramForbiddenError, TelegramBadRequest):
         logger.warning(f"⚠️ Bot foydalanuvchiga javob bera olmadi: {message.chat.id}")
     except Exception as e:
         logger.exception("message.answer xato: %s", e)
 
 
+async def freeze_run(bot, quiz_id: int, group_id: int):
+    """Yakuniy reytingni tarixga (quiz_runs) ismlari bilan muzlatib yozadi."""
+    leaderboard = await leaderboards.top(quiz_id, group_id, limit=50)
+    total_players = await leaderboards.count(quiz_id, group_id)
+    names = await profiles.resolve(bot, [row[0] for row in leaderboard])
+    try:
+        await db.end_run(quiz_id, group_id, total_players,
+                         [(uid, names[uid], correct, total) for uid, correct, total in leaderboard])
+    except Exception as e:
+        logger.exception("DB.end_run xato (quiz=%s, guruh=%s): %s", quiz_id, group_id, e)
+
+
+async def clear_quiz(bot, group_id):
+    """Guruh viktorinasini, uning xotiradagi reytingini va taymerini o‘chiradi.
+
+    Boshlangan viktorina (bekor qilinsa yoki almashtirilsa ham) tarixda yakunlangan deb yopiladi.
+    """
+    quiz = quiz_manager.clear_quiz(group_id)
+    if quiz is not None:
+        if quiz.launched or quiz_started(quiz):
+            await freeze_run(bot, quiz.quiz_id, group_id)
+        leaderboards.drop(quiz.quiz_id, group_id)
+        leaderboard_pages.forget(quiz.quiz_id, group_id)
+        await analytics.drop(quiz.quiz_id, group_id)
+        if quiz.open_period is not None:
+            timers.cancel((group_id, quiz.quiz_id))
+            await db.delete_timer(group_id, quiz.quiz_id)
+
+
 # ----------------------------
 # Helper / Keyboards
 # ----------------------------
@@ -102,32 +162,18 @@ MENU_TEXTS = {"➕ Guruhga qo‘shish", "📋 Yangi viktorina", "📊 Reyting",
 # ----------------------------
 # /start & /menu
 # ----------------------------
-
-processed_events = {}
-
 @router.message(Command("start"))
 async def start_cmd(message: Message):
-    me = await message.bot.get_me()
+    me = await membership.get_me(message.bot)
 
     # Agar guruh yoki supergroup bo‘lsa, faqat ma'lumot beramiz, lekin xabar yuborishni my_chat_member ga qoldiramiz
     if message.chat.type in ("group", "supergroup"):
-        # Check if this is a fresh group addition
-        event_key = f"{message.chat.id}:start:{message.date}"
-        if event_key in processed_events and time() - processed_events[event_key] < 5:
-            logger.debug(f"Ignoring duplicate /start in chat {message.chat.id}")
-            return
-        processed_events[event_key] = time.time()
-
         # Let my_chat_member handle the "bot added" message
         return
 
     # Faqat private chat bo‘lsa menyuni ko‘rsatamiz
     user_id = message.from_user.id
-    try:
-        groups = db.get_groups(user_id) or []
-    except Exception:
-        g = db.get_group(user_id)
-        groups = [g] if g else []
+    groups = await membership.get_groups(user_id)
 
     if not groups:
         await safe_answer(
@@ -148,14 +194,14 @@ async def start_cmd(message: Message):
 async def menu_cmd(message: Message):
     # Guruhlarda menyu chiqmasin
     if message.chat.type in ("group", "supergroup"):
-        await message.answer(
+        await safe_answer(message,
             "❌ Bu buyruq guruhda ishlamaydi.\n"
             "📩 Botga shaxsiy yozib menyudan foydalanishingiz mumkin."
         )
         return
 
     # Faqat private chatda menyu chiqadi
-    await message.answer("📍 Asosiy menyu", reply_markup=main_menu_keyboard())
+    await safe_answer(message, "📍 Asosiy menyu", reply_markup=main_menu_keyboard())
 
 
 
@@ -165,8 +211,8 @@ async def menu_cmd(message: Message):
 @router.message(F.text == "➕ Guruhga qo‘shish")
 async def handle_add_group_text(message: Message):
     """If user pressed the reply-button (which only sends a text), reply with an inline URL keyboard."""
-    me = await message.bot.get_me()
-    await message.answer(
+    me = await membership.get_me(message.bot)
+    await safe_answer(message,
         "Botni guruhga qo‘shish uchun quyidagi tugmani bosing:",
         reply_markup=add_to_group_keyboard(me.username)
     )
@@ -178,44 +224,27 @@ async def new_quiz_from_menu(message: Message, state: FSMContext):
 
     # ❌ Agar guruh bo‘lsa to‘xtatamiz
     if message.chat.type != "private":
-        await message.answer("❌ Viktorinani faqat bot bilan shaxsiy chatda yaratishingiz mumkin.")
+        await safe_answer(message, "❌ Viktorinani faqat bot bilan shaxsiy chatda yaratishingiz mumkin.")
         return
 
     user_id = message.from_user.id
-    me = await message.bot.get_me()
+    me = await membership.get_me(message.bot)
 
-    try:
-        groups = db.get_groups(user_id) or []
-    except Exception:
-        g = db.get_group(user_id)
-        groups = [g] if g else []
+    groups = await membership.get_groups(user_id)
 
     if not groups:
-        await message.answer(
+        await safe_answer(message,
             "❌ Siz hali hech qanday guruhga botni qo‘shmagansiz.\n\n"
             "➕ Avval botni guruhga qo‘shing:",
             reply_markup=add_to_group_keyboard(me.username)
         )
         return
 
-    # 🔧 Har bir guruh uchun title olish
-    group_list: list[tuple[int, str]] = []
-    for g in groups:
-        group_id = g[0] if isinstance(g, tuple) else g
-        try:
-            chat = await message.bot.get_chat(group_id)
-            group_list.append((group_id, chat.title))
-        except Exception:
-            group_list.append((group_id, None))  # fallback
-
-    if not group_list:
-        await message.answer("❌ Hech qaysi guruh nomini olish imkonsiz bo‘ldi.")
-        return
-
-    if len(group_list) == 1:
-        gid, title = group_list[0]
+    # Guruh nomlari keshdan olinadi (user_groups.group_title), get_chat shart emas
+    if len(groups) == 1:
+        gid, title = groups[0]
         await state.update_data(group_id=gid)
-        await message.answer(
+        await safe_answer(message,
             f"✅ Guruh avtomatik tanlandi: <b>{title or gid}</b>\n\n"
             "Endi nechta savoldan iborat viktorina tuzmoqchisiz?",
             reply_markup=quiz_size_keyboard()
@@ -223,9 +252,9 @@ async def new_quiz_from_menu(message: Message, state: FSMContext):
         return
 
     # Multiple groups -> tanlash
-    await message.answer(
+    await safe_answer(message,
         "📌 Qaysi guruh uchun viktorina yaratmoqchisiz?",
-        reply_markup=groups_inline_keyboard(group_list, prefix="choose_group")
+        reply_markup=groups_inline_keyboard(groups, prefix="choose_group")
     )
 
 
@@ -241,7 +270,7 @@ async def choose_group_callback(callback: CallbackQuery, state: FSMContext):
         return
 
     await state.update_data(group_id=group_id)
-    await callback.message.answer(
+    await safe_answer(callback.message,
         "✅ Guruh tanlandi!\nEndi nechta savoldan iborat viktorina tuzmoqchisiz?",
         reply_markup=quiz_size_keyboard()
     )
@@ -256,6 +285,11 @@ async def set_bot_commands(bot: Bot):
             BotCommand(command="start", description="Botni ishga tushirish"),
             BotCommand(command="menu", description="Asosiy menyu"),
             BotCommand(command="rating", description="Reytingni ko‘rish"),
+            BotCommand(command="search", description="Savollar bankidan qidirish"),
+            BotCommand(command="mystats", description="Mening umumiy natijalarim"),
+            BotCommand(command="top", description="Guruhning umumiy reytingi"),
+            BotCommand(command="quizstats", description="Savollar bo‘yicha statistika"),
+            BotCommand(command="history", description="O‘tgan viktorinalar tarixi"),
             BotCommand(command="cancel", description="Viktorinani bekor qilish"),
         ],
         scope=BotCommandScopeDefault()
@@ -273,13 +307,13 @@ async def on_bot_my_chat_member(event: ChatMemberUpdated):
     chat = event.chat
     inviter = event.from_user
 
-    # Create a unique key for this event
-    event_key = f"{chat.id}:{new_status}:{event.date}"
-    if event_key in processed_events and time.time() - processed_events[event_key] < 5:
-        logger.debug(f"Ignoring duplicate event: {event_key}")
-        return
-    processed_events[event_key] = time.time()
+    # Takroriy update larni DedupMiddleware (app/dedup.py) ushlaydi
 
+    # Guruh nomi o'zgargan bo'lsa keshni yangilab qo'yamiz
+    try:
+        await membership.update_title(chat.id, chat.title)
+    except Exception as e:
+        logger.exception(f"DB.set_group_title xato (chat={chat.id}): {e}")
 
     # Log the event for debugging
     logger.info(
@@ -297,7 +331,7 @@ async def on_bot_my_chat_member(event: ChatMemberUpdated):
         )
         # Save group to DB with title
         try:
-            db.save_group(inviter.id, chat.id, chat.title)
+            await membership.save_group(inviter.id, chat.id, chat.title)
         except Exception as e:
             logger.exception(f"DB.save_group xato (chat={chat.id}): {e}")
 
@@ -326,7 +360,7 @@ async def on_bot_my_chat_member(event: ChatMemberUpdated):
 
         # Save group to DB with title
         try:
-            db.save_group(inviter.id, chat.id, chat.title)
+            await membership.save_group(inviter.id, chat.id, chat.title)
         except Exception as e:
             logger.exception(f"DB.save_group xato (chat={chat.id}): {e}")
 
@@ -335,7 +369,7 @@ async def on_bot_my_chat_member(event: ChatMemberUpdated):
         logger.info(f"Bot guruhdan chiqarildi: {chat.title} (chat_id={chat.id})")
         # Optionally, remove group from DB
         try:
-            db.remove_group(chat.id)  # Assuming you have a remove_group function
+            await membership.remove_group(chat.id)
         except Exception as e:
             logger.exception(f"DB.remove_group xato (chat={chat.id}): {e}")
 
@@ -347,21 +381,23 @@ async def on_bot_my_chat_member(event: ChatMemberUpdated):
 @router.callback_query(F.data.startswith("quiz_size:"))
 async def choose_quiz_size(callback: CallbackQuery, state: FSMContext):
     user_id = callback.from_user.id
-    size = int(callback.data.split(":", 1)[1])
+    try:
+        size = int(callback.data.split(":", 1)[1])
+    except ValueError:
+        size = 0
+    if not 1 <= size <= MAX_QUIZ_SIZE:
+        await callback.answer("❌ Noto‘g‘ri savollar soni.", show_alert=True)
+        return
 
     data = await state.get_data()
     group_id = data.get("group_id")
 
     if not group_id:
-        try:
-            groups = db.get_groups(user_id) or []
-        except Exception:
-            g = db.get_group(user_id)
-            groups = [g] if g else []
+        groups = await membership.get_groups(user_id)
 
         if not groups:
-            me = await callback.bot.get_me()
-            await callback.message.answer(
+            me = await membership.get_me(callback.bot)
+            await safe_answer(callback.message,
                 "❌ Guruh topilmadi. Avval botni guruhga qo‘shing va uni admin qiling.",
                 reply_markup=add_to_group_keyboard(me.username)
             )
@@ -369,44 +405,33 @@ async def choose_quiz_size(callback: CallbackQuery, state: FSMContext):
             return
 
         if len(groups) > 1:
-            group_list = []
-            for g in groups:
-                gid = g[0] if isinstance(g, tuple) else g
-                try:
-                    chat = await callback.bot.get_chat(gid)
-                    group_list.append((gid, chat.title))
-                except Exception:
-                    group_list.append((gid, None))
-
-            await callback.message.answer(
+            await safe_answer(callback.message,
                 "❗ Iltimos, qaysi guruhga viktorina yuborishni xohlaysiz?",
-                reply_markup=groups_inline_keyboard(group_list, prefix="choose_group")
+                reply_markup=groups_inline_keyboard(groups, prefix="choose_group")
             )
             await callback.answer()
             return
 
-        group_id = groups[0][0] if isinstance(groups[0], tuple) else groups[0]
+        group_id = groups[0][0]
 
     # ✅ quiz yaratish — bu yer endi hamma holda ishlaydi
-    quiz_id = quiz_manager.start_quiz(user_id, group_id, size)
+    await clear_quiz(callback.bot, group_id)  # eski viktorina bo‘lsa, uning reytingi ham xotiradan o‘chadi
+    quiz_id = quiz_manager.start_quiz(user_id, group_id, size, await db.create_quiz(user_id, group_id, size))
     await state.update_data(group_id=group_id, quiz_id=quiz_id)
     await state.set_state(QuizCreation.waiting_for_question)
 
     # ⚡️ Guruhga e’lon yuborish
-    try:
-        await callback.bot.send_message(
-            chat_id=group_id,
-            text=(
-                f"👋 Assalomu alaykum, viktorina qatnashchilari!\n\n"
-                f"🎯 Biz {size} talik viktorinani boshladik.\n"
-                "❗ Savollarga tayyor bo‘ling!"
-            )
-        )
-    except Exception as e:
-        print(f"Guruhga e’lon yuborilmadi: {e}")
+    await safe_send_message(
+        callback.bot,
+        group_id,
+        f"👋 Assalomu alaykum, viktorina qatnashchilari!\n\n"
+        f"🎯 Biz {size} talik viktorinani boshladik.\n"
+        "❗ Savollarga tayyor bo‘ling!"
+    )
 
-    await callback.message.answer(
-        f"📋 {size} ta savollik viktorina boshlaymiz.\n📝 Savolni yuboring (shaxsiy chatda)."
+    await safe_answer(callback.message,
+        f"📋 {size} ta savollik viktorina boshlaymiz.\n📝 Savolni yuboring (shaxsiy chatda) "
+        "yoki /search bilan savollar bankidan tanlang."
     )
 
     await callback.answer()
@@ -414,6 +439,157 @@ async def choose_quiz_size(callback: CallbackQuery, state: FSMContext):
 
 
 
+# ----------------------------
+# Question bank: /search va bankdan savol qo‘shish
+# (QuizCreation holatlaridan oldin ro‘yxatdan o‘tadi — savol yozish jarayonida ham ishlaydi)
+# ----------------------------
+def bank_results_keyboard(results) -> InlineKeyboardMarkup:
+    row = [InlineKeyboardButton(text=f"➕ {i}", callback_data=f"bank:{qid}")
+           for i, (qid, _, _, _) in enumerate(results, start=1)]
+    return InlineKeyboardMarkup(inline_keyboard=[row[i:i + 5] for i in range(0, len(row), 5)])
+
+
+@router.message(Command("search"), F.chat.type == "private")
+async def search_bank_cmd(message: Message):
+    query = (message.text or "").partition(" ")[2].strip()
+    if not query:
+        await safe_answer(message, "🔎 Foydalanish: /search <so‘zlar>\nMasalan: /search sql injection")
+        return
+
+    results = await db.search_questions(query, limit=10)
+    if not results:
+        await safe_answer(message, "🔎 Hech narsa topilmadi.")
+        return
+
+    text = "🔎 Topilgan savollar:\n\n"
+    for i, (_, question, options, correct_index) in enumerate(results, start=1):
+        text += f"<b>{i}.</b> {html.escape(question[:200])}\n"
+        text += "   " + " | ".join(
+            ("✅ " if j == correct_index else "") + html.escape(opt[:40]) for j, opt in enumerate(options)
+        ) + "\n"
+    text += "\nViktorinaga qo‘shish uchun raqamni bosing."
+    await safe_answer(message, text, reply_markup=bank_results_keyboard(results))
+
+
+@router.callback_query(F.data.startswith("bank:"))
+async def add_from_bank(callback: CallbackQuery, state: FSMContext):
+    user_id = callback.from_user.id
+    try:
+        qid = int(callback.data.split(":", 1)[1])
+    except Exception:
+        await callback.answer("❌ Noto‘g‘ri savol.", show_alert=True)
+        return
+
+    group_id = quiz_manager.get_owner_group(user_id)
+    quiz = quiz_manager.get_quiz(group_id) if group_id else None
+    if not quiz or any(q.poll_id for q in quiz.questions):
+        await callback.answer("❗ Avval 📋 Yangi viktorina orqali viktorina boshlang.", show_alert=True)
+        return
+    if quiz_manager.is_quiz_ready(group_id):
+        await callback.answer("✅ Viktorina allaqachon to‘lgan.", show_alert=True)
+        return
+
+    found = await db.get_question(qid)
+    if not found:
+        await callback.answer("❌ Savol topilmadi.", show_alert=True)
+        return
+    _, question, options, correct_index = found
+    if any(q.question == question and list(q.options) == options for q in quiz.questions):
+        await callback.answer("ℹ️ Bu savol allaqachon qo‘shilgan.")
+        return
+
+    quiz_manager.add_question(group_id, question, options, correct_index)
+    await callback.answer("➕ Qo‘shildi")
+    if quiz_manager.is_quiz_ready(group_id):
+        await state.clear()
+        await safe_answer(callback.message, "✅ Barcha savollar kiritildi!\nEndi tasdiqlaysizmi?", reply_markup=confirm_quiz_keyboard())
+    else:
+        await state.set_state(QuizCreation.waiting_for_question)
+        await safe_answer(callback.message,
+            f"✅ Savol qo‘shildi. Yana {quiz.size - len(quiz.questions)} ta savol kerak.\n"
+            "📝 Yangi savol yuboring yoki /search bilan bankdan tanlang."
+        )
+
+
+# ----------------------------
+# Bulk import (CSV / JSON / TXT fayldan)
+# ----------------------------
+MAX_IMPORT_FILE_SIZE = 20 * 1024 * 1024  # Bot API orqali yuklab olish chegarasi
+MAX_REPORTED_ERRORS = 30
+
+
+def format_import_errors(issues) -> str:
+    # Xabar 4096 belgidan oshmasligi uchun har bir qator qisqartiriladi
+    lines = [html.escape(str(issue)[:100]) for issue in issues[:MAX_REPORTED_ERRORS]]
+    if len(issues) > MAX_REPORTED_ERRORS:
+        lines.append(f"… va yana {len(issues) - MAX_REPORTED_ERRORS} ta xato")
+    return "\n".join(lines)
+
+
+@router.message(F.document, F.chat.type == "private")
+async def import_quiz_file(message: Message, state: FSMContext):
+    document = message.document
+    user_id = message.from_user.id
+
+    if document.file_size and document.file_size > MAX_IMPORT_FILE_SIZE:
+        await safe_answer(message, "❌ Fayl juda katta (20 MB dan oshmasligi kerak).")
+        return
+
+    data = await state.get_data()
+    group_id = data.get("group_id")
+    if not group_id:
+        groups = await membership.get_groups(user_id)
+        if len(groups) != 1:
+            await safe_answer(message,
+                "❗ Avval guruhni tanlang: 📋 Yangi viktorina tugmasini bosing, "
+                "guruhni tanlagach faylni qayta yuboring."
+            )
+            return
+        group_id = groups[0][0]
+
+    fd, path = tempfile.mkstemp(suffix=Path(document.file_name or "").suffix)
+    os.close(fd)
+    try:
+        await message.bot.download(document, destination=path)
+        # Tahlil alohida oqimda — katta fayllar event loop ni to‘xtatmaydi
+        questions, issues = await asyncio.to_thread(importer.load_questions, path, document.file_name or "")
+    except Exception as e:
+        logger.exception("Faylni import qilishda xato: %s", e)
+        await safe_answer(message, "❌ Faylni o‘qib bo‘lmadi.")
+        return
+    finally:
+        os.remove(path)
+
+    if not questions:
+        text = "❌ Fayldan birorta ham to‘g‘ri savol topilmadi."
+        if issues:
+            text += "\n\n" + format_import_errors(issues)
+        await safe_answer(message, text)
+        return
+
+    # Viktorinaga qo'lda tuzishdagi kabi ko'pi bilan MAX_QUIZ_SIZE ta savol; qolganlari faqat bankka
+    selected = questions[:MAX_QUIZ_SIZE]
+    await clear_quiz(message.bot, group_id)
+    quiz_id = await db.create_quiz(user_id, group_id, len(selected))
+    quiz_manager.start_quiz(user_id, group_id, len(selected), quiz_id)
+    for q in selected:
+        quiz_manager.add_question(group_id, q.question, q.options, q.correct_index)
+    await state.clear()
+    try:
+        await db.save_questions((q.question, q.options, q.correct_index, user_id) for q in questions)
+    except Exception as e:
+        logger.exception("Savollar bankiga saqlanmadi: %s", e)
+
+    text = f"✅ {len(selected)} ta savol yuklandi."
+    if len(questions) > len(selected):
+        text += (f"\n✂️ Fayldagi {len(questions)} ta savoldan viktorinaga birinchi {MAX_QUIZ_SIZE} tasi olindi; "
+                 f"qolgan {len(questions) - len(selected)} tasi savollar bankiga saqlandi (/search).")
+    if issues:
+        text += f"\n⚠️ {len(issues)} ta savol xato sababli o‘tkazib yuborildi:\n\n" + format_import_errors(issues)
+    await safe_answer(message, text)
+    await safe_answer(message, "Viktorinani guruhga yuborasizmi?", reply_markup=confirm_quiz_keyboard())
+
+
 # ----------------------------
 # Question / Options flow
 # ----------------------------
@@ -421,17 +597,17 @@ async def choose_quiz_size(callback: CallbackQuery, state: FSMContext):
 async def get_question(message: Message, state: FSMContext):
     text = (message.text or "").strip()
     if not text:
-        await message.answer("❌ Iltimos matn yuboring.")
+        await safe_answer(message, "❌ Iltimos matn yuboring.")
         return
 
     # reject menu texts as questions
     if text in MENU_TEXTS:
-        await message.answer("❗ Bu menyu tugmasi. Agar savol yubormoqchi bo'lsangiz haqiqiy matn yuboring.")
+        await safe_answer(message, "❗ Bu menyu tugmasi. Agar savol yubormoqchi bo'lsangiz haqiqiy matn yuboring.")
         return
 
     await state.update_data(question=text, options=[])
     await state.set_state(QuizCreation.waiting_for_options)
-    await message.answer(
+    await safe_answer(message,
         "🔢 Variantlarni yuboring (har birini alohida xabarda).\n"
         "✅ Tugatgach /done deb yozing. Va undan keyin to'g'ri javobni tanlaysiz."
     )
@@ -442,23 +618,23 @@ async def get_options(message: Message, state: FSMContext):
     text = (message.text or "").strip()
 
     if not text:
-        await message.answer("❌ Bo‘sh xabar qabul qilinmaydi.")
+        await safe_answer(message, "❌ Bo‘sh xabar qabul qilinmaydi.")
         return
 
     # If user pressed the "➕ Guruhga qo‘shish" reply-button during option entry,
     # show the inline URL keyboard instead of treating it as an option.
     if text == "➕ Guruhga qo‘shish":
-        me = await message.bot.get_me()
-        await message.answer("Botni guruhga qo‘shish uchun tugmani bosing:", reply_markup=add_to_group_keyboard(me.username))
+        me = await membership.get_me(message.bot)
+        await safe_answer(message, "Botni guruhga qo‘shish uchun tugmani bosing:", reply_markup=add_to_group_keyboard(me.username))
         return
 
     # If other menu texts — warn user to exit creation if they want to use menu
     if text in {"📋 Yangi viktorina", "📊 Reyting", "❌ Bekor qilish", "/menu", "/cancel"}:
-        await message.answer("🚫 Siz hozir viktorina yaratish jarayonidasiz. Agar menyuga qaytmoqchi bo'lsangiz /cancel bilan chiqib qayting.")
+        await safe_answer(message, "🚫 Siz hozir viktorina yaratish jarayonidasiz. Agar menyuga qaytmoqchi bo'lsangiz /cancel bilan chiqib qayting.")
         return
 
     if text.startswith("/") and text != "/done":
-        await message.answer("❌ Noto‘g‘ri komanda! Variant sifatida faqat matn yuboring yoki /done deb tugating.")
+        await safe_answer(message, "❌ Noto‘g‘ri komanda! Variant sifatida faqat matn yuboring yoki /done deb tugating.")
         return
 
     if text == "/done":
@@ -468,7 +644,7 @@ async def get_options(message: Message, state: FSMContext):
     options = data.get("options", [])
     options.append(text)
     await state.update_data(options=options)
-    await message.answer(f"➕ Variant qo‘shildi: {text}\n({len(options)} ta variant bor) \n/done deb tugatishingiz mumkin.")
+    await safe_answer(message, f"➕ Variant qo‘shildi: {text}\n({len(options)} ta variant bor) \n/done deb tugatishingiz mumkin.")
 
 
 async def finish_options(message: Message, state: FSMContext):
@@ -476,12 +652,12 @@ async def finish_options(message: Message, state: FSMContext):
     options = data.get("options", []) or []
 
     if len(options) < 2:
-        await message.answer("❌ Kamida 2 ta variant bo‘lishi kerak!")
+        await safe_answer(message, "❌ Kamida 2 ta variant bo‘lishi kerak!")
         return
 
     await state.set_state(QuizCreation.waiting_for_correct_answer)
     options_text = "\n".join([f"{i}. {opt}" for i, opt in enumerate(options)])
-    await message.answer(
+    await safe_answer(message,
         f"🔽 Variantlar:\n{options_text}\n\nEndi to‘g‘ri javob raqamini yuboring (0 dan boshlab)."
     )
 
@@ -492,7 +668,7 @@ async def get_correct_answer(message: Message, state: FSMContext):
     try:
         correct_index = int(text)
     except ValueError:
-        await message.answer("❌ Faqat raqam yuboring (variant raqamini).")
+        await safe_answer(message, "❌ Faqat raqam yuboring (variant raqamini).")
         return
 
     data = await state.get_data()
@@ -502,101 +678,422 @@ async def get_correct_answer(message: Message, state: FSMContext):
     quiz_id = data.get("quiz_id")
 
     if question is None or options is None:
-        await message.answer("❌ Savol topilmadi. Iltimos qayta boshlang.")
+        await safe_answer(message, "❌ Savol topilmadi. Iltimos qayta boshlang.")
         await state.clear()
         return
 
     if correct_index < 0 or correct_index >= len(options):
-        await message.answer("❌ Noto‘g‘ri raqam! Variantlar oralig‘ida raqam kiriting.")
+        await safe_answer(message, "❌ Noto‘g‘ri raqam! Variantlar oralig‘ida raqam kiriting.")
         return
 
     ok = quiz_manager.add_question(group_id, question, options, correct_index)
     if not ok:
-        await message.answer("❌ Savol qo‘shishda xato. Avval viktorina boshlang (/menu va tanlang).")
+        await safe_answer(message, "❌ Savol qo‘shishda xato. Avval viktorina boshlang (/menu va tanlang).")
         await state.clear()
         return
 
+    # Savollar bankiga ham saqlaymiz (takroriy savollar xesh bo‘yicha o‘tkazib yuboriladi)
+    try:
+        await db.save_questions([(question, options, correct_index, message.from_user.id)])
+    except Exception as e:
+        logger.exception("Savol bankka saqlanmadi: %s", e)
+
     if quiz_manager.is_quiz_ready(group_id):
         await state.clear()
-        await message.answer("✅ Barcha savollar kiritildi!\nEndi tasdiqlaysizmi?", reply_markup=confirm_quiz_keyboard())
+        await safe_answer(message, "✅ Barcha savollar kiritildi!\nEndi tasdiqlaysizmi?", reply_markup=confirm_quiz_keyboard())
     else:
         quiz = quiz_manager.get_quiz(group_id)
-        q_left = quiz["size"] - len(quiz["questions"])
+        q_left = quiz.size - len(quiz.questions)
         await state.set_state(QuizCreation.waiting_for_question)
-        await message.answer(f"✅ Savol qo‘shildi. Yana {q_left} ta savol kerak.\n📝 Yangi savolni yuboring:")
+        await safe_answer(message, f"✅ Savol qo‘shildi. Yana {q_left} ta savol kerak.\n📝 Yangi savolni yuboring:")
 
 
 # ----------------------------
 # Confirm and send polls to group
 # ----------------------------
-@router.callback_query(F.data == "quiz:confirm")
-async def confirm_quiz(callback: CallbackQuery):
+async def get_owned_quiz(callback: CallbackQuery):
+    """Tugmani bosgan foydalanuvchi egasi bo‘lgan viktorinani topadi (yoki xabar berib None qaytaradi)."""
     user_id = callback.from_user.id
 
     # Try to determine group_id: prefer active quiz owned by user
-    group_id = None
-    # search active_quizzes for owner's quiz
-    for gid, q in quiz_manager.active_quizzes.items():
-        if q.get("owner") == user_id:
-            group_id = gid
-            break
+    group_id = quiz_manager.get_owner_group(user_id)
 
     # fallback to user's single group (if still None)
     if not group_id:
-        try:
-            groups = db.get_groups(user_id) or []
-        except Exception:
-            g = db.get_group(user_id)
-            groups = [g] if g else []
+        groups = await membership.get_groups(user_id)
 
         if len(groups) == 1:
-            group_id = groups[0]
+            group_id = groups[0][0]
 
     if not group_id:
-        me = await callback.bot.get_me()
-        await callback.message.answer(
+        me = await membership.get_me(callback.bot)
+        await safe_answer(callback.message,
             "❌ Guruh topilmadi. Avval botni guruhga qo‘shing va uni admin qiling.",
             reply_markup=add_to_group_keyboard(me.username)
         )
         await callback.answer()
-        return
+        return None
 
     quiz = quiz_manager.get_quiz(group_id)
     if not quiz:
-        await callback.message.answer("❌ Bu guruh uchun aktiv viktorina topilmadi.")
+        await safe_answer(callback.message, "❌ Bu guruh uchun aktiv viktorina topilmadi.")
         await callback.answer()
-        return
+        return None
 
-    if quiz.get("owner") != user_id:
-        await callback.message.answer("❌ Faqat quiz egasi viktorinani guruhga yuborishi mumkin.")
+    if quiz.owner != user_id:
+        await safe_answer(callback.message, "❌ Faqat quiz egasi viktorinani guruhga yuborishi mumkin.")
         await callback.answer()
-        return
+        return None
 
-    bot = callback.bot
-    for i, q in enumerate(quiz["questions"]):
-        try:
-            poll_msg = await bot.send_poll(
-                chat_id=group_id,
-                question=q["question"],
-                options=q["options"],
-                type="quiz",
-                correct_option_id=q["correct_index"],
-                is_anonymous=False
-            )
+    return quiz
+
+
+async def send_quiz_polls(bot, quiz) -> int:
+    """Viktorinaning barcha savollarini guruhga yuboradi; yuborilgan polllar sonini qaytaradi."""
+    group_id = quiz.group_id
+
+    async def send_question(i, q):
+        # Navbat tartibni saqlaydi; poll_id har bir poll yuborilishi bilan ro‘yxatga olinadi
+        poll_msg = await safe_send_poll(
+            bot,
+            group_id,
+            question=q.question,
+            options=list(q.options),
+            type="quiz",
+            correct_option_id=q.correct_index,
+            is_anonymous=False
+        )
+        if poll_msg:
             quiz_manager.set_poll_id(group_id, i, poll_msg.poll.id)
-        except Exception as e:
-            logger.exception("Poll yuborishda xato (savol %s): %s", i, e)
+            return True
+        logger.error("Poll yuborilmadi (guruh %s, savol %s)", group_id, i)
+        return False
+
+    sent = await asyncio.gather(*(send_question(i, q) for i, q in enumerate(quiz.questions)))
+    return sum(sent)
+
 
+async def launch_quiz(quiz):
+    """Viktorina guruhga chiqishidan oldin: reyting, statistika va tarixdagi yozuv ochiladi."""
+    leaderboards.open(quiz.quiz_id, quiz.group_id)
+    analytics.open(quiz)
     try:
-        await bot.send_message(group_id, "✅ Viktorina boshlandi!\n\n⏳ Savollar tugagach, tugatish tugmasini bosing.", reply_markup=end_quiz_keyboard())
+        await db.start_run(quiz.quiz_id, quiz.group_id, len(quiz.questions))
     except Exception as e:
-        logger.exception("Guruhga boshlash xabari yuborilmadi: %s", e)
+        logger.exception("DB.start_run xato (quiz=%s, guruh=%s): %s", quiz.quiz_id, quiz.group_id, e)
+
+
+@router.callback_query(F.data == "quiz:confirm")
+async def confirm_quiz(callback: CallbackQuery):
+    quiz = await get_owned_quiz(callback)
+    if quiz is None:
+        return
+    if not claim_launch(quiz):
+        await callback.answer("Viktorina allaqachon yuborilgan.", show_alert=True)
+        return
+    group_id = quiz.group_id
 
-    await callback.message.answer("📤 Viktorina guruhga yuborildi!\n\n🆕 Yangi viktorina tuzish uchun /menu")
+    bot = callback.bot
+    # Callback ni darhol javoblaymiz — katta viktorinalar limitlar sababli bir necha daqiqa yuborilishi mumkin
+    await callback.answer()
     try:
         await callback.message.edit_reply_markup()
     except Exception:
         pass
+
+    await launch_quiz(quiz)
+    await send_quiz_polls(bot, quiz)
+
+    await safe_send_message(bot, group_id, "✅ Viktorina boshlandi!\n\n⏳ Savollar tugagach, tugatish tugmasini bosing.", reply_markup=end_quiz_keyboard())
+
+    await safe_answer(callback.message, "📤 Viktorina guruhga yuborildi!\n\n🆕 Yangi viktorina tuzish uchun /menu")
+
+
+# ----------------------------
+# Paced (timed) mode
+# Har bir savol open_period bilan yuboriladi; u yopilgach keyingisi chiqadi,
+# oxirgisidan keyin viktorina avtomatik yakunlanadi.
+# ----------------------------
+PACE_GRACE = 1  # poll yopilishi va keyingi savol orasidagi zaxira (soniya)
+PACE_RETRY_DELAY = 5  # poll yuborilmasa, keyingi savolgacha kutish
+
+
+@router.callback_query(F.data == "quiz:paced")
+async def choose_pace(callback: CallbackQuery):
+    quiz = await get_owned_quiz(callback)
+    if quiz is None:
+        return
+    await callback.message.edit_text(
+        "⏱ Har bir savolga qancha vaqt berilsin?",
+        reply_markup=pace_period_keyboard()
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("quiz:paced:"))
+async def confirm_paced_quiz(callback: CallbackQuery):
+    try:
+        period = int(callback.data.split(":")[2])
+    except ValueError:
+        await callback.answer("Noto‘g‘ri vaqt", show_alert=True)
+        return
+    if period not in PACE_PERIODS:
+        await callback.answer("Noto‘g‘ri vaqt", show_alert=True)
+        return
+
+    quiz = await get_owned_quiz(callback)
+    if quiz is None:
+        return
+    if not claim_launch(quiz):
+        await callback.answer("Viktorina allaqachon boshlangan.", show_alert=True)
+        return
+    group_id = quiz.group_id
+    bot = callback.bot
+
+    await callback.answer()
+    try:
+        await callback.message.edit_reply_markup()
+    except Exception:
+        pass
+
+    quiz_manager.set_pace(group_id, period, 0)
+    await launch_quiz(quiz)
+    await safe_send_message(
+        bot, group_id,
+        f"✅ Viktorina boshlandi!\n\n⏱ Har bir savolga {period} soniya. "
+        f"Savollar soni: {len(quiz.questions)}.",
+        reply_markup=end_quiz_keyboard()
+    )
+    await safe_answer(callback.message, "📤 Viktorina vaqtli rejimda guruhga yuborilmoqda!\n\n🆕 Yangi viktorina tuzish uchun /menu")
+    await advance_paced(bot, quiz)
+
+
+async def advance_paced(bot, quiz):
+    """Navbatdagi savolni yuboradi va uning yopilishiga taymer qo‘yadi; savollar tugasa yakunlaydi."""
+    group_id = quiz.group_id
+    key = (group_id, quiz.quiz_id)
+    if quiz.next_index >= len(quiz.questions):
+        await finish_quiz(bot, group_id, quiz.quiz_id)
+        return
+
+    i = quiz.next_index
+    q = quiz.questions[i]
+    quiz_manager.set_pace(group_id, quiz.open_period, i + 1)
+    poll_msg = await safe_send_poll(
+        bot,
+        group_id,
+        question=q.question,
+        options=list(q.options),
+        type="quiz",
+        correct_option_id=q.correct_index,
+        is_anonymous=False,
+        open_period=quiz.open_period
+    )
+    if quiz_manager.get_quiz(group_id) is not quiz:
+        return  # yuborish paytida viktorina bekor qilindi
+
+    if poll_msg:
+        quiz_manager.set_poll_id(group_id, i, poll_msg.poll.id)
+        deadline = time.time() + quiz.open_period + PACE_GRACE
+    else:
+        logger.error("Poll yuborilmadi (guruh %s, savol %s)", group_id, i)
+        deadline = time.time() + PACE_RETRY_DELAY
+
+    timers.schedule(key, deadline)
+    await db.save_timer(group_id, quiz.quiz_id, deadline)
+
+
+async def on_pace_timer(bot, key):
+    group_id, quiz_id = key
+    quiz = quiz_manager.get_quiz(group_id)
+    if quiz is not None and quiz.quiz_id == quiz_id:
+        await advance_paced(bot, quiz)
+        return
+    # Restartdan keyin viktorina xotirada yo‘q — natijalar DB da, yakuniy reytingni chiqaramiz
+    await db.delete_timer(group_id, quiz_id)
+    if quiz is None:
+        await finish_quiz(bot, group_id, quiz_id)
+
+
+async def restore_quizzes():
+    """Startupda viktorinalarni jurnaldan tiklaydi; boshlanganlarining reytingi va statistikasi DB dan yuklanadi."""
+    await quiz_journal.restore(quiz_manager)
+    quiz_journal.start()
+    for quiz in list(quiz_manager.active_quizzes.values()):
+        if not quiz_started(quiz):
+            continue  # hali yuborilmagan qoralama
+        players = await db.count_players(quiz.quiz_id, quiz.group_id)
+        leaderboards.open(quiz.quiz_id, quiz.group_id, await db.get_leaderboard(quiz.quiz_id, quiz.group_id, players))
+        analytics.open(quiz, await db.get_question_stats(quiz.quiz_id, quiz.group_id))
+
+
+async def restore_timers(bot):
+    """Startupda saqlangan muddatlardan taymerlarni tiklaydi."""
+    timers.start(lambda key: on_pace_timer(bot, key))
+    for group_id, quiz_id, deadline in await db.get_timers():
+        timers.schedule((group_id, quiz_id), deadline)
+
+
+# ----------------------------
+# Multi-group broadcast
+# Bitta viktorina egasining bir nechta guruhiga yuboriladi: quiz_id umumiy,
+# har bir guruh o‘z Quiz nusxasi va poll_id lariga ega.
+# ----------------------------
+BROADCAST_CONCURRENCY = 8  # bir vaqtda polllari yuborilayotgan guruhlar soni
+
+
+def quiz_started(quiz) -> bool:
+    return quiz.open_period is not None or any(q.poll_id is not None for q in quiz.questions)
+
+
+def claim_launch(quiz) -> bool:
+    """Viktorinani yuborishga band qiladi (birinchi await dan oldin chaqiriladi).
+
+    Tasdiq tugmasi ikki marta bosilsa, ikkinchisi birinchisining await lari orasida
+    kelishi mumkin — poll_id/open_period hali yozilmagan bo'ladi, shuning uchun bayroq.
+    """
+    if quiz.launched or quiz_started(quiz):
+        return False
+    quiz.launched = True
+    return True
+
+
+@router.callback_query(F.data == "quiz:multi")
+async def choose_broadcast_groups(callback: CallbackQuery, state: FSMContext):
+    quiz = await get_owned_quiz(callback)
+    if quiz is None:
+        return
+    if quiz_started(quiz):
+        await callback.answer("Viktorina allaqachon yuborilgan.", show_alert=True)
+        return
+
+    groups = await membership.get_groups(callback.from_user.id)
+    selected = [quiz.group_id]
+    await state.update_data(broadcast_targets=selected)
+    await callback.message.edit_text(
+        "📡 Viktorina qaysi guruhlarga yuborilsin? Tanlab, so‘ng yuborish tugmasini bosing.",
+        reply_markup=broadcast_groups_keyboard(groups, set(selected))
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("bc_toggle:"))
+async def toggle_broadcast_group(callback: CallbackQuery, state: FSMContext):
+    try:
+        group_id = int(callback.data.split(":", 1)[1])
+    except ValueError:
+        await callback.answer("❌ Noto‘g‘ri guruh tanlandi.", show_alert=True)
+        return
+
+    data = await state.get_data()
+    selected = set(data.get("broadcast_targets") or [])
+    selected ^= {group_id}
+    await state.update_data(broadcast_targets=sorted(selected))
+
+    groups = await membership.get_groups(callback.from_user.id)
+    try:
+        await callback.message.edit_reply_markup(reply_markup=broadcast_groups_keyboard(groups, selected))
+    except TelegramBadRequest:
+        pass
+    await callback.answer()
+
+
+@router.callback_query(F.data == "bc_send")
+async def confirm_broadcast(callback: CallbackQuery, state: FSMContext):
+    quiz = await get_owned_quiz(callback)
+    if quiz is None:
+        return
+    if not claim_launch(quiz):
+        await callback.answer("Viktorina allaqachon yuborilgan.", show_alert=True)
+        return
+
+    groups = dict(await membership.get_groups(callback.from_user.id))
+    data = await state.get_data()
+    targets = [gid for gid in data.get("broadcast_targets") or [] if gid in groups]
+    if not targets:
+        quiz.launched = False  # hech narsa yuborilmadi — qayta tanlash mumkin
+        await callback.answer("Kamida bitta guruhni tanlang.", show_alert=True)
+        return
+
+    bot = callback.bot
+    await callback.answer()
+    await state.update_data(broadcast_targets=None)
+    try:
+        await callback.message.edit_reply_markup()
+    except Exception:
+        pass
+
+    # Har bir guruh uchun alohida nusxa; boshqa viktorina faol bo‘lgan guruhlar o‘tkazib yuboriladi
+    source = quiz.group_id
+    quizzes, busy = [], []
+    for gid in targets:
+        if gid == source:
+            quizzes.append(quiz)
+            continue
+        other = quiz_manager.get_quiz(gid)
+        if other is not None and other.quiz_id != quiz.quiz_id:
+            busy.append(gid)
+            continue
+        copy = quiz_manager.copy_quiz(source, gid)
+        copy.launched = True
+        quizzes.append(copy)
+    if source not in targets:
+        quiz.launched = False  # qoralama faqat nusxalar uchun shablon edi — tarixga yozilmaydi
+        await clear_quiz(bot, source)
+
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+
+    async def start_in_group(q):
+        async with semaphore:
+            await launch_quiz(q)
+            sent = await send_quiz_polls(bot, q)
+            await safe_send_message(
+                bot, q.group_id,
+                "✅ Viktorina boshlandi!\n\n⏳ Savollar tugagach, tugatish tugmasini bosing.",
+                reply_markup=end_quiz_keyboard()
+            )
+            return q.group_id, sent
+
+    report = await asyncio.gather(*(start_in_group(q) for q in quizzes))
+
+    lines = ["📤 Viktorina guruhlarga yuborildi:\n"]
+    for gid, sent in report:
+        icon = "✅" if sent == len(quiz.questions) else "⚠️"
+        lines.append(f"{icon} <b>{html.escape(groups[gid] or str(gid))}</b> — {sent}/{len(quiz.questions)} savol")
+    for gid in busy:
+        lines.append(f"⏭ <b>{html.escape(groups[gid] or str(gid))}</b> — guruhda boshqa viktorina faol")
+    lines.append("\n🆕 Yangi viktorina tuzish uchun /menu")
+    await safe_answer(callback.message, "\n".join(lines), reply_markup=broadcast_results_keyboard(quiz.quiz_id))
+
+
+async def owns_quiz_results(user_id: int, quiz_id: int) -> bool:
+    """Umumiy natijalar faqat viktorina yuborilgan barcha guruhlar foydalanuvchiniki bo‘lsa ko‘rinadi."""
+    groups = dict(await membership.get_groups(user_id))
+    # Hali javob kelmagan, lekin viktorina faol bo‘lgan guruhlar ham hisobga kiradi (quiz_id indeksi)
+    if not quiz_manager.get_groups_by_quiz_id(quiz_id) <= groups.keys():
+        return False
+    # Hali yozilmagan javoblar ham hisobga kirsin
+    await result_writer.flush()
+    return all(gid in groups for gid, *_ in await db.get_quiz_groups(quiz_id))
+
+
+@router.callback_query(F.data.startswith("bc_results:"))
+async def broadcast_results(callback: CallbackQuery):
+    try:
+        quiz_id = int(callback.data.split(":", 1)[1])
+    except ValueError:
+        await callback.answer("❌ Noto‘g‘ri so‘rov.", show_alert=True)
+        return
+
+    if not await owns_quiz_results(callback.from_user.id, quiz_id):
+        await callback.answer("❌ Bu natijalar faqat viktorina egasiga ko‘rinadi.", show_alert=True)
+        return
+    text, markup = await leaderboard_pages.render(callback.bot, COMBINED, quiz_id, 0)
+    if text is None:
+        await callback.answer("📊 Hali hech kim qatnashmadi.", show_alert=True)
+        return
+
+    await safe_answer(callback.message, text, parse_mode="HTML", reply_markup=markup)
     await callback.answer()
 
 
@@ -609,18 +1106,19 @@ async def handle_poll_answer(poll_answer: PollAnswer):
     option_ids = poll_answer.option_ids or []
     poll_id = poll_answer.poll_id
 
-    for group_id, quiz in quiz_manager.active_quizzes.items():
-        for q in quiz["questions"]:
-            if q.get("poll_id") == poll_id:
-                quiz_id = quiz.get("quiz_id")
-                is_correct = (len(option_ids) == 1 and option_ids[0] == q["correct_index"])
-                try:
-                    success = db.add_result(quiz_id, user_id, group_id, is_correct)
-                    if not success:
-                        logger.error("Natija DB ga saqlanmadi: quiz_id=%s, user_id=%s", quiz_id, user_id)
-                except Exception as e:
-                    logger.exception("DB.add_result xato: %s", e)
-                return
+    # Ismni keshga yozib qo'yamiz — reytingda get_chat chaqirish shart bo'lmaydi
+    profiles.remember(poll_answer.user)
+
+    found = quiz_manager.find_poll(poll_id)
+    if found is None:
+        return
+    quiz, q = found
+    is_correct = (len(option_ids) == 1 and option_ids[0] == q.correct_index)
+    # DB ga darhol yozmaymiz — result_writer partiyalab yozadi
+    result_writer.record(quiz.quiz_id, user_id, quiz.group_id, is_correct)
+    leaderboards.record(quiz.quiz_id, quiz.group_id, user_id, is_correct)
+    leaderboard_pages.touch(quiz.quiz_id, quiz.group_id)
+    analytics.record(quiz.quiz_id, quiz.group_id, q.index, option_ids)
 
 
 # ----------------------------
@@ -641,47 +1139,56 @@ async def end_quiz(event):
     try:
         member = await bot.get_chat_member(group_id, user_id)
         if member.status not in ("creator", "administrator"):
-            await bot.send_message(group_id, "❌ Faqat admin viktorinani tugatishi mumkin.")
+            await safe_send_message(bot, group_id, "❌ Faqat admin viktorinani tugatishi mumkin.")
             return
     except Exception as e:
         logger.exception("get_chat_member xato: %s", e)
-        await bot.send_message(group_id, "❌ A'zo ma'lumotini olishda xato yuz berdi.")
+        await safe_send_message(bot, group_id, "❌ A'zo ma'lumotini olishda xato yuz berdi.")
         return
 
     quiz = quiz_manager.get_quiz(group_id)
     if not quiz:
-        await bot.send_message(group_id, "❌ Bu guruh uchun aktiv viktorina topilmadi.")
+        await safe_send_message(bot, group_id, "❌ Bu guruh uchun aktiv viktorina topilmadi.")
         return
 
-    quiz_id = quiz.get("quiz_id")
-    leaderboard = db.get_leaderboard(quiz_id, group_id, limit=50)
+    await finish_quiz(bot, group_id, quiz.quiz_id)
 
-    if not leaderboard:
-        await bot.send_message(group_id, "📊 Hali hech kim qatnashmadi.")
-        quiz_manager.clear_quiz(group_id)
-        return
 
-    total_players = len(leaderboard)
-    text = f"🏁 Viktorina yakunlandi!\n\n👥 Qatnashchilar soni: {total_players}\n\n"
+async def finish_quiz(bot, group_id: int, quiz_id: int):
+    """Yakuniy reytingni guruhga yuboradi va viktorinani tozalaydi.
 
-    for i, row in enumerate(leaderboard, start=1):
-        uid, correct, total = row
-        medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
-        try:
-            user_obj = await bot.get_chat(uid)
-            display_name = f"@{user_obj.username}" if user_obj.username else \
-                (user_obj.first_name + (" " + user_obj.last_name if user_obj.last_name else "")).strip() or str(uid)
-        except Exception:
-            display_name = str(uid)
-        text += f"{medal} <a href='tg://user?id={uid}'>{display_name}</a> — {correct}/{total} ball\n"
+    Viktorina xotirada bo‘lmasa ham (masalan, restartdan keyin) natijalar DB dan olinadi.
+    """
+    if quiz_manager.get_quiz_id(group_id) == quiz_id:
+        # Boshlangan bo'lsa reyting muzlatiladi; hech qachon yuborilmagan qoralama tarixga yozilmaydi
+        await clear_quiz(bot, group_id)
+    else:
+        await freeze_run(bot, quiz_id, group_id)
 
-    await bot.send_message(group_id, text, parse_mode="HTML")
-    quiz_manager.clear_quiz(group_id)
+    text, markup = await leaderboard_pages.render(bot, QUIZ, quiz_id, group_id)
+    if text is None:
+        await safe_send_message(bot, group_id, "📊 Hali hech kim qatnashmadi.")
+        return
+    await safe_send_message(bot, group_id, text, parse_mode="HTML", reply_markup=markup)
 
 
 # ----------------------------
 # Show rating / leaderboard
 # ----------------------------
+async def render_quiz_rating(bot, group_id: int, user_id: int):
+    """Guruhdagi faol viktorina reytingining 1-sahifasi va so‘ragan foydalanuvchining o‘rni."""
+    quiz_id = quiz_manager.get_quiz_id(group_id)
+    if not quiz_id:
+        return "❌ Aktiv viktorina topilmadi.", None
+    text, markup = await leaderboard_pages.render(bot, QUIZ, quiz_id, group_id)
+    if text is None:
+        return "📊 Hali hech kim qatnashmadi.", None
+    my_rank = await leaderboards.rank(quiz_id, group_id, user_id)
+    if my_rank:
+        text += f"\n📍 Sizning o‘rningiz: {my_rank[0]} — {my_rank[1]}/{my_rank[2]} ball\n"
+    return text, markup
+
+
 @router.message(Command("rating"))
 @router.message(Command("reyting"))
 @router.message(F.text == "📊 Reyting")
@@ -690,45 +1197,17 @@ async def show_rating_cmd(message: Message):
 
     # Guruhda yozilgan bo‘lsa -> shu guruh uchun ko‘rsatamiz
     if message.chat.type in ("group", "supergroup"):
-        group_id = message.chat.id
-        quiz = quiz_manager.get_quiz(group_id)
-        quiz_id = quiz.get("quiz_id") if quiz else None
-
-        if not quiz_id:
-            await message.answer("❌ Aktiv viktorina topilmadi.")
-            return
-
-        leaderboard = db.get_leaderboard(quiz_id, group_id, limit=10)
-        if not leaderboard:
-            await message.answer("📊 Hali hech kim qatnashmadi.")
-            return
-
-        text = "🏆 Viktorina reytingi:\n\n"
-        for i, row in enumerate(leaderboard, start=1):
-            uid, correct, total = row
-            try:
-                user_obj = await bot.get_chat(uid)
-                display_name = f"@{user_obj.username}" if user_obj.username else \
-                    (user_obj.first_name + (" " + user_obj.last_name if user_obj.last_name else "")).strip() or str(uid)
-            except Exception:
-                display_name = str(uid)
-
-            text += f"{i}. <a href='tg://user?id={uid}'>{display_name}</a> — {correct}/{total} ball\n"
-
-        await message.answer(text, parse_mode="HTML")
+        text, markup = await render_quiz_rating(bot, message.chat.id, message.from_user.id)
+        await safe_answer(message, text, parse_mode="HTML", reply_markup=markup)
         return
 
     # Shaxsiy chat -> foydalanuvchi guruh tanlashi kerak
     user_id = message.from_user.id
-    try:
-        groups = db.get_groups(user_id) or []
-    except Exception:
-        g = db.get_group(user_id)
-        groups = [g] if g else []
+    groups = await membership.get_groups(user_id)
 
     if not groups:
-        me = await bot.get_me()
-        await message.answer(
+        me = await membership.get_me(bot)
+        await safe_answer(message,
             "❌ Sizda saqlangan guruh yo‘q.\n\n➕ Avval botni guruhga qo‘shing:",
             reply_markup=add_to_group_keyboard(me.username)
         )
@@ -736,87 +1215,410 @@ async def show_rating_cmd(message: Message):
 
     # faqat 1 ta guruh bo‘lsa -> avtomatik ko‘rsatamiz
     if len(groups) == 1:
-        gid = groups[0][0] if isinstance(groups[0], tuple) else groups[0]
-        quiz = quiz_manager.get_quiz(gid)
-        quiz_id = quiz.get("quiz_id") if quiz else None
+        text, markup = await render_quiz_rating(bot, groups[0][0], user_id)
+        await safe_answer(message, text, parse_mode="HTML", reply_markup=markup)
+        return
 
-        if not quiz_id:
-            await message.answer("❌ Ushbu guruh uchun aktiv viktorina topilmadi.")
-            return
+    # bir nechta guruh bo‘lsa -> foydalanuvchiga tanlash uchun ro‘yxat chiqaramiz
+    await safe_answer(message,
+        "📌 Qaysi guruhning reytingini ko‘rmoqchisiz?",
+        reply_markup=groups_inline_keyboard(groups, prefix="show_rating")
+    )
 
-        leaderboard = db.get_leaderboard(quiz_id, gid, limit=10)
-        if not leaderboard:
-            await message.answer("📊 Hali hech kim qatnashmadi.")
-            return
 
-        text = "🏆 Viktorina reytingi:\n\n"
-        for i, row in enumerate(leaderboard, start=1):
-            uid, correct, total = row
-            try:
-                user_obj = await bot.get_chat(uid)
-                display_name = f"@{user_obj.username}" if user_obj.username else \
-                    (user_obj.first_name + (" " + user_obj.last_name if user_obj.last_name else "")).strip() or str(uid)
-            except Exception:
-                display_name = str(uid)
 
-            text += f"{i}. <a href='tg://user?id={uid}'>{display_name}</a> — {correct}/{total} ball\n"
+@router.callback_query(F.data.startswith("show_rating:"))
+async def show_rating_callback(callback: CallbackQuery):
+    try:
+        gid = int(callback.data.split(":", 1)[1])
+    except Exception:
+        await callback.answer("Noto'g'ri guruh.", show_alert=True)
+        return
+    if not await can_view_group(callback, gid):
+        await callback.answer("❌ Bu reyting sizga ko‘rinmaydi.", show_alert=True)
+        return
+
+    text, markup = await render_quiz_rating(callback.bot, gid, callback.from_user.id)
+    await safe_answer(callback.message, text, parse_mode="HTML", reply_markup=markup)
+    await callback.answer()
+
 
-        await message.answer(text, parse_mode="HTML")
+@router.callback_query(F.data.startswith("lb:"))
+async def leaderboard_page(callback: CallbackQuery):
+    """Reyting sahifalari orasida o‘tish (xabar joyida tahrirlanadi)."""
+    try:
+        _, kind, quiz_id, group_id, page = callback.data.split(":")
+        quiz_id, group_id, page = int(quiz_id), int(group_id), int(page)
+    except ValueError:
+        await callback.answer("❌ Noto‘g‘ri so‘rov.", show_alert=True)
+        return
+    if kind not in (QUIZ, GROUP, COMBINED) or page < 0:
+        await callback.answer("❌ Noto‘g‘ri so‘rov.", show_alert=True)
         return
 
-    # bir nechta guruh bo‘lsa -> foydalanuvchiga tanlash uchun ro‘yxat chiqaramiz
-    group_list = []
-    for g in groups:
-        gid = g[0] if isinstance(g, tuple) else g
-        try:
-            chat = await bot.get_chat(gid)
-            group_list.append((gid, chat.title))
-        except Exception:
-            group_list.append((gid, None))
+    if kind == COMBINED:
+        allowed = await owns_quiz_results(callback.from_user.id, quiz_id)
+    else:
+        allowed = await can_view_group(callback, group_id)
+    if not allowed:
+        await callback.answer("❌ Bu reyting sizga ko‘rinmaydi.", show_alert=True)
+        return
 
-    await message.answer(
-        "📌 Qaysi guruhning reytingini ko‘rmoqchisiz?",
-        reply_markup=groups_inline_keyboard(group_list, prefix="show_rating")
-    )
+    text, markup = await leaderboard_pages.render(callback.bot, kind, quiz_id, group_id, page)
+    if text is None:
+        await callback.answer("📄 Bu sahifa bo‘sh.", show_alert=True)
+        return
+    try:
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=markup)
+    except TelegramBadRequest:
+        pass  # matn o‘zgarmagan
+    await callback.answer()
 
 
+# ----------------------------
+# All-time statistics (user_group_stats rollup jadvalidan)
+# ----------------------------
+@router.message(Command("mystats"))
+async def my_stats_cmd(message: Message):
+    user_id = message.from_user.id
+    # Hali yozilmagan javoblar ham hisobga kirsin
+    await result_writer.flush()
+    rows = await db.get_user_stats(user_id)
 
-@router.callback_query(F.data.startswith("show_rating:"))
-async def show_rating_callback(callback: CallbackQuery):
+    # Guruhda — faqat shu guruh bo‘yicha
+    if message.chat.type in ("group", "supergroup"):
+        rows = [r for r in rows if r[0] == message.chat.id]
+
+    if not rows:
+        await safe_answer(message, "📊 Siz hali hech qaysi viktorinada qatnashmagansiz.")
+        return
+
+    text = "📈 Sizning umumiy natijalaringiz:\n\n"
+    sum_correct = sum_total = sum_played = 0
+    for gid, correct, total, played in rows:
+        title = html.escape(membership.get_title(gid) or f"ID {gid}")
+        accuracy = correct * 100 // total if total else 0
+        text += f"👥 <b>{title}</b>: {correct}/{total} ({accuracy}%), {played} ta viktorina\n"
+        sum_correct += correct
+        sum_total += total
+        sum_played += played
+
+    if len(rows) > 1:
+        accuracy = sum_correct * 100 // sum_total if sum_total else 0
+        text += f"\n🧮 Jami: {sum_correct}/{sum_total} ({accuracy}%), {sum_played} ta viktorina"
+
+    await safe_answer(message, text, parse_mode="HTML")
+
+
+async def render_group_stats(bot, group_id: int):
+    """(matn, markup) — guruhning umumiy reytingi 1-sahifasi; natija bo‘lmasa (None, None)."""
+    return await leaderboard_pages.render(bot, GROUP, 0, group_id)
+
+
+@router.message(Command("top"))
+async def group_top_cmd(message: Message):
+    if message.chat.type in ("group", "supergroup"):
+        text, markup = await render_group_stats(message.bot, message.chat.id)
+        await safe_answer(message, text or "📊 Bu guruhda hali natijalar yo‘q.", parse_mode="HTML", reply_markup=markup)
+        return
+
+    groups = await membership.get_groups(message.from_user.id)
+    if not groups:
+        await safe_answer(message, "❌ Sizda saqlangan guruh yo‘q.")
+        return
+    if len(groups) == 1:
+        text, markup = await render_group_stats(message.bot, groups[0][0])
+        await safe_answer(message, text or "📊 Bu guruhda hali natijalar yo‘q.", parse_mode="HTML", reply_markup=markup)
+        return
+    await safe_answer(message,
+        "📌 Qaysi guruhning umumiy reytingini ko‘rmoqchisiz?",
+        reply_markup=groups_inline_keyboard(groups, prefix="group_top")
+    )
+
+
+@router.callback_query(F.data.startswith("group_top:"))
+async def group_top_callback(callback: CallbackQuery):
     try:
         gid = int(callback.data.split(":", 1)[1])
     except Exception:
         await callback.answer("Noto'g'ri guruh.", show_alert=True)
         return
+    if not await can_view_group(callback, gid):
+        await callback.answer("❌ Bu guruh sizga tegishli emas.", show_alert=True)
+        return
+    text, markup = await render_group_stats(callback.bot, gid)
+    await safe_answer(callback.message, text or "📊 Bu guruhda hali natijalar yo‘q.", parse_mode="HTML", reply_markup=markup)
+    await callback.answer()
 
-    quiz = quiz_manager.get_quiz(gid)
-    quiz_id = quiz.get("quiz_id") if quiz else None
-    if not quiz_id:
-        await callback.message.answer("❌ Ushbu guruh uchun aktiv viktorina topilmadi.")
-        await callback.answer()
+
+# ----------------------------
+# /quizstats — savollar bo‘yicha statistika (oxirgi yoki joriy viktorina)
+# ----------------------------
+STATS_TEXT_LIMIT = 3800  # Telegram 4096 belgi chegarasidan zaxira bilan
+
+
+async def render_quiz_stats(group_id: int, reveal: bool = True):
+    quiz = quiz_manager.get_quiz(group_id)
+    if quiz is not None and (quiz.quiz_id, group_id) in analytics:
+        quiz_id = quiz.quiz_id
+    else:
+        quiz = None
+        quiz_id = await db.get_last_stats_quiz(group_id)
+        if quiz_id is None:
+            return None
+    summary = await analytics.get(quiz_id, group_id)
+    if not summary:
+        return None
+
+    title = html.escape(membership.get_title(group_id) or f"ID {group_id}")
+    status = "⏳ davom etmoqda" if quiz is not None else "🏁 yakunlangan"
+    parts = [f"📈 <b>{title}</b> — savollar statistikasi ({status})\n"]
+    length = len(parts[0])
+    for i, question, options, correct, answerers, counts in summary:
+        rate = counts[correct] * 100 // answerers if answerers else 0
+        lines = [f"<b>{i + 1}. {html.escape(question[:80])}</b>",
+                 f"👥 {answerers} ta javob · ✅ {rate}% to‘g‘ri" if reveal else f"👥 {answerers} ta javob"]
+        for j, (option, n) in enumerate(zip(options, counts)):
+            share = n * 100 // answerers if answerers else 0
+            mark = " ✅" if reveal and j == correct else ""
+            lines.append(f"   {j + 1}) {html.escape(option[:30])} — {n} ({share}%){mark}")
+        block = "\n".join(lines) + "\n"
+        if length + len(block) > STATS_TEXT_LIMIT:
+            parts.append(f"… yana {len(summary) - i} ta savol")
+            break
+        parts.append(block)
+        length += len(block)
+    return "\n".join(parts)
+
+
+@router.message(Command("quizstats"))
+async def quiz_stats_cmd(message: Message):
+    if message.chat.type in ("group", "supergroup"):
+        # Guruhda viktorina davom etayotgan bo‘lsa, to‘g‘ri javoblar oshkor qilinmaydi
+        reveal = quiz_manager.get_quiz(message.chat.id) is None
+        text = await render_quiz_stats(message.chat.id, reveal=reveal)
+        await safe_answer(message, text or "📊 Bu guruhda hali savollar statistikasi yo‘q.", parse_mode="HTML")
+        return
+
+    groups = await membership.get_groups(message.from_user.id)
+    if not groups:
+        await safe_answer(message, "❌ Sizda saqlangan guruh yo‘q.")
+        return
+    if len(groups) == 1:
+        text = await render_quiz_stats(groups[0][0])
+        await safe_answer(message, text or "📊 Bu guruhda hali savollar statistikasi yo‘q.", parse_mode="HTML")
         return
+    await safe_answer(message,
+        "📌 Qaysi guruhning viktorina statistikasini ko‘rmoqchisiz?",
+        reply_markup=groups_inline_keyboard(groups, prefix="quizstats")
+    )
+
 
-    leaderboard = db.get_leaderboard(quiz_id, gid, limit=10)
+@router.callback_query(F.data.startswith("quizstats:"))
+async def quiz_stats_callback(callback: CallbackQuery):
+    try:
+        gid = int(callback.data.split(":", 1)[1])
+    except Exception:
+        await callback.answer("Noto'g'ri guruh.", show_alert=True)
+        return
+    if gid not in dict(await membership.get_groups(callback.from_user.id)):
+        await callback.answer("❌ Bu guruh sizga tegishli emas.", show_alert=True)
+        return
+    text = await render_quiz_stats(gid)
+    await safe_answer(callback.message, text or "📊 Bu guruhda hali savollar statistikasi yo‘q.", parse_mode="HTML")
+    await callback.answer()
+
+
+# ----------------------------
+# /history — o‘tgan viktorinalar (guruhda — guruh tarixi, shaxsiy chatda — egasining viktorinalari)
+# Sahifalar keyset (kursor) bilan: tugmalarda sahifaning chetki quiz_id lari saqlanadi
+# ----------------------------
+HISTORY_PAGE_SIZE = 10
+
+
+def format_time(ts) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.gmtime(ts)) if ts else "—"
+
+
+def parse_cursor(parts):
+    """[..., 'a'|'b', cursor] -> (before, after)."""
+    direction, cursor = parts[-2], int(parts[-1])
+    return (None, cursor) if direction == "a" else (cursor, None)
+
+
+async def render_group_history(group_id: int, before=None, after=None):
+    rows, older, newer = await db.get_group_history(group_id, before, after, HISTORY_PAGE_SIZE)
+    if not rows:
+        return None, None
+    title = html.escape(membership.get_title(group_id) or f"ID {group_id}")
+    lines = [f"🗂 <b>{title}</b> — viktorinalar tarixi\n"]
+    entries = []
+    for n, (quiz_id, questions, started_at, ended_at, participants) in enumerate(rows, start=1):
+        status = f"👥 {participants}" if ended_at is not None else "⏳ davom etmoqda"
+        lines.append(f"{n}. #{quiz_id} · {format_time(started_at)} · {questions or '?'} savol · {status}")
+        entries.append((str(n), f"hist_run:{quiz_id}:{group_id}"))
+    markup = history_keyboard(entries, f"hist_g:{group_id}", rows[0][0], rows[-1][0], newer, older)
+    return "\n".join(lines), markup
+
+
+async def render_owner_history(owner_id: int, before=None, after=None):
+    rows, older, newer = await db.get_owner_history(owner_id, before, after, HISTORY_PAGE_SIZE)
+    if not rows:
+        return None, None
+    lines = ["🗂 Siz o‘tkazgan viktorinalar\n"]
+    entries = []
+    for n, (quiz_id, size, start_time, groups, participants) in enumerate(rows, start=1):
+        lines.append(f"{n}. #{quiz_id} · {(start_time or '—')[:16]} · {size} savol · "
+                     f"{groups} guruh · 👥 {participants or 0}")
+        entries.append((str(n), f"hist_quiz:{quiz_id}"))
+    markup = history_keyboard(entries, "hist_o", rows[0][0], rows[-1][0], newer, older)
+    return "\n".join(lines), markup
+
+
+def render_run(run) -> str:
+    """Muzlatilgan yakuniy reyting (quiz_runs.leaderboard) matni."""
+    quiz_id, group_id, _, questions, started_at, ended_at, participants, leaderboard = run
+    title = html.escape(membership.get_title(group_id) or f"ID {group_id}")
+    text = f"🏁 <b>{title}</b> — viktorina #{quiz_id}\n📅 {format_time(started_at)} · {questions or '?'} savol\n"
+    if ended_at is None:
+        return text + "\n⏳ Viktorina hali davom etmoqda — joriy reyting: /rating"
+    text += f"👥 Qatnashchilar soni: {participants}\n\n"
     if not leaderboard:
-        await callback.message.answer("📊 Hali hech kim qatnashmadi.")
-        await callback.answer()
+        return text + "📊 Hech kim qatnashmagan."
+    for i, (uid, name, correct, total) in enumerate(leaderboard, start=1):
+        line = f"{MEDALS.get(i, f'{i}.')} <a href='tg://user?id={uid}'>{short_name(name)}</a> — {correct}/{total} ball\n"
+        if len(text) + len(line) > STATS_TEXT_LIMIT:
+            break
+        text += line
+    return text
+
+
+async def can_view_group(callback: CallbackQuery, group_id: int) -> bool:
+    """Guruhning o‘zida bosilgan tugma yoki foydalanuvchining guruhi bo‘lsa."""
+    if callback.message and callback.message.chat.id == group_id:
+        return True
+    return group_id in dict(await membership.get_groups(callback.from_user.id))
+
+
+@router.message(Command("history"))
+async def history_cmd(message: Message):
+    if message.chat.type in ("group", "supergroup"):
+        text, markup = await render_group_history(message.chat.id)
+        await safe_answer(message, text or "🗂 Bu guruhda hali viktorina o‘tkazilmagan.",
+                          parse_mode="HTML", reply_markup=markup)
         return
+    text, markup = await render_owner_history(message.from_user.id)
+    await safe_answer(message, text or "🗂 Siz hali birorta viktorina o‘tkazmagansiz.",
+                      parse_mode="HTML", reply_markup=markup)
+
+
+@router.callback_query(F.data.startswith("hist_g:"))
+async def group_history_page(callback: CallbackQuery):
+    try:
+        parts = callback.data.split(":")
+        group_id = int(parts[1])
+        before, after = parse_cursor(parts)
+    except (IndexError, ValueError):
+        await callback.answer("❌ Noto‘g‘ri so‘rov.", show_alert=True)
+        return
+    if not await can_view_group(callback, group_id):
+        await callback.answer("❌ Bu guruh sizga tegishli emas.", show_alert=True)
+        return
+    text, markup = await render_group_history(group_id, before, after)
+    if text:
+        try:
+            await callback.message.edit_text(text, parse_mode="HTML", reply_markup=markup)
+        except TelegramBadRequest:
+            pass
+    await callback.answer()
+
 
-    text = "🏆 Viktorina reytingi:\n\n"
-    for i, row in enumerate(leaderboard, start=1):
-        uid, correct, total = row
+@router.callback_query(F.data.startswith("hist_o:"))
+async def owner_history_page(callback: CallbackQuery):
+    try:
+        before, after = parse_cursor(callback.data.split(":"))
+    except (IndexError, ValueError):
+        await callback.answer("❌ Noto‘g‘ri so‘rov.", show_alert=True)
+        return
+    text, markup = await render_owner_history(callback.from_user.id, before, after)
+    if text:
         try:
-            user_obj = await callback.bot.get_chat(uid)
-            display_name = f"@{user_obj.username}" if user_obj.username else \
-                (user_obj.first_name + (" " + user_obj.last_name if user_obj.last_name else "")).strip() or str(uid)
-        except Exception:
-            display_name = str(uid)
-        text += f"{i}. <a href='tg://user?id={uid}'>{display_name}</a> — {correct}/{total} ball\n"
-
-    await callback.message.answer(text, parse_mode="HTML")
+            await callback.message.edit_text(text, parse_mode="HTML", reply_markup=markup)
+        except TelegramBadRequest:
+            pass
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("hist_run:"))
+async def history_run(callback: CallbackQuery):
+    try:
+        _, quiz_id, group_id = callback.data.split(":")
+        quiz_id, group_id = int(quiz_id), int(group_id)
+    except ValueError:
+        await callback.answer("❌ Noto‘g‘ri so‘rov.", show_alert=True)
+        return
+    run = await db.get_run(quiz_id, group_id)
+    if run is None:
+        await callback.answer("❌ Viktorina topilmadi.", show_alert=True)
+        return
+    if run[2] != callback.from_user.id and not await can_view_group(callback, group_id):
+        await callback.answer("❌ Bu viktorina sizga tegishli emas.", show_alert=True)
+        return
+    await safe_answer(callback.message, render_run(run), parse_mode="HTML")
     await callback.answer()
 
 
+@router.callback_query(F.data.startswith("hist_quiz:"))
+async def history_quiz(callback: CallbackQuery):
+    try:
+        quiz_id = int(callback.data.split(":", 1)[1])
+    except ValueError:
+        await callback.answer("❌ Noto‘g‘ri so‘rov.", show_alert=True)
+        return
+    runs = await db.get_quiz_runs(quiz_id)
+    if not runs or runs[0][2] != callback.from_user.id:
+        await callback.answer("❌ Bu viktorina sizga tegishli emas.", show_alert=True)
+        return
+
+    lines = [f"🗂 Viktorina #{quiz_id} — guruhlar bo‘yicha\n"]
+    entries = []
+    for n, (_, group_id, _, _, _, ended_at, participants, leaderboard) in enumerate(runs, start=1):
+        title = html.escape(membership.get_title(group_id) or f"ID {group_id}")
+        if ended_at is None:
+            lines.append(f"{n}. <b>{title}</b> — ⏳ davom etmoqda")
+        else:
+            winner = f", 🥇 {leaderboard[0][1]} ({leaderboard[0][2]}/{leaderboard[0][3]})" if leaderboard else ""
+            lines.append(f"{n}. <b>{title}</b> — 👥 {participants}{winner}")
+        entries.append((str(n), f"hist_run:{quiz_id}:{group_id}"))
+    markup = history_keyboard(entries, "hist_o", None, None, False, False)
+    await safe_answer(callback.message, "\n".join(lines), parse_mode="HTML", reply_markup=markup)
+    await callback.answer()
+
+
+# ----------------------------
+# /stats — bot metrikalari (faqat ADMIN_IDS dagi foydalanuvchilar uchun)
+# ----------------------------
+def parse_admin_ids(raw: str) -> set:
+    """"1, 2 3" -> {1, 2, 3}; noto'g'ri qiymatlar log qilinib o'tkazib yuboriladi."""
+    ids = set()
+    for item in raw.replace(",", " ").split():
+        try:
+            ids.add(int(item))
+        except ValueError:
+            logger.warning("ADMIN_IDS: noto'g'ri qiymat o'tkazib yuborildi: %r", item)
+    return ids
+
+
+ADMIN_IDS = parse_admin_ids(os.getenv("ADMIN_IDS", ""))
+
+
+@router.message(Command("stats"), F.chat.type == "private")
+async def bot_stats_cmd(message: Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    await safe_answer(message, metrics_summary(), parse_mode="HTML")
+
+
 # ----------------------------
 # Cancel handlers
 # ----------------------------
@@ -824,18 +1626,14 @@ async def show_rating_callback(callback: CallbackQuery):
 async def cancel_quiz(callback: CallbackQuery, state: FSMContext):
     user_id = callback.from_user.id
 
-    try:
-        groups = db.get_groups(user_id) or []
-    except Exception:
-        g = db.get_group(user_id)
-        groups = [g] if g else []
+    groups = await membership.get_groups(user_id)
 
     if groups:
         for gid, _ in groups:
-            quiz_manager.clear_quiz(gid)
+            await clear_quiz(callback.bot, gid)
 
     try:
-        await callback.message.answer("❌ Viktorina bekor qilindi.")
+        await safe_answer(callback.message, "❌ Viktorina bekor qilindi.")
         await callback.message.edit_reply_markup()
     except Exception:
         pass
@@ -849,16 +1647,12 @@ async def cancel_quiz(callback: CallbackQuery, state: FSMContext):
 async def cancel_creation(message: Message, state: FSMContext):
     await state.clear()
     user_id = message.from_user.id
-    try:
-        groups = db.get_groups(user_id) or []
-    except Exception:
-        g = db.get_group(user_id)
-        groups = [g] if g else []
+    groups = await membership.get_groups(user_id)
     if groups:
-        for gid in groups:
-            quiz_manager.clear_quiz(gid)
+        for gid, _ in groups:
+            await clear_quiz(message.bot, gid)
 
-    await message.answer("❌ Viktorina bekor qilindi.", reply_markup=main_menu_keyboard())
+    await safe_answer(message, "❌ Viktorina bekor qilindi.", reply_markup=main_menu_keyboard())
 
 
 # ----------------------------
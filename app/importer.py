@@ -0,0 +1,226 @@
+"""Fayldan savollarni oqim (streaming) usulida o'qish.
+
+Qo'llab-quvvatlanadigan formatlar:
+
+* CSV (.csv): ``savol,variant1,variant2,...,to'g'ri_javob_raqami`` —
+  oxirgi ustun 0 dan boshlangan raqam; birinchi qator sarlavha bo'lishi mumkin.
+* JSON Lines (.jsonl) yoki JSON massiv (.json): har bir element
+  ``{"question": "...", "options": ["...", "..."], "correct": 0}``.
+* Matn (.txt): savollar bo'sh qator bilan ajratiladi, birinchi qator —
+  savol, keyingilari — variantlar; to'g'ri variant oldiga ``*`` qo'yiladi.
+
+Fayl butunlay xotiraga yuklanmaydi: qatorlar/elementlar birma-bir o'qiladi.
+"""
+import csv
+import json
+from pathlib import Path
+
+# Telegram poll cheklovlari
+MAX_QUESTION_LEN = 300
+MAX_OPTION_LEN = 100
+MIN_OPTIONS = 2
+MAX_OPTIONS = 10
+
+SUPPORTED_EXTENSIONS = (".csv", ".json", ".jsonl", ".txt")
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+class ParsedQuestion:
+    __slots__ = ("where", "question", "options", "correct_index")
+
+    def __init__(self, where, question, options, correct_index):
+        self.where = where
+        self.question = question
+        self.options = options
+        self.correct_index = correct_index
+
+
+class ImportIssue:
+    __slots__ = ("where", "message")
+
+    def __init__(self, where, message):
+        self.where = where
+        self.message = message
+
+    def __str__(self):
+        return f"{self.where}: {self.message}"
+
+
+def validate(item: ParsedQuestion) -> list[str]:
+    """Savolni Telegram poll cheklovlariga tekshiradi, xatolar ro'yxatini qaytaradi."""
+    errors = []
+    if not item.question:
+        errors.append("savol matni bo‘sh")
+    elif len(item.question) > MAX_QUESTION_LEN:
+        errors.append(f"savol {MAX_QUESTION_LEN} belgidan uzun ({len(item.question)})")
+    if not MIN_OPTIONS <= len(item.options) <= MAX_OPTIONS:
+        errors.append(f"variantlar soni {MIN_OPTIONS}–{MAX_OPTIONS} bo‘lishi kerak ({len(item.options)})")
+    for i, opt in enumerate(item.options):
+        if not opt:
+            errors.append(f"{i}-variant bo‘sh")
+        elif len(opt) > MAX_OPTION_LEN:
+            errors.append(f"{i}-variant {MAX_OPTION_LEN} belgidan uzun ({len(opt)})")
+    if item.correct_index is None or not 0 <= item.correct_index < len(item.options):
+        errors.append("to‘g‘ri javob raqami noto‘g‘ri")
+    return errors
+
+
+# --------------------------
+# Formatlar
+# --------------------------
+
+def _parse_int(value):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _iter_csv(f):
+    reader = csv.reader(f)
+    for row in reader:
+        where = f"{reader.line_num}-qator"
+        row = [cell.strip() for cell in row]
+        if not any(row):
+            continue
+        correct = _parse_int(row[-1]) if len(row) > 1 else None
+        if correct is None and reader.line_num == 1:
+            continue  # sarlavha qatori
+        if len(row) < 2:
+            yield ImportIssue(where, "ustunlar yetarli emas")
+            continue
+        yield ParsedQuestion(where, row[0], row[1:-1], correct)
+
+
+def _from_obj(where, obj):
+    if not isinstance(obj, dict):
+        return ImportIssue(where, "obyekt ({...}) kutilgan edi")
+    options = obj.get("options")
+    if not isinstance(options, list):
+        return ImportIssue(where, "\"options\" ro‘yxat bo‘lishi kerak")
+    return ParsedQuestion(
+        where,
+        str(obj.get("question") or "").strip(),
+        [str(o).strip() for o in options],
+        _parse_int(obj.get("correct")),
+    )
+
+
+def _iter_jsonl(f):
+    for line_no, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        where = f"{line_no}-qator"
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ImportIssue(where, f"JSON xato: {e.msg}")
+            continue
+        yield _from_obj(where, obj)
+
+
+def _iter_json_array(f):
+    """JSON massivni bo'laklab o'qiydi — butun fayl xotiraga yuklanmaydi."""
+    decoder = json.JSONDecoder()
+    buf = f.read(JSON_CHUNK_SIZE).lstrip()
+    if buf[:1] != "[":
+        # Massiv emas — ehtimol JSON Lines
+        f.seek(0)
+        yield from _iter_jsonl(f)
+        return
+    pos, index, eof = 1, 0, False
+    while True:
+        # Bo'shliq va vergullarni o'tkazib yuboramiz
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            buf, pos = f.read(JSON_CHUNK_SIZE), 0
+            eof = not buf
+        if pos >= len(buf):
+            yield ImportIssue("fayl oxiri", "massiv yopilmagan (']' yo‘q)")
+            return
+        if buf[pos] == "]":
+            return
+        index += 1
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            if eof:
+                yield ImportIssue(f"{index}-element", f"JSON xato: {e.msg}")
+                return
+            chunk = f.read(JSON_CHUNK_SIZE)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            index -= 1
+            continue
+        yield _from_obj(f"{index}-element", obj)
+        buf, pos = buf[end:], 0
+
+
+def _iter_text(f):
+    block, start = [], None
+    for line_no, line in enumerate(f, start=1):
+        line = line.strip()
+        if line:
+            if not block:
+                start = line_no
+            block.append(line)
+            continue
+        if block:
+            yield _from_block(start, block)
+            block = []
+    if block:
+        yield _from_block(start, block)
+
+
+def _from_block(start, block):
+    where = f"{start}-qator"
+    options, correct = [], []
+    for i, line in enumerate(block[1:]):
+        if line.startswith("*"):
+            correct.append(i)
+            line = line[1:].strip()
+        options.append(line)
+    if len(correct) != 1:
+        return ImportIssue(where, "to‘g‘ri variant bitta '*' bilan belgilanishi kerak")
+    return ParsedQuestion(where, block[0], options, correct[0])
+
+
+def iter_questions(path, filename: str):
+    """Fayldan ParsedQuestion yoki ImportIssue larni birma-bir qaytaradi."""
+    ext = Path(filename).suffix.lower()
+    if ext not in SUPPORTED_EXTENSIONS:
+        yield ImportIssue(filename, f"format qo‘llab-quvvatlanmaydi ({', '.join(SUPPORTED_EXTENSIONS)})")
+        return
+    with open(path, "r", encoding="utf-8-sig", newline="" if ext == ".csv" else None) as f:
+        try:
+            if ext == ".csv":
+                yield from _iter_csv(f)
+            elif ext == ".jsonl":
+                yield from _iter_jsonl(f)
+            elif ext == ".json":
+                yield from _iter_json_array(f)
+            else:
+                yield from _iter_text(f)
+        except UnicodeDecodeError:
+            yield ImportIssue(filename, "fayl UTF-8 kodlashda emas")
+        except csv.Error as e:
+            yield ImportIssue(filename, f"CSV xato: {e}")
+
+
+def load_questions(path, filename: str):
+    """Faylni o'qib, (to'g'ri savollar, xatolar) juftligini qaytaradi."""
+    questions, issues = [], []
+    for item in iter_questions(path, filename):
+        if isinstance(item, ImportIssue):
+            issues.append(item)
+            continue
+        errors = validate(item)
+        if errors:
+            issues.append(ImportIssue(item.where, "; ".join(errors)))
+        else:
+            questions.append(item)
+    return questions, issues
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+QUIZ_JOURNAL = os.getenv("QUIZ_JOURNAL", "quiz_journal.log")
+QUIZ_SNAPSHOT = os.getenv("QUIZ_SNAPSHOT", "quiz_snapshot.json")
+
+
+def _fsync_dir(path: str):
+    # rename dan keyin papka yozuvi ham diskka tushishi kerak (POSIX)
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class QuizJournal:
+    """QuizManager o'zgarishlari uchun append-only jurnal + davriy snapshot.
+
+    Har bir o'zgarish jurnalga `[seq, op, *args]` JSON qatori sifatida yoziladi
+    (qator buferi — jarayon yiqilsa ham yo'qolmaydi, fsync esa har
+    `fsync_interval` soniyada). Siqishda joriy jurnal `<jurnal>.1` ga
+    almashtiriladi, holat snapshotga atomik (tmp + fsync + rename) yoziladi,
+    so'ng eski jurnal o'chiriladi. Tiklash: snapshot + undan keyingi
+    (seq > snapshot.seq) yozuvlar — vaqt tarixga emas, jonli holat hajmiga bog'liq.
+    """
+
+    def __init__(self, path: str = QUIZ_JOURNAL, snapshot_path: str = QUIZ_SNAPSHOT,
+                 compact_every: int = 10_000, compact_interval: float = 60.0, fsync_interval: float = 1.0):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+        self.fsync_interval = fsync_interval
+        self.seq = 0
+        self.records = 0  # oxirgi snapshotdan keyingi yozuvlar
+        self._file = None
+        self._manager = None
+        self._unsynced = False
+        self._compact_now = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    @property
+    def rotated_path(self) -> str:
+        return self.path + ".1"
+
+    # --------------------------
+    # Yozish
+    # --------------------------
+
+    def append(self, op: str, *args):
+        self.seq += 1
+        self._file.write(json.dumps([self.seq, op, *args], ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._unsynced = True
+        self.records += 1
+        if self.records >= self.compact_every:
+            self._compact_now.set()
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+        # Oldingi chala qator bilan yangi yozuv qo'shilib ketmasin
+        if self._file.tell() and not self._ends_with_newline():
+            self._file.write("\n")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _sync(self):
+        # Qator buferi tufayli yozuvlar allaqachon OS da — faqat diskka tushiramiz
+        if self._file is not None and self._unsynced:
+            self._unsynced = False
+            os.fsync(self._file.fileno())
+
+    async def sync(self):
+        async with self._lock:
+            if self._file is not None and self._unsynced:
+                self._unsynced = False
+                await asyncio.to_thread(os.fsync, self._file.fileno())
+
+    # --------------------------
+    # Tiklash
+    # --------------------------
+
+    def _read_records(self, path: str, after: int):
+        try:
+            f = open(path, encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for lineno, line in enumerate(f, start=1):
+                try:
+                    seq, op, *args = json.loads(line)
+                except ValueError:
+                    # Yiqilish paytida chala yozilgan qator
+                    logger.warning("Jurnal %s:%s buzilgan qator o'tkazib yuborildi", path, lineno)
+                    continue
+                if seq > after:
+                    yield seq, op, args
+
+    def load(self):
+        """(snapshot holati yoki None, [(seq, op, args), ...]) — diskdagi holat."""
+        state = None
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            pass
+        after = state["seq"] if state else 0
+        records = [*self._read_records(self.rotated_path, after), *self._read_records(self.path, after)]
+        return state, records
+
+    async def restore(self, manager):
+        """Holatni managerga tiklaydi, jurnalni unga ulaydi va darhol siqadi."""
+        started = time.perf_counter()
+        state, records = await asyncio.to_thread(self.load)
+        if state:
+            manager.load(state)
+        for seq, op, args in records:
+            try:
+                manager.apply(op, args)
+            except Exception as e:
+                logger.error("Jurnal yozuvi #%s (%s) qo'llanmadi: %s", seq, op, e)
+        self.seq = max([state["seq"] if state else 0, *(seq for seq, _, _ in records)])
+        self._manager = manager
+        self._open()
+        manager.journal = self
+        logger.info("QuizManager tiklandi: %s viktorina, %s jurnal yozuvi (%.3fs)",
+                    len(manager.active_quizzes), len(records), time.perf_counter() - started)
+        await self.compact()
+
+    # --------------------------
+    # Siqish (snapshot)
+    # --------------------------
+
+    def _write_snapshot(self, state):
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        _fsync_dir(self.snapshot_path)
+        # Eski jurnaldagi barcha yozuvlar endi snapshotda
+        try:
+            os.remove(self.rotated_path)
+        except FileNotFoundError:
+            pass
+
+    async def compact(self):
+        if self._manager is None:
+            return
+        async with self._lock:
+            self._compact_now.clear()
+            # Holat va jurnal almashinuvi event loop da birga — oraliqda yozuv qo'shilmaydi.
+            # Oldingi siqish yakunlanmagan bo'lsa (.1 bor), almashtirmaymiz: yozuvlar joyida qoladi.
+            if not os.path.exists(self.rotated_path):
+                self._sync()
+                self._file.close()
+                os.replace(self.path, self.rotated_path)
+                self._open()
+            state = self._manager.dump()
+            state["seq"] = self.seq
+            self.records = 0
+            try:
+                await asyncio.to_thread(self._write_snapshot, state)
+            except Exception as e:
+                logger.exception("Viktorinalar snapshoti yozilmadi: %s", e)
+
+    async def _run(self):
+        last_compact = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._compact_now.wait(), self.fsync_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                if self._compact_now.is_set() or (
+                        self.records and time.monotonic() - last_compact >= self.compact_interval):
+                    await self.compact()
+                    last_compact = time.monotonic()
+                else:
+                    await self.sync()
+            except Exception as e:
+                logger.exception("QuizJournal xato: %s", e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._file is not None:
+            await self.compact()
+            self._manager.journal = None
+            self._file.close()
+            self._file = None
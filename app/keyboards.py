@@ -26,8 +26,12 @@ def quiz_size_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+# Bitta viktorinadagi savollar chegarasi — qo'lda tuzish ham, fayldan import ham shundan oshmaydi
+MAX_QUIZ_SIZE = 50
+
+
 def quiz_size_keyboard():
-    sizes = [2, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50]
+    sizes = [2, *range(5, MAX_QUIZ_SIZE + 1, 5)]
     buttons = [
         [InlineKeyboardButton(text=f"{size} ta", callback_data=f"quiz_size:{size}")]
         for size in sizes
@@ -43,8 +47,41 @@ def answer_keyboard():
 def confirm_quiz_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="📤 Ha, guruhga yubor", callback_data="quiz:confirm")],
+        [InlineKeyboardButton(text="⏱ Vaqtli rejimda yuborish", callback_data="quiz:paced")],
+        [InlineKeyboardButton(text="📡 Bir nechta guruhga yuborish", callback_data="quiz:multi")],
         [InlineKeyboardButton(text="❌ Bekor qilish", callback_data="quiz:cancel")]
     ])
+
+
+def broadcast_groups_keyboard(groups, selected):
+    """groups: [(group_id, title), ...]; selected: tanlangan group_id lar to'plami."""
+    rows = [
+        [InlineKeyboardButton(
+            text=f"{'✅' if gid in selected else '▫️'} {(title or str(gid))[:40]}",
+            callback_data=f"bc_toggle:{gid}"
+        )]
+        for gid, title in groups
+    ]
+    rows.append([InlineKeyboardButton(text=f"📤 Tanlanganlarga yuborish ({len(selected)})", callback_data="bc_send")])
+    rows.append([InlineKeyboardButton(text="❌ Bekor qilish", callback_data="quiz:cancel")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def broadcast_results_keyboard(quiz_id: int):
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📊 Umumiy natijalar", callback_data=f"bc_results:{quiz_id}")]
+    ])
+
+
+# Vaqtli rejimdagi savol muddatlari (soniya) — tugmalar ham, handlerdagi tekshiruv ham shundan
+PACE_PERIODS = (15, 30, 60, 120, 300)
+
+
+def pace_period_keyboard():
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f"{p} soniya", callback_data=f"quiz:paced:{p}")]
+        for p in PACE_PERIODS
+    ])
 def menu_keyboard(bot_username: str):
     return ReplyKeyboardMarkup(
         keyboard=[
@@ -54,3 +91,27 @@ def menu_keyboard(bot_username: str):
         ],
         resize_keyboard=True
     )
+
+
+def history_keyboard(entries, page_prefix: str, newest_id, oldest_id, newer: bool, older: bool):
+    """entries: [(tugma matni, callback_data), ...]; sahifalash kursorlari — sahifadagi chetki quiz_id lar."""
+    rows = [entries[i:i + 5] for i in range(0, len(entries), 5)]
+    rows = [[InlineKeyboardButton(text=text, callback_data=data) for text, data in row] for row in rows]
+    nav = []
+    if newer:
+        nav.append(InlineKeyboardButton(text="◀️ Yangiroq", callback_data=f"{page_prefix}:a:{newest_id}"))
+    if older:
+        nav.append(InlineKeyboardButton(text="Eskiroq ▶️", callback_data=f"{page_prefix}:b:{oldest_id}"))
+    if nav:
+        rows.append(nav)
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def leaderboard_keyboard(prefix: str, page: int, has_next: bool):
+    """Reyting sahifalari: prefix — 'lb:<tur>:<quiz_id>:<group_id>'; bitta sahifa bo'lsa None."""
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="◀️ Oldingi", callback_data=f"{prefix}:{page - 1}"))
+    if has_next:
+        nav.append(InlineKeyboardButton(text="Keyingi ▶️", callback_data=f"{prefix}:{page + 1}"))
+    return InlineKeyboardMarkup(inline_keyboard=[nav]) if nav else None
@@ -0,0 +1,244 @@
+import asyncio
+import html
+import logging
+from collections import OrderedDict
+
+from sortedcontainers import SortedList
+
+from . import db
+from .keyboards import leaderboard_keyboard
+
+logger = logging.getLogger(__name__)
+
+
+class QuizBoard:
+    """Bitta (quiz, group) uchun xotiradagi tartiblangan reyting.
+
+    Kalit: (-correct, total, user_id) — ya'ni ko'proq to'g'ri javob yuqorida,
+    teng bo'lsa kamroq urinish yuqorida. Har bir javob O(log n) da yangilanadi.
+    """
+
+    __slots__ = ("_ranked", "_scores")
+
+    def __init__(self, rows=()):
+        # {user_id: (correct, total)}
+        self._scores = {uid: (correct, total) for uid, correct, total in rows}
+        self._ranked = SortedList((-c, t, uid) for uid, (c, t) in self._scores.items())
+
+    def __len__(self):
+        return len(self._scores)
+
+    def record(self, user_id: int, is_correct: bool):
+        old = self._scores.get(user_id)
+        if old is None:
+            correct, total = 0, 0
+        else:
+            correct, total = old
+            self._ranked.remove((-correct, total, user_id))
+        correct += 1 if is_correct else 0
+        total += 1
+        self._scores[user_id] = (correct, total)
+        self._ranked.add((-correct, total, user_id))
+
+    def top(self, limit: int, offset: int = 0):
+        """[(user_id, correct, total), ...] — reytingning `offset` dan boshlab `limit` tasi."""
+        return [(uid, -neg, total) for neg, total, uid in self._ranked.islice(offset, offset + limit)]
+
+    def rank(self, user_id: int):
+        """(o'rin, correct, total) yoki None. Teng natijalar bir xil o'rinni oladi."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        correct, total = score
+        return self._ranked.bisect_left((-correct, total)) + 1, correct, total
+
+
+class Leaderboards:
+    """Faol viktorinalar reytinglari registri; xotirada bo'lmasa DB ga murojaat qiladi."""
+
+    def __init__(self, result_writer):
+        self._writer = result_writer
+        # {(quiz_id, group_id): QuizBoard}
+        self._boards = {}
+
+    def __contains__(self, key):
+        return key in self._boards
+
+    def __len__(self):
+        return len(self._boards)
+
+    def open(self, quiz_id: int, group_id: int, rows=()):
+        board = self._boards.get((quiz_id, group_id))
+        if board is None:
+            board = self._boards[(quiz_id, group_id)] = QuizBoard(rows)
+        return board
+
+    def drop(self, quiz_id: int, group_id: int):
+        self._boards.pop((quiz_id, group_id), None)
+
+    def record(self, quiz_id: int, group_id: int, user_id: int, is_correct: bool):
+        board = self._boards.get((quiz_id, group_id))
+        if board is not None:
+            board.record(user_id, is_correct)
+
+    async def top(self, quiz_id: int, group_id: int, limit: int = 10, offset: int = 0):
+        board = self._boards.get((quiz_id, group_id))
+        if board is not None:
+            return board.top(limit, offset)
+        # Xotirada yo'q — DB (qoplovchi indeks) + hali yozilmagan javoblar
+        return await self._writer.get_leaderboard(quiz_id, group_id, limit, offset)
+
+    async def count(self, quiz_id: int, group_id: int) -> int:
+        """Qatnashchilar soni."""
+        board = self._boards.get((quiz_id, group_id))
+        if board is not None:
+            return len(board)
+        await self._writer.flush()
+        return await db.count_players(quiz_id, group_id)
+
+    async def rank(self, quiz_id: int, group_id: int, user_id: int):
+        board = self._boards.get((quiz_id, group_id))
+        if board is not None:
+            return board.rank(user_id)
+        await self._writer.flush()
+        return await db.get_rank(quiz_id, group_id, user_id)
+
+
+# --------------------------
+# Reyting sahifalari (render + kesh)
+# --------------------------
+
+QUIZ, GROUP, COMBINED = "q", "g", "c"  # viktorina (guruhda), guruhning umumiy, bir nechta guruh bo'yicha umumiy
+MEDALS = {1: "🥇", 2: "🥈", 3: "🥉"}
+PAGE_TEXT_LIMIT = 3800  # Telegram 4096 belgi chegarasidan zaxira bilan
+NAME_LIMIT = 32
+
+
+def short_name(name: str) -> str:
+    """ProfileCache ismi (HTML-escape qilingan) — sahifa chegarasidan chiqmasligi uchun qisqartiriladi."""
+    raw = html.unescape(name)
+    return name if len(raw) <= NAME_LIMIT else html.escape(raw[:NAME_LIMIT - 1] + "…")
+
+
+class LeaderboardService:
+    """Barcha reyting xabarlarini chiqaradi: sahifalab, keshlab va bir vaqtdagi so'rovlarni birlashtirib.
+
+    Har bir (tur, quiz, group, sahifa) uchun tayyor matn versiya bilan keshlanadi;
+    versiya shu viktorina/guruhda yangi javob yozilganda (`touch`) o'zgaradi.
+    Bir xil sahifani bir vaqtda so'ragan handlerlar bitta hisoblashni kutadi
+    (single-flight) — SQL va ismlarni aniqlash bir marta bajariladi.
+    """
+
+    def __init__(self, leaderboards, result_writer, profiles, titles, page_size: int = 20, max_pages: int = 1024):
+        self._boards = leaderboards
+        self._writer = result_writer
+        self._profiles = profiles
+        self._titles = titles  # group_id -> guruh nomi (yoki None)
+        self.page_size = page_size
+        self.max_pages = max_pages
+        # {(quiz_id, group_id) | (quiz_id, None) | (None, group_id): tick}
+        self._versions = {}
+        self._tick = 0
+        self._epoch = 0  # forget() har safar oshiradi — u paytdagi hisoblashlar keshga yozilmaydi
+        # {(tur, quiz_id, group_id, sahifa): (versiya, (matn, markup))}
+        self._pages = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+    def touch(self, quiz_id: int, group_id: int):
+        """Yangi javob: shu viktorina va guruhga tegishli sahifalar eskirdi."""
+        self._tick += 1
+        self._versions[(quiz_id, group_id)] = self._tick
+        self._versions[(quiz_id, None)] = self._tick
+        self._versions[(None, group_id)] = self._tick
+
+    def forget(self, quiz_id: int, group_id: int):
+        """Viktorina guruhda tugadi: uning versiyasi va keshdagi sahifalari o'chiriladi."""
+        self._epoch += 1
+        self._versions.pop((quiz_id, group_id), None)
+        self._versions.pop((quiz_id, None), None)
+        for key in [key for key in self._pages if key[1] == quiz_id]:
+            del self._pages[key]
+
+    def _version(self, kind, quiz_id, group_id):
+        if kind == QUIZ:
+            return self._versions.get((quiz_id, group_id), 0)
+        if kind == COMBINED:
+            return self._versions.get((quiz_id, None), 0)
+        return self._versions.get((None, group_id), 0)
+
+    async def render(self, bot, kind: str, quiz_id: int, group_id: int, page: int = 0):
+        """(matn, markup) yoki sahifa bo'sh bo'lsa (None, None)."""
+        key = (kind, quiz_id, group_id, page)
+        version = self._version(kind, quiz_id, group_id)
+        cached = self._pages.get(key)
+        if cached is not None and cached[0] == version:
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+        flight = self._inflight.get((key, version))
+        if flight is None:
+            self.misses += 1
+            flight = asyncio.ensure_future(self._compute(bot, kind, quiz_id, group_id, page, version))
+            self._inflight[(key, version)] = flight
+            flight.add_done_callback(lambda _: self._inflight.pop((key, version), None))
+        # shield: bitta kutuvchi bekor qilinsa, boshqalar uchun hisoblash davom etadi
+        return await asyncio.shield(flight)
+
+    async def _compute(self, bot, kind, quiz_id, group_id, page, version):
+        epoch = self._epoch
+        result = await self._build(bot, kind, quiz_id, group_id, page)
+        if epoch == self._epoch and result[0] is not None:
+            key = (kind, quiz_id, group_id, page)
+            self._pages[key] = (version, result)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return result
+
+    async def _build(self, bot, kind, quiz_id, group_id, page):
+        offset = page * self.page_size
+        limit = self.page_size + 1  # bitta ortiqcha — keyingi sahifa bormi
+        if kind == QUIZ:
+            rows = await self._boards.top(quiz_id, group_id, limit, offset)
+            players = await self._boards.count(quiz_id, group_id)
+            if (quiz_id, group_id) in self._boards:
+                header = f"🏆 Viktorina reytingi\n👥 Qatnashchilar soni: {players}\n\n"
+            else:
+                header = f"🏁 Viktorina yakunlandi!\n\n👥 Qatnashchilar soni: {players}\n\n"
+        elif kind == GROUP:
+            await self._writer.flush()
+            rows = await db.get_group_stats(group_id, limit, offset)
+            header = "🏆 Guruhning umumiy reytingi (barcha viktorinalar):\n\n"
+        else:
+            await self._writer.flush()
+            rows = await db.get_combined_leaderboard(quiz_id, limit, offset)
+            header = "📊 Umumiy natijalar\n\n"
+            if page == 0:
+                header += "👥 Guruhlar bo‘yicha:\n"
+                for gid, players, correct, total in await db.get_quiz_groups(quiz_id):
+                    accuracy = correct * 100 // total if total else 0
+                    title = html.escape(self._titles(gid) or str(gid))
+                    header += f"• <b>{title}</b>: {players} qatnashchi, {accuracy}% to‘g‘ri\n"
+                header += "\n"
+            header += "🏆 Umumiy reyting:\n"
+        if not rows:
+            return None, None
+
+        has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        names = await self._profiles.resolve(bot, [row[0] for row in rows])
+        text = header
+        for i, row in enumerate(rows, start=offset + 1):
+            uid, correct, total = row[:3]
+            line = f"{MEDALS.get(i, f'{i}.')} <a href='tg://user?id={uid}'>{short_name(names[uid])}</a> — {correct}/{total} ball"
+            if kind == GROUP:
+                line += f", {row[3]} ta viktorina"
+            if len(text) + len(line) + 1 > PAGE_TEXT_LIMIT:
+                break
+            text += line + "\n"
+        if page or has_next:
+            text += f"\n📄 {page + 1}-sahifa"
+        return text, leaderboard_keyboard(f"lb:{kind}:{quiz_id}:{group_id}", page, has_next)
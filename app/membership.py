@@ -0,0 +1,79 @@
+import logging
+
+from . import db
+
+logger = logging.getLogger(__name__)
+
+
+class MembershipCache:
+    """user_id -> guruhlar (id + title) va bot ma'lumotlari uchun xotiradagi kesh.
+
+    Startup da bir marta user_groups jadvalidan to'liq yuklanadi, keyin faqat
+    my_chat_member hodisalari (save/remove/title) orqali yangilanadi. Shu
+    sababli menyu handlerlari SQLite yoki Telegram API ga murojaat qilmaydi.
+    """
+
+    def __init__(self):
+        # {user_id: {group_id: None}} — dict qo'shilish tartibini saqlaydi
+        self._by_user = {}
+        # {group_id: {user_id, ...}}
+        self._by_group = {}
+        # {group_id: title}
+        self._titles = {}
+        self._loaded = False
+        self.me = None
+
+    async def load(self, bot=None):
+        rows = await db.get_all_groups()
+        self._by_user.clear()
+        self._by_group.clear()
+        self._titles.clear()
+        for user_id, group_id, title in rows:
+            self._add(user_id, group_id, title)
+        self._loaded = True
+        if bot is not None:
+            self.me = await bot.get_me()
+        logger.info("MembershipCache: %s ta bog'lanish yuklandi", len(rows))
+
+    async def get_me(self, bot):
+        if self.me is None:
+            self.me = await bot.get_me()
+        return self.me
+
+    def _add(self, user_id, group_id, title):
+        groups = self._by_user.setdefault(user_id, {})
+        groups.pop(group_id, None)  # INSERT OR REPLACE kabi — oxiriga o'tkazamiz
+        groups[group_id] = None
+        self._by_group.setdefault(group_id, set()).add(user_id)
+        if title is not None or group_id not in self._titles:
+            self._titles[group_id] = title
+
+    async def get_groups(self, user_id: int) -> list[tuple[int, str]]:
+        """Foydalanuvchi guruhlarini (group_id, title) ro'yxati sifatida qaytaradi."""
+        if not self._loaded:
+            await self.load()
+        return [(gid, self._titles.get(gid)) for gid in self._by_user.get(user_id, ())]
+
+    def get_title(self, group_id: int):
+        return self._titles.get(group_id)
+
+    async def save_group(self, user_id: int, group_id: int, title: str = None):
+        await db.save_group(user_id, group_id, title)
+        self._add(user_id, group_id, title)
+
+    async def remove_group(self, group_id: int):
+        await db.remove_group(group_id)
+        for user_id in self._by_group.pop(group_id, ()):
+            groups = self._by_user.get(user_id)
+            if groups is not None:
+                groups.pop(group_id, None)
+                if not groups:
+                    del self._by_user[user_id]
+        self._titles.pop(group_id, None)
+
+    async def update_title(self, group_id: int, title: str):
+        """Guruh nomi o'zgargan bo'lsa, kesh va DB ni yangilaydi."""
+        if not title or group_id not in self._by_group or self._titles.get(group_id) == title:
+            return
+        self._titles[group_id] = title
+        await db.set_group_title(group_id, title)
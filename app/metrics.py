@@ -0,0 +1,239 @@
+import html
+import logging
+import time
+from bisect import bisect_left
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Gistogramma chegaralari (soniya) — Prometheus standartiga yaqin
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HANDLER_SECONDS = "cyberquiz_handler_seconds"
+HANDLER_ERRORS = "cyberquiz_handler_errors_total"
+DB_SECONDS = "cyberquiz_db_seconds"
+DB_ERRORS = "cyberquiz_db_errors_total"
+API_SECONDS = "cyberquiz_bot_api_seconds"
+API_ERRORS = "cyberquiz_bot_api_errors_total"
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # oxirgi katak — +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Taxminiy kvantil: `q` ulush tushadigan katakning yuqori chegarasi."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Jarayon ichidagi metrikalar: gistogrammalar, hisoblagichlar va gauge lar.
+
+    Har bir metrika bitta yorliqqa (label) ega — masalan handler nomi yoki
+    DB funksiyasi. Hammasi event loop oqimida yangilanadi, qulf kerak emas.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # {name: (type, help, label)}
+        self._meta = {}
+        # {name: {label_value: Histogram | int}}
+        self._series = {}
+        # {name: (help, fn, type)} — qiymati render paytida hisoblanadi
+        self._gauges = {}
+
+    def describe(self, name: str, kind: str, help: str, label: str):
+        self._meta[name] = (kind, help, label)
+        self._series.setdefault(name, {})
+
+    def observe(self, name: str, label_value: str, seconds: float):
+        series = self._series[name]
+        hist = series.get(label_value)
+        if hist is None:
+            hist = series[label_value] = Histogram(self.buckets)
+        hist.observe(seconds)
+
+    def inc(self, name: str, label_value: str, n: int = 1):
+        series = self._series[name]
+        series[label_value] = series.get(label_value, 0) + n
+
+    def gauge(self, name: str, fn, help: str = ""):
+        self._gauges[name] = (help, fn, "gauge")
+
+    def counter_fn(self, name: str, fn, help: str = ""):
+        """gauge kabi render paytida o'qiladi, lekin `fn` faqat o'sadigan hisoblagich (TYPE counter)."""
+        self._gauges[name] = (help, fn, "counter")
+
+    def histograms(self, name: str):
+        return self._series.get(name, {})
+
+    def counters(self, name: str):
+        return self._series.get(name, {})
+
+    def gauges(self):
+        values = {}
+        for name, (_, fn, _) in self._gauges.items():
+            try:
+                values[name] = fn()
+            except Exception as e:
+                logger.warning("Gauge %s hisoblanmadi: %s", name, e)
+        return values
+
+    def render(self) -> str:
+        """Prometheus text exposition formati (0.0.4)."""
+        lines = []
+        for name, (kind, help, label) in self._meta.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for value, item in sorted(self._series[name].items()):
+                lv = _escape(value)
+                if kind == "histogram":
+                    cumulative = 0
+                    for bound, n in zip(item.buckets, item.counts):
+                        cumulative += n
+                        lines.append(f'{name}_bucket{{{label}="{lv}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{label}="{lv}",le="+Inf"}} {item.count}')
+                    lines.append(f'{name}_sum{{{label}="{lv}"}} {item.sum}')
+                    lines.append(f'{name}_count{{{label}="{lv}"}} {item.count}')
+                else:
+                    lines.append(f'{name}{{{label}="{lv}"}} {item}')
+        for name, value in self.gauges().items():
+            help, _, kind = self._gauges[name]
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+metrics = Metrics()
+metrics.describe(HANDLER_SECONDS, "histogram", "Handler ishlash vaqti (soniya)", "handler")
+metrics.describe(HANDLER_ERRORS, "counter", "Handler ichidagi xatolar soni", "handler")
+metrics.describe(DB_SECONDS, "histogram", "app.db chaqiruvlari vaqti, navbat bilan (soniya)", "call")
+metrics.describe(DB_ERRORS, "counter", "app.db chaqiruvlaridagi xatolar soni", "call")
+metrics.describe(API_SECONDS, "histogram", "Bot API so'rovlari vaqti (soniya)", "method")
+metrics.describe(API_ERRORS, "counter", "Bot API so'rovlaridagi xatolar soni", "method")
+
+
+# --------------------------
+# Middleware lar
+# --------------------------
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Har bir handler (callback nomi bo'yicha) ishlash vaqtini yozadi.
+
+    Inner middleware — Dispatcher ning har bir event observeriga ulanadi,
+    shunda ichki routerlardagi handlerlar ham o'lchanadi.
+    """
+
+    def __init__(self, registry: Metrics = metrics):
+        self.metrics = registry
+
+    def setup(self, dp):
+        for event_name, observer in dp.observers.items():
+            if event_name not in ("update", "error"):
+                observer.middleware(self)
+
+    async def __call__(self, handler, event, data):
+        name = data["handler"].callback.__name__
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.metrics.inc(HANDLER_ERRORS, name)
+            raise
+        finally:
+            self.metrics.observe(HANDLER_SECONDS, name, time.perf_counter() - started)
+
+
+class BotApiMetricsMiddleware(BaseRequestMiddleware):
+    """Bot API metodlari (sendPoll, getChatMember, ...) vaqti va xatolari.
+
+    ``bot.session.middleware(BotApiMetricsMiddleware())`` bilan ulanadi.
+    """
+
+    def __init__(self, registry: Metrics = metrics):
+        self.metrics = registry
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            self.metrics.inc(API_ERRORS, name)
+            raise
+        finally:
+            self.metrics.observe(API_SECONDS, name, time.perf_counter() - started)
+
+
+# --------------------------
+# HTTP endpoint va qisqa hisobot
+# --------------------------
+
+async def start_server(host: str, port: int, registry: Metrics = metrics) -> web.AppRunner:
+    """`GET /metrics` ni beradigan kichik aiohttp serverini ishga tushiradi."""
+    async def handle(_request):
+        return web.Response(body=registry.render().encode(),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("📈 Metrikalar: http://%s:%s/metrics", host, port)
+    return runner
+
+
+def summary(registry: Metrics = metrics, limit: int = 8) -> str:
+    """/stats uchun qisqa matn: eng ko'p chaqirilganlar, p50/p99 (ms) va xatolar."""
+    parts = []
+    for title, seconds, errors in (
+        ("⚙️ Handlerlar", HANDLER_SECONDS, HANDLER_ERRORS),
+        ("🗄 DB", DB_SECONDS, DB_ERRORS),
+        ("📡 Bot API", API_SECONDS, API_ERRORS),
+    ):
+        hists = registry.histograms(seconds)
+        errs = registry.counters(errors)
+        if not hists:
+            continue
+        parts.append(f"<b>{title}</b> (soni · p50 · p99 · xato)")
+        top = sorted(hists.items(), key=lambda kv: kv[1].count, reverse=True)[:limit]
+        for name, h in top:
+            parts.append(
+                f"<code>{html.escape(name)}</code>: {h.count} · {h.quantile(0.5) * 1000:g} · "
+                f"{h.quantile(0.99) * 1000:g} ms · {errs.get(name, 0)}"
+            )
+        parts.append("")
+    gauges = registry.gauges()
+    if gauges:
+        parts.append("<b>📊 Holat</b>")
+        for name, value in gauges.items():
+            parts.append(f"<code>{name}</code>: {value}")
+    return "\n".join(parts) or "Hali metrika yo‘q."
@@ -0,0 +1,281 @@
+"""Versiyalangan sxema migratsiyalari.
+
+Har bir qadam ``(versiya, nom, funksiya)`` ko'rinishida va faqat bir marta,
+tartib bilan bajariladi; bajarilganlari ``schema_version`` jadvalida
+qayd etiladi. Qadamlar mavjud (versiyasiz) bazalarda ham xavfsiz bo'lishi
+uchun ``IF NOT EXISTS`` va ustun/jadval tekshiruvlari bilan yozilgan.
+
+Yangi o'zgarish — yangi funksiya va MIGRATIONS oxiriga yangi versiya;
+eski qadamlar o'zgartirilmaydi.
+"""
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+
+def _table_exists(conn, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def _columns(conn, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+# --------------------------
+# Qadamlar
+# --------------------------
+
+def _001_base_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_groups (
+            user_id INTEGER NOT NULL,
+            group_id INTEGER NOT NULL,
+            group_title TEXT,
+            PRIMARY KEY (user_id, group_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quiz_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            quiz_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            group_id INTEGER NOT NULL,
+            correct_answers INTEGER DEFAULT 0,
+            total_answers INTEGER DEFAULT 0,
+            CONSTRAINT unique_quiz_user_group UNIQUE (quiz_id, user_id, group_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quizzes (
+            quiz_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            group_id INTEGER NOT NULL,
+            start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _002_group_title(conn):
+    # Eski bazalarda user_groups.group_title ustuni yo'q edi (avvalgi migrate_db)
+    if "group_title" not in _columns(conn, "user_groups"):
+        conn.execute("ALTER TABLE user_groups ADD COLUMN group_title TEXT")
+
+
+def _003_leaderboard_index(conn):
+    # Reyting so'rovi uchun qoplovchi (covering) indeks — saralash indeks tartibida bo'ladi
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_quiz_results_board
+        ON quiz_results (quiz_id, group_id, correct_answers DESC, total_answers, user_id)
+    """)
+
+
+def _004_user_group_stats(conn):
+    # Umumiy statistika: foydalanuvchi × guruh bo'yicha yig'indilar (javob yozilganda yangilanadi)
+    existed = _table_exists(conn, "user_group_stats")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_group_stats (
+            user_id INTEGER NOT NULL,
+            group_id INTEGER NOT NULL,
+            correct_answers INTEGER NOT NULL DEFAULT 0,
+            total_answers INTEGER NOT NULL DEFAULT 0,
+            quizzes_played INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, group_id)
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_group_stats_board
+        ON user_group_stats (group_id, correct_answers DESC, total_answers, user_id, quizzes_played)
+    """)
+    if not existed:
+        # Mavjud natijalardan bir martalik to'ldirish
+        conn.execute("""
+            INSERT INTO user_group_stats (user_id, group_id, correct_answers, total_answers, quizzes_played)
+            SELECT user_id, group_id, SUM(correct_answers), SUM(total_answers), COUNT(*)
+            FROM quiz_results
+            GROUP BY user_id, group_id
+        """)
+
+
+def _005_question_bank(conn):
+    # Savollar banki: har bir savol (savol + variantlar xeshi bo'yicha) bir marta saqlanadi
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS questions (
+            id INTEGER PRIMARY KEY,
+            content_hash BLOB NOT NULL UNIQUE,
+            question TEXT NOT NULL,
+            options TEXT NOT NULL,
+            correct_index INTEGER NOT NULL,
+            author_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # SQLite FTS5 siz yig'ilgan bo'lsa indeks yaratilmaydi — qidiruv LIKE ga o'tadi
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+                question, options,
+                content = 'questions', content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        logger.warning("FTS5 mavjud emas, savollar LIKE bilan qidiriladi: %s", e)
+        return
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions BEGIN
+            INSERT INTO questions_fts (rowid, question, options)
+            VALUES (new.id, new.question, new.options);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions BEGIN
+            INSERT INTO questions_fts (questions_fts, rowid, question, options)
+            VALUES ('delete', old.id, old.question, old.options);
+        END
+    """)
+
+
+def _006_quiz_timers(conn):
+    # Vaqtli (paced) viktorinalarning navbatdagi muddatlari — restartda taymerlar tiklanadi
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quiz_timers (
+            group_id INTEGER PRIMARY KEY,
+            quiz_id INTEGER NOT NULL,
+            deadline REAL NOT NULL
+        )
+    """)
+
+
+def _007_fsm_states(conn):
+    # FSM (viktorina yaratish jarayoni) holatlari
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fsm_states (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT,
+            updated_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fsm_states_updated ON fsm_states (updated_at)")
+
+
+def _008_question_stats(conn):
+    # Savollar statistikasi: har bir (quiz, group, savol) uchun bitta qator,
+    # variantlar hisoblagichlari `counts` da little-endian uint32 massiv sifatida
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS question_stats (
+            quiz_id INTEGER NOT NULL,
+            group_id INTEGER NOT NULL,
+            q_index INTEGER NOT NULL,
+            question TEXT NOT NULL,
+            options TEXT NOT NULL,
+            correct_index INTEGER NOT NULL,
+            answerers INTEGER NOT NULL DEFAULT 0,
+            counts BLOB NOT NULL,
+            PRIMARY KEY (quiz_id, group_id, q_index)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_question_stats_group ON question_stats (group_id, quiz_id)")
+
+
+def _009_user_groups_group_index(conn):
+    # remove_group / set_group_title guruh bo'yicha qidiradi — PK (user_id, group_id) yordam bermaydi
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_groups_group ON user_groups (group_id)")
+    conn.execute("ANALYZE")
+
+
+def _010_quiz_history(conn):
+    # quizzes endi haqiqatan yoziladi: quiz_id shu jadvaldan ajratiladi (int(time.time()) o'rniga)
+    columns = _columns(conn, "quizzes")
+    if "owner_id" not in columns:
+        conn.execute("ALTER TABLE quizzes ADD COLUMN owner_id INTEGER")
+    if "size" not in columns:
+        conn.execute("ALTER TABLE quizzes ADD COLUMN size INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_quizzes_owner ON quizzes (owner_id, quiz_id)")
+    # Har bir guruhdagi o'tkazilish: yakunda reyting "muzlatilgan" JSON sifatida saqlanadi
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quiz_runs (
+            quiz_id INTEGER NOT NULL,
+            group_id INTEGER NOT NULL,
+            questions INTEGER,
+            started_at REAL,
+            ended_at REAL,
+            participants INTEGER,
+            leaderboard TEXT,
+            PRIMARY KEY (quiz_id, group_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_quiz_runs_group ON quiz_runs (group_id, quiz_id)")
+    # Eski (vaqt asosidagi) id lardan keyin davom etamiz: yangi viktorinalar ularning
+    # orasiga tushmasin va MAX(quiz_id) bo'yicha "oxirgi" viktorina to'g'ri qolsin
+    seed = max(
+        conn.execute(f"SELECT COALESCE(MAX(quiz_id), 0) FROM {table}").fetchone()[0]
+        for table in ("quizzes", "quiz_results", "question_stats", "quiz_timers")
+    )
+    if seed:
+        updated = conn.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'quizzes'", (seed,)
+        ).rowcount
+        if not updated:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('quizzes', ?)", (seed,))
+
+
+MIGRATIONS = [
+    (1, "base tables", _001_base_tables),
+    (2, "user_groups.group_title", _002_group_title),
+    (3, "quiz_results leaderboard index", _003_leaderboard_index),
+    (4, "user_group_stats rollup", _004_user_group_stats),
+    (5, "question bank + FTS5", _005_question_bank),
+    (6, "quiz_timers", _006_quiz_timers),
+    (7, "fsm_states", _007_fsm_states),
+    (8, "question_stats", _008_question_stats),
+    (9, "user_groups(group_id) index", _009_user_groups_group_index),
+    (10, "quiz history", _010_quiz_history),
+]
+
+
+# --------------------------
+# Runner
+# --------------------------
+
+def current_version(conn) -> int:
+    if not _table_exists(conn, "schema_version"):
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(conn, migrations=MIGRATIONS) -> list:
+    """Bajarilmagan qadamlarni tartib bilan qo'llaydi; qo'llangan versiyalarni qaytaradi.
+
+    Har bir qadam o'z tranzaksiyasida: xato bo'lsa shu qadam to'liq bekor qilinadi
+    va keyingi ishga tushishda qaytadan urinib ko'riladi.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+    version = current_version(conn)
+    applied = []
+    for step, name, fn in migrations:
+        if step <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            fn(conn)
+            conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (step, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception("Migratsiya %s (%s) bajarilmadi", step, name)
+            raise
+        logger.info("Migratsiya %s qo'llandi: %s", step, name)
+        applied.append(step)
+    return applied
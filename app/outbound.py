@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from collections import deque
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from .ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class OutboundScheduler:
+    """Barcha chiquvchi xabarlar uchun markaziy navbat.
+
+    - har bir chat uchun alohida navbat (xabarlar tartibi saqlanadi);
+    - chat bo'yicha va umumiy (global) token bucket;
+    - TelegramRetryAfter kelsa, `retry_after` kutib shu so'rovni qayta yuboradi.
+    """
+
+    def __init__(self, global_rate: float = 30, group_rate: float = 20 / 60, group_burst: float = 20,
+                 private_rate: float = 1, private_burst: float = 3, max_retries: int = 5,
+                 max_idle_buckets: int = 10_000):
+        self._global = TokenBucket(global_rate, global_rate)
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.private_rate = private_rate
+        self.private_burst = private_burst
+        self.max_retries = max_retries
+        self.max_idle_buckets = max_idle_buckets
+        # {chat_id: deque[(factory, future)]}
+        self._queues = {}
+        self._workers = {}
+        self._buckets = {}
+        self._depth = 0
+        self.retry_after_hits = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Navbatda turgan (hali yuborilmagan) so'rovlar soni."""
+        return self._depth
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                bucket = TokenBucket(self.private_rate, self.private_burst)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    async def send(self, chat_id: int, factory):
+        """`factory()` dan qaytgan so'rovni navbat orqali yuboradi va natijasini qaytaradi."""
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+        queue.append((factory, future))
+        self._depth += 1
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._worker(chat_id, queue))
+        return await future
+
+    @staticmethod
+    async def _acquire(bucket: TokenBucket):
+        while not bucket.try_acquire():
+            await asyncio.sleep(bucket.delay())
+
+    async def _worker(self, chat_id: int, queue: deque):
+        bucket = self._bucket(chat_id)
+        try:
+            while queue:
+                factory, future = queue[0]
+                if not future.cancelled():
+                    await self._acquire(bucket)
+                    await self._acquire(self._global)
+                    await self._deliver(chat_id, factory, future)
+                queue.popleft()
+                self._depth -= 1
+        finally:
+            del self._queues[chat_id]
+            del self._workers[chat_id]
+            self._prune_buckets()
+
+    async def _deliver(self, chat_id: int, factory, future):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                result = await factory()
+            except TelegramRetryAfter as e:
+                self.retry_after_hits += 1
+                if attempt == self.max_retries:
+                    if not future.done():
+                        future.set_exception(e)
+                    return
+                logger.warning("Flood control (chat=%s): %ss kutamiz", chat_id, e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                return
+            else:
+                if not future.done():
+                    future.set_result(result)
+                return
+
+    def _prune_buckets(self):
+        if len(self._buckets) <= self.max_idle_buckets:
+            return
+        for chat_id in [cid for cid, b in self._buckets.items()
+                        if cid not in self._queues and b.is_full()]:
+            del self._buckets[chat_id]
+
+    async def drain(self, timeout: float = 30):
+        """Navbatdagi xabarlar yuborilishini kutadi (shutdown uchun)."""
+        workers = list(self._workers.values())
+        if workers:
+            await asyncio.wait(workers, timeout=timeout)
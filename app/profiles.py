@@ -0,0 +1,84 @@
+import asyncio
+import html
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def display_name(user) -> str:
+    """Telegram User/Chat obyektidan reyting uchun ko'rinadigan ism yasaydi."""
+    if user.username:
+        return f"@{user.username}"
+    name = ((user.first_name or "") + (" " + user.last_name if user.last_name else "")).strip()
+    return html.escape(name) if name else str(user.id)
+
+
+class ProfileCache:
+    """Foydalanuvchi ismlari uchun TTL + LRU kesh (hajmi cheklangan).
+
+    Kesh asosan PollAnswer.user dan to'ldiriladi, shuning uchun reyting
+    chiqarishda odatda Telegram API ga murojaat kerak bo'lmaydi.
+    """
+
+    def __init__(self, max_size: int = 50_000, ttl: float = 6 * 3600,
+                 miss_ttl: float = 300, concurrency: int = 8):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl  # get_chat muvaffaqiyatsiz bo'lsa, qisqa muddat eslab qolamiz
+        self.concurrency = concurrency
+        # {user_id: (name, expires_at)}
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, user_id: int, name: str, ttl: float = None):
+        self._items[user_id] = (name, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._items.move_to_end(user_id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def remember(self, user):
+        if user is not None:
+            self.put(user.id, display_name(user))
+
+    def get(self, user_id: int):
+        item = self._items.get(user_id)
+        if item is None:
+            return None
+        name, expires_at = item
+        if expires_at < time.monotonic():
+            del self._items[user_id]
+            return None
+        self._items.move_to_end(user_id)
+        return name
+
+    async def resolve(self, bot, user_ids) -> dict:
+        """{user_id: name} qaytaradi; keshda yo'qlarini parallel (cheklangan) so'raydi."""
+        names = {}
+        missing = []
+        for uid in user_ids:
+            name = self.get(uid)
+            if name is None:
+                missing.append(uid)
+            else:
+                names[uid] = name
+
+        if missing:
+            sem = asyncio.Semaphore(self.concurrency)
+
+            async def fetch(uid):
+                async with sem:
+                    try:
+                        self.remember(await bot.get_chat(uid))
+                    except Exception as e:
+                        logger.debug("get_chat(%s) xato: %s", uid, e)
+                        self.put(uid, str(uid), ttl=self.miss_ttl)
+
+            await asyncio.gather(*(fetch(uid) for uid in missing))
+            for uid in missing:
+                names[uid] = self.get(uid) or str(uid)
+
+        return names
@@ -1,51 +1,201 @@
-import time
+class Question:
+    __slots__ = ("question", "options", "correct_index", "poll_id", "index")
+
+    def __init__(self, question, options, correct_index, poll_id=None, index=0):
+        self.question = question
+        self.options = tuple(options)  # Variantlar nusxasi, tartib o'zgarmasligi uchun
+        self.correct_index = correct_index
+        self.poll_id = poll_id
+        self.index = index  # viktorinadagi tartib raqami (statistika uchun)
+
+
+class Quiz:
+    __slots__ = ("quiz_id", "owner", "group_id", "size", "questions", "open_period", "next_index", "launched")
+
+    def __init__(self, quiz_id, owner, group_id, size):
+        self.quiz_id = quiz_id
+        self.owner = owner
+        self.group_id = group_id
+        self.size = size
+        self.questions = []
+        # Vaqtli rejim: har bir poll necha soniya ochiq turadi va navbatdagi savol raqami
+        self.open_period = None
+        self.next_index = 0
+        # Tasdiqlangan (yuborish boshlangan) — takroriy tasdiqni await lardan oldin to'sadi; jurnalga yozilmaydi
+        self.launched = False
+
 
 class QuizManager:
-    def __init__(self):
-        # {group_id: {"quiz_id": 123456, "owner": user_id, "size": 10, "questions": []}}
+    """Faol viktorinalar. Har bir o'zgarish (ulangan bo'lsa) `journal` ga yoziladi — app/journal.py."""
+
+    def __init__(self, journal=None):
+        # {group_id: Quiz}
         self.active_quizzes = {}
+        # Teskari indekslar: poll_id -> (group_id, q_index), owner -> group_id,
+        # quiz_id -> {group_id, ...} (bitta viktorina bir nechta guruhga yuborilishi mumkin)
+        self._by_poll = {}
+        self._by_owner = {}
+        self._by_quiz_id = {}
+        self.journal = journal
 
-    def start_quiz(self, user_id, group_id, size):
-        quiz_id = int(time.time())  # Vaqt asosida unique id
-        self.active_quizzes[group_id] = {
-            "quiz_id": quiz_id,
-            "owner": user_id,
-            "size": size,
-            "questions": [],
-        }
+    def _log(self, op, *args):
+        if self.journal is not None:
+            self.journal.append(op, *args)
+
+    def start_quiz(self, user_id, group_id, size, quiz_id):
+        """quiz_id — db.create_quiz ajratgan id (`quizzes` jadvalidan)."""
+        # Guruhda eski viktorina bo'lsa, uning indekslarini tozalaymiz
+        self.clear_quiz(group_id)
+        self.active_quizzes[group_id] = Quiz(quiz_id, user_id, group_id, size)
+        self._by_owner[user_id] = group_id
+        self._by_quiz_id.setdefault(quiz_id, set()).add(group_id)
+        self._log("start", user_id, group_id, size, quiz_id)
         return quiz_id
 
+    def copy_quiz(self, source_group_id, group_id):
+        """Viktorinani boshqa guruhga nusxalaydi: quiz_id umumiy, savollar (va poll_id lar) alohida."""
+        source = self.active_quizzes.get(source_group_id)
+        if source is None or group_id == source_group_id:
+            return None
+        self.clear_quiz(group_id)
+        quiz = Quiz(source.quiz_id, source.owner, group_id, source.size)
+        quiz.questions = [Question(q.question, q.options, q.correct_index, index=q.index) for q in source.questions]
+        self.active_quizzes[group_id] = quiz
+        self._by_quiz_id.setdefault(quiz.quiz_id, set()).add(group_id)
+        self._log("copy", source_group_id, group_id)
+        return quiz
+
     def add_question(self, group_id, question, options, correct_index):
-        if group_id not in self.active_quizzes:
+        quiz = self.active_quizzes.get(group_id)
+        if quiz is None:
             return False
-        self.active_quizzes[group_id]["questions"].append({
-            "question": question,
-            "options": options[:],  # Variantlar nusxasi, tartib o'zgarmasligi uchun
-            "correct_index": correct_index,
-            "poll_id": None
-        })
+        quiz.questions.append(Question(question, options, correct_index, index=len(quiz.questions)))
+        self._log("add", group_id, question, list(options), correct_index)
         return True
 
+    def set_pace(self, group_id, open_period, next_index):
+        """Vaqtli rejim: poll ochiq turish vaqti va navbatdagi savol raqami."""
+        quiz = self.active_quizzes.get(group_id)
+        if quiz is None:
+            return
+        quiz.open_period = open_period
+        quiz.next_index = next_index
+        self._log("pace", group_id, open_period, next_index)
+
     def set_poll_id(self, group_id, q_index, poll_id):
-        if group_id in self.active_quizzes:
-            if 0 <= q_index < len(self.active_quizzes[group_id]["questions"]):
-                self.active_quizzes[group_id]["questions"][q_index]["poll_id"] = poll_id
+        quiz = self.active_quizzes.get(group_id)
+        if quiz is None or not 0 <= q_index < len(quiz.questions):
+            return
+        q = quiz.questions[q_index]
+        if q.poll_id is not None:
+            self._by_poll.pop(q.poll_id, None)
+        q.poll_id = poll_id
+        if poll_id is not None:
+            self._by_poll[poll_id] = (group_id, q_index)
+        self._log("poll", group_id, q_index, poll_id)
+
+    def find_poll(self, poll_id):
+        """poll_id bo'yicha (quiz, question) juftligini O(1) da qaytaradi."""
+        ref = self._by_poll.get(poll_id)
+        if ref is None:
+            return None
+        group_id, q_index = ref
+        quiz = self.active_quizzes[group_id]
+        return quiz, quiz.questions[q_index]
+
+    def get_owner_group(self, user_id):
+        """Foydalanuvchi oxirgi boshlagan viktorina guruhini qaytaradi."""
+        return self._by_owner.get(user_id)
+
+    def get_groups_by_quiz_id(self, quiz_id):
+        """Shu viktorina faol bo'lgan barcha guruhlar."""
+        return set(self._by_quiz_id.get(quiz_id, ()))
 
     def is_quiz_ready(self, group_id):
-        data = self.active_quizzes.get(group_id)
-        return data and len(data["questions"]) >= data["size"]
+        quiz = self.active_quizzes.get(group_id)
+        return quiz is not None and len(quiz.questions) >= quiz.size
 
     def get_quiz(self, group_id):
         return self.active_quizzes.get(group_id)
 
     def get_quiz_id(self, group_id):
         quiz = self.active_quizzes.get(group_id)
-        return quiz["quiz_id"] if quiz else None
+        return quiz.quiz_id if quiz else None
 
     def clear_quiz(self, group_id):
-        if group_id in self.active_quizzes:
-            del self.active_quizzes[group_id]
+        """Viktorinani o'chiradi va o'chirilgan Quiz ni (bo'lsa) qaytaradi."""
+        quiz = self.active_quizzes.pop(group_id, None)
+        if quiz is None:
+            return None
+        for q in quiz.questions:
+            if q.poll_id is not None:
+                self._by_poll.pop(q.poll_id, None)
+        if self._by_owner.get(quiz.owner) == group_id:
+            del self._by_owner[quiz.owner]
+        groups = self._by_quiz_id.get(quiz.quiz_id)
+        if groups is not None:
+            groups.discard(group_id)
+            if not groups:
+                del self._by_quiz_id[quiz.quiz_id]
+        self._log("clear", group_id)
+        return quiz
 
     def get_group_quiz(self, group_id):
-        quiz = self.active_quizzes.get(group_id)
-        return quiz["quiz_id"] if quiz else None
\ No newline at end of file
+        return self.get_quiz_id(group_id)
+
+    # --------------------------
+    # Snapshot / jurnaldan tiklash
+    # --------------------------
+
+    _OPS = {
+        "start": "start_quiz",
+        "copy": "copy_quiz",
+        "add": "add_question",
+        "pace": "set_pace",
+        "poll": "set_poll_id",
+        "clear": "clear_quiz",
+    }
+
+    def apply(self, op, args):
+        """Jurnal yozuvini qayta bajaradi (jurnalga qayta yozmasdan)."""
+        journal, self.journal = self.journal, None
+        try:
+            getattr(self, self._OPS[op])(*args)
+        finally:
+            self.journal = journal
+
+    def dump(self):
+        """Jonli holat (JSON ga yaroqli)."""
+        return {
+            "quizzes": [
+                {
+                    "quiz_id": quiz.quiz_id,
+                    "owner": quiz.owner,
+                    "group_id": quiz.group_id,
+                    "size": quiz.size,
+                    "open_period": quiz.open_period,
+                    "next_index": quiz.next_index,
+                    "questions": [[q.question, list(q.options), q.correct_index, q.poll_id] for q in quiz.questions],
+                }
+                for quiz in self.active_quizzes.values()
+            ],
+            "owners": [[owner, group_id] for owner, group_id in self._by_owner.items()],
+        }
+
+    def load(self, state):
+        """dump() natijasidan holatni va teskari indekslarni qayta quradi."""
+        self.active_quizzes.clear()
+        self._by_poll.clear()
+        self._by_owner.clear()
+        self._by_quiz_id.clear()
+        for item in state["quizzes"]:
+            quiz = Quiz(item["quiz_id"], item["owner"], item["group_id"], item["size"])
+            quiz.open_period = item["open_period"]
+            quiz.next_index = item["next_index"]
+            for i, (question, options, correct_index, poll_id) in enumerate(item["questions"]):
+                quiz.questions.append(Question(question, options, correct_index, poll_id, index=i))
+                if poll_id is not None:
+                    self._by_poll[poll_id] = (quiz.group_id, i)
+            self.active_quizzes[quiz.group_id] = quiz
+            self._by_quiz_id.setdefault(quiz.quiz_id, set()).add(quiz.group_id)
+        self._by_owner.update(state["owners"])
@@ -0,0 +1,36 @@
+import time
+
+
+class TokenBucket:
+    """Oddiy token bucket: soniyasiga `rate` token, ko'pi bilan `capacity` ta."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def try_acquire(self, n: float = 1, now: float = None) -> bool:
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    def delay(self, n: float = 1, now: float = None) -> float:
+        """`n` token yig'ilishi uchun qancha kutish kerakligini qaytaradi (soniya)."""
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= n:
+            return 0.0
+        return (n - self.tokens) / self.rate
+
+    def is_full(self, now: float = None) -> bool:
+        self._refill(time.monotonic() if now is None else now)
+        return self.tokens >= self.capacity
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+
+from . import db
+
+logger = logging.getLogger(__name__)
+
+
+class ResultWriter:
+    """Poll javoblarini xotirada yig'ib, DB ga partiyalab yozadi (write-behind).
+
+    Javoblar (quiz_id, user_id, group_id) bo'yicha birlashtiriladi va har
+    `flush_interval` soniyada yoki `max_pending` qator yig'ilganda bitta
+    tranzaksiyada yoziladi.
+    """
+
+    def __init__(self, flush_interval: float = 0.5, max_pending: int = 500):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # {(quiz_id, group_id): {user_id: [correct_delta, total_delta]}}
+        self._pending = {}
+        self._rows = 0
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+
+    def start(self):
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Navbatni oxirigacha yozib, fon vazifasini to'xtatadi."""
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    @property
+    def pending_rows(self) -> int:
+        return self._rows
+
+    def record(self, quiz_id: int, user_id: int, group_id: int, is_correct: bool):
+        users = self._pending.get((quiz_id, group_id))
+        if users is None:
+            users = self._pending[(quiz_id, group_id)] = {}
+        inc = users.get(user_id)
+        if inc is None:
+            users[user_id] = [1 if is_correct else 0, 1]
+            self._rows += 1
+            if self._rows >= self.max_pending:
+                self._wakeup.set()
+        else:
+            inc[0] += 1 if is_correct else 0
+            inc[1] += 1
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception("ResultWriter flush xato: %s", e)
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending, self._rows = self._pending, {}, 0
+            rows = [
+                (quiz_id, user_id, group_id, inc[0], inc[1])
+                for (quiz_id, group_id), users in batch.items()
+                for user_id, inc in users.items()
+            ]
+            try:
+                await db.add_results(rows)
+            except Exception as e:
+                # Yozilmagan javoblarni yo'qotmaslik uchun navbatga qaytaramiz
+                logger.error("Natijalar DB ga saqlanmadi (%s qator), qayta urinamiz: %s", len(rows), e)
+                for quiz_id, user_id, group_id, correct, total in rows:
+                    users = self._pending.setdefault((quiz_id, group_id), {})
+                    inc = users.get(user_id)
+                    if inc is None:
+                        users[user_id] = [correct, total]
+                        self._rows += 1
+                    else:
+                        inc[0] += correct
+                        inc[1] += total
+
+    async def get_leaderboard(self, quiz_id: int, group_id: int, limit: int = 10, offset: int = 0):
+        """DB dagi va hali yozilmagan natijalarni birlashtirib reyting qaytaradi."""
+        async with self._lock:
+            pending = {
+                uid: tuple(inc)
+                for uid, inc in self._pending.get((quiz_id, group_id), {}).items()
+            }
+            # Kutilayotgan foydalanuvchilar pastga tushishi mumkin, shuning uchun
+            # DB dan `offset + limit + len(pending)` qator olamiz.
+            rows = await db.get_leaderboard(quiz_id, group_id, offset + limit + len(pending))
+            if not pending:
+                return rows[offset:offset + limit]
+            scores = {uid: [correct, total] for uid, correct, total in rows}
+            missing = [uid for uid in pending if uid not in scores]
+            if missing:
+                for uid, correct, total in await db.get_results(quiz_id, group_id, missing):
+                    scores[uid] = [correct, total]
+
+        for uid, (correct, total) in pending.items():
+            score = scores.setdefault(uid, [0, 0])
+            score[0] += correct
+            score[1] += total
+
+        merged = sorted(
+            ((uid, s[0], s[1]) for uid, s in scores.items()),
+            key=lambda r: (-r[1], r[2]),
+        )
+        return merged[offset:offset + limit]
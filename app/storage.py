@@ -1,18 +1,57 @@
+"""Foydalanuvchi → guruh bog'lanishlari (eski connected_groups.json o'rniga).
+
+Ma'lumotlar SQLite `user_groups` jadvalida: har bir qo'shish bitta
+INSERT (O(1), WAL bilan chidamli). Eski JSON fayl startupda bir marta
+`import_json` bilan import qilinadi va `.imported` qo'shimchasi bilan
+qayta nomlanadi.
+"""
+import asyncio
 import json
+import logging
 from pathlib import Path
 
+from . import db
+
+logger = logging.getLogger(__name__)
+
 FILE = Path("connected_groups.json")
 
-def load_groups():
-    if FILE.exists():
-        with open(FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
-
-def save_groups(data):
-    with open(FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-def add_group(user_id: int, group_id: int):
-    data = load_groups()
-    data[str(user_id)] = group_id
-    save_groups(data)
\ No newline at end of file
+
+async def load_groups() -> dict:
+    """{str(user_id): group_id} — eski format: har bir foydalanuvchining oxirgi guruhi."""
+    return {str(user_id): group_id for user_id, group_id, _ in await db.get_all_groups()}
+
+
+async def add_group(user_id: int, group_id: int):
+    await db.add_groups([(user_id, group_id)])
+
+
+def _read_json(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def import_json(path: Path = None) -> int:
+    """Eski JSON faylni (standart: FILE) `user_groups` ga ko'chiradi; import qilingan qatorlar sonini qaytaradi."""
+    path = Path(path) if path is not None else FILE
+    if not path.exists():
+        return 0
+    try:
+        data = await asyncio.to_thread(_read_json, path)
+    except (OSError, ValueError) as e:
+        logger.error("%s o'qilmadi, import qilinmadi: %s", path, e)
+        return 0
+    if not isinstance(data, dict):
+        logger.error("%s: kutilgan format {user_id: group_id}, import qilinmadi", path)
+        return 0
+
+    rows = []
+    for user_id, group_id in data.items():
+        try:
+            rows.append((int(user_id), int(group_id)))
+        except (TypeError, ValueError):
+            logger.warning("%s: noto'g'ri yozuv o'tkazib yuborildi: %r -> %r", path, user_id, group_id)
+    added = await db.add_groups(rows)
+    path.rename(path.with_name(path.name + ".imported"))
+    logger.info("%s import qilindi: %s ta yozuv, %s ta yangi", path, len(rows), added)
+    return added
@@ -0,0 +1,151 @@
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from .dedup import TTLSet
+from .ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+USER, CHAT, HEAVY, CALLBACK = "user", "chat", "heavy", "callback"
+
+# {sinf: (soniyasiga token, sig'im)}
+DEFAULT_LIMITS = {
+    USER: (1.0, 20),      # bitta foydalanuvchining barcha xabarlari (variantlarni ketma-ket yuborish sig'adi)
+    CHAT: (3.0, 30),      # bitta guruhdagi barcha xabarlar
+    HEAVY: (0.2, 3),      # reyting/statistika buyruqlari: foydalanuvchi × chat
+    CALLBACK: (2.0, 10),  # tugma bosishlar (sahifalash va h.k.)
+}
+
+# SQL va get_chat chaqiruvlariga olib keladigan buyruqlar
+HEAVY_COMMANDS = frozenset({"rating", "reyting", "top", "quizstats", "history", "mystats", "search"})
+HEAVY_TEXTS = frozenset({"📊 Reyting"})
+
+# Faqat shu turlar cheklanadi; poll_answer (javoblar hisobi) va a'zolik update lari
+# bucket ochmaydi ham — spam ularning yo'lini sekinlashtirmaydi
+THROTTLED = frozenset({"message", "callback_query"})
+
+NOTICE = "⏳ Juda tez! Birozdan keyin qayta urinib ko‘ring."
+
+
+def command_name(text: str):
+    """"/Rating@bot 5" -> "rating"; buyruq bo'lmasa None."""
+    if not text or text[0] != "/":
+        return None
+    parts = text[1:].split(maxsplit=1)
+    return parts[0].split("@", 1)[0].lower() if parts else None
+
+
+def classify(message) -> str:
+    if message.text in HEAVY_TEXTS or command_name(message.text) in HEAVY_COMMANDS:
+        return HEAVY
+    return USER
+
+
+class BucketMap:
+    """Kalit -> TokenBucket, hajmi `max_size` bilan cheklangan (LRU).
+
+    Eng uzoq ishlatilmagan bucket chiqarib yuboriladi — bunday foydalanuvchi
+    keyingi safar to'la bucket bilan boshlaydi, ya'ni faqat yumshoqroq bo'ladi.
+    """
+
+    __slots__ = ("max_size", "_buckets")
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def get(self, key, rate: float, capacity: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, capacity)
+            if len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Foydalanuvchi, guruh va buyruq sinfi bo'yicha token bucket cheklovi.
+
+    Dispatcher ga outer middleware sifatida (DedupMiddleware dan keyin) ulanadi:
+    ``dp.update.outer_middleware(ThrottlingMiddleware())``.
+    Update barcha tegishli bucketlarda token bo'lsagina o'tkaziladi, aks holda
+    handlerga yetmay tashlanadi; foydalanuvchiga `notice_cooldown` soniyada ko'pi
+    bilan bir marta qisqa ogohlantirish yuboriladi (`outbound` berilsa, uning
+    navbati orqali).
+    """
+
+    def __init__(self, limits: dict = None, max_size: int = 100_000, notice_cooldown: float = 30, outbound=None):
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self._buckets = BucketMap(max_size)
+        self._noticed = TTLSet(notice_cooldown, max_size)
+        self._outbound = outbound
+        self.checked = 0
+        # {sinf: n} — qaysi cheklov tufayli tashlangani
+        self.dropped = {}
+
+    def _keys(self, event_type, event):
+        """[(bucket kaliti, sinf), ...] — shu update uchun tekshiriladigan bucketlar."""
+        user = event.from_user
+        if event_type == "callback_query":
+            return [((CALLBACK, user.id), CALLBACK)]
+        chat = event.chat
+        keys = [((USER, user.id), USER)] if user else []
+        if chat.type in ("group", "supergroup"):
+            keys.append(((CHAT, chat.id), CHAT))
+        if classify(event) == HEAVY:
+            keys.append(((HEAVY, user.id if user else None, chat.id), HEAVY))
+        return keys
+
+    def allow(self, event_type, event, now: float = None) -> str:
+        """None — o'tkaziladi (tokenlar olinadi); aks holda to'sgan cheklov sinfi."""
+        now = time.monotonic() if now is None else now
+        buckets = []
+        for key, kind in self._keys(event_type, event):
+            bucket = self._buckets.get(key, *self.limits[kind])
+            if bucket.delay(1, now):
+                return kind
+            buckets.append(bucket)
+        # Hammasida joy bor — endi tokenlarni olamiz (qisman olinib qolmasin)
+        for bucket in buckets:
+            bucket.try_acquire(1, now)
+        return None
+
+    async def _notify(self, event_type, event, kind):
+        user = event.from_user
+        if kind == CHAT and event_type != "callback_query":
+            # Guruh to'lib ketgan — har bir yozuvchiga javob yozish toshqinni kuchaytiradi
+            return
+        first = self._noticed.add(user.id) if user else False
+        try:
+            if event_type == "callback_query":
+                # Tugmadagi "soat" baribir to'xtatilishi kerak
+                await event.answer(NOTICE if first else None)
+            elif first and self._outbound is not None:
+                await self._outbound.send(event.chat.id, lambda: event.answer(NOTICE))
+            elif first:
+                await event.answer(NOTICE)
+        except Exception as e:
+            logger.debug("Cheklov ogohlantirishi yuborilmadi: %s", e)
+
+    async def __call__(self, handler, event: Update, data):
+        event_type = event.event_type
+        if event_type not in THROTTLED:
+            return await handler(event, data)
+        inner = event.event
+        self.checked += 1
+        kind = self.allow(event_type, inner)
+        if kind is None:
+            return await handler(event, data)
+        self.dropped[kind] = self.dropped.get(kind, 0) + 1
+        logger.debug("Update cheklandi (%s): %s", kind, event.update_id)
+        await self._notify(event_type, inner, kind)
+        return None
@@ -0,0 +1,89 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TimerHeap:
+    """Barcha guruhlar uchun bitta umumiy taymer (heap asosida).
+
+    Har bir kalit uchun bitta muddat (deadline, time.time() bo'yicha) saqlanadi.
+    Bitta fon vazifasi eng yaqin muddatgacha uxlaydi, shuning uchun minglab
+    taymerlar bo'sh turganda deyarli CPU sarflamaydi. Bekor qilingan yoki
+    qayta rejalashtirilgan yozuvlar heapdan "dangasa" (lazy) olib tashlanadi.
+    """
+
+    def __init__(self):
+        self._heap = []
+        # {key: seq} — kalitning amaldagi yozuvi
+        self._active = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._callback = None
+        self._running = set()
+
+    def __len__(self):
+        return len(self._active)
+
+    def __contains__(self, key):
+        return key in self._active
+
+    def start(self, callback):
+        """`callback(key)` — muddat kelganda chaqiriladigan coroutine funksiya."""
+        self._callback = callback
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def schedule(self, key, deadline: float):
+        seq = next(self._seq)
+        self._active[key] = seq
+        heapq.heappush(self._heap, (deadline, seq, key))
+        if self._heap[0][1] == seq:
+            self._wakeup.set()  # yangi eng yaqin muddat — uyg'otamiz
+
+    def cancel(self, key):
+        self._active.pop(key, None)
+
+    def _pop_stale(self):
+        heap = self._heap
+        while heap and self._active.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+
+    async def _run(self):
+        while True:
+            self._pop_stale()
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, key = heapq.heappop(self._heap)
+            del self._active[key]
+            task = asyncio.create_task(self._fire(key))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _fire(self, key):
+        try:
+            await self._callback(key)
+        except Exception as e:
+            logger.exception("Taymer callback xato (%s): %s", key, e)
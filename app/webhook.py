@@ -0,0 +1,76 @@
+import asyncio
+import logging
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """Telegramga darhol 200 qaytaradi, update larni fonda `concurrency` tagacha parallel ishlaydi."""
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, concurrency: int = 64, **kwargs):
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **kwargs)
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def _background_feed_update(self, bot: Bot, update):
+        async with self._semaphore:
+            try:
+                await super()._background_feed_update(bot, update)
+            except Exception as e:
+                logger.exception("Webhook update ishlashda xato: %s", e)
+
+    async def drain(self, timeout: float = 30):
+        tasks = list(self._background_feed_update_tasks)
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+
+def create_app(dp: Dispatcher, bot: Bot, *, path: str, secret: str = None,
+               concurrency: int = 64) -> web.Application:
+    app = web.Application()
+    handler = LimitedRequestHandler(dp, bot, concurrency=concurrency, secret_token=secret)
+
+    async def drain_updates(_app):
+        await handler.drain()
+
+    # Tartib muhim: avval fondagi update lar, keyin dp.shutdown, oxirida bot sessiyasi yopiladi
+    app.on_shutdown.append(drain_updates)
+    setup_application(app, dp, bot=bot)
+    handler.register(app, path=path)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, *, host: str, port: int, path: str,
+                      url: str = None, secret: str = None, concurrency: int = 64):
+    """aiohttp serverini ishga tushiradi.
+
+    `url` berilmasa setWebhook chaqirilmaydi — lokal sinov uchun yozib olingan
+    update JSON larini to'g'ridan-to'g'ri serverga POST qilish mumkin.
+    `url` bilan `secret` majburiy: aks holda ochiq manzilga istalgan kishi
+    soxta update yubora oladi.
+    """
+    if url and not secret:
+        raise RuntimeError("WEBHOOK_URL berilgan, lekin WEBHOOK_SECRET yo'q — webhook ro'yxatdan o'tkazilmaydi")
+    app = create_app(dp, bot, path=path, secret=secret, concurrency=concurrency)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info("🌐 Webhook server: http://%s:%s%s", host, port, path)
+
+    if url:
+        await bot.set_webhook(
+            url.rstrip("/") + path,
+            secret_token=secret,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        logger.info("setWebhook: %s%s", url.rstrip("/"), path)
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
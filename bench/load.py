@@ -0,0 +1,385 @@
+"""To'liq (end-to-end) yuklama sinovi: soxta Bot API server + haqiqiy Dispatcher.
+
+Lokal aiohttp serveri Telegram Bot API o'rnida turadi (getUpdates, sendPoll,
+sendMessage, getChat, getChatMember, ...). Bot `main.dp` va `app.handlers.router`
+bilan polling rejimida ishga tushadi, server esa update larni navbatdan beradi:
+
+1. N ta guruhga bot admin sifatida qo'shiladi (my_chat_member);
+2. har bir guruh egasi shaxsiy chatda K ta savollik viktorina tuzadi va tasdiqlaydi;
+3. har bir guruhda M ta foydalanuvchi har bir pollga javob beradi;
+4. egalar viktorinani tugatadi.
+
+Natija: javoblar o'tkazuvchanligi, handlerlar p50/p99 kechikishi va DB yozish tezligi.
+
+    python -m bench.load --groups 50 --users 200 --questions 5
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+TOKEN = "123456:LOADTEST"
+BOT_ID = 123456
+OWNER_BASE = 10_000_000      # guruh egalari: OWNER_BASE + g
+USER_BASE = 20_000_000       # qatnashchilar: USER_BASE + g * M + u
+GROUP_BASE = -1_000_000_000  # guruhlar: GROUP_BASE - g
+
+
+# --------------------------
+# Soxta Bot API
+# --------------------------
+
+class FakeBotAPI:
+    def __init__(self):
+        self.updates = asyncio.Queue()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._poll_ids = itertools.count(1)
+        # {chat_id: [(poll_id, options_count), ...]}
+        self.polls = defaultdict(list)
+        # {chat_id: [text, ...]}
+        self.messages = defaultdict(list)
+        self.calls = defaultdict(int)
+        self._changed = asyncio.Event()
+
+    # Update lar
+
+    def push(self, **payload):
+        payload["update_id"] = next(self._update_ids)
+        self.updates.put_nowait(payload)
+
+    async def wait_for(self, predicate, timeout: float):
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise TimeoutError("Kutilgan holatga yetilmadi")
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), min(left, 0.5))
+            except asyncio.TimeoutError:
+                pass
+
+    # HTTP
+
+    async def handle(self, request: web.Request):
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        params = dict(await request.post())
+        fn = getattr(self, "api_" + method, None)
+        result = await fn(params) if fn is not None else True
+        self._changed.set()
+        return web.json_response({"ok": True, "result": result})
+
+    def message(self, chat_id, **extra):
+        chat_id = int(chat_id)
+        chat = {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"}
+        if chat_id < 0:
+            chat["title"] = f"Guruh {chat_id}"
+        else:
+            chat["first_name"] = f"U{chat_id}"
+        return {"message_id": next(self._message_ids), "date": int(time.time()), "chat": chat, **extra}
+
+    async def api_getMe(self, params):
+        return {"id": BOT_ID, "is_bot": True, "first_name": "Load", "username": "load_test_bot"}
+
+    async def api_getUpdates(self, params):
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        batch = []
+        try:
+            batch.append(await asyncio.wait_for(self.updates.get(), timeout or 0.01))
+        except asyncio.TimeoutError:
+            return []
+        while len(batch) < limit and not self.updates.empty():
+            batch.append(self.updates.get_nowait())
+        return batch
+
+    async def api_sendMessage(self, params):
+        self.messages[int(params["chat_id"])].append(params.get("text", ""))
+        return self.message(params["chat_id"], text=params.get("text", ""))
+
+    async def api_sendPoll(self, params):
+        options = json.loads(params["options"])
+        poll_id = str(next(self._poll_ids))
+        self.polls[int(params["chat_id"])].append((poll_id, len(options)))
+        poll = {
+            "id": poll_id,
+            "question": params.get("question", ""),
+            "options": [{"text": o["text"] if isinstance(o, dict) else o, "voter_count": 0} for o in options],
+            "total_voter_count": 0,
+            "is_closed": False,
+            "is_anonymous": False,
+            "type": "quiz",
+            "allows_multiple_answers": False,
+        }
+        return self.message(params["chat_id"], poll=poll)
+
+    async def api_getChat(self, params):
+        chat_id = int(params["chat_id"])
+        return {"id": chat_id, "type": "private", "first_name": f"U{chat_id}",
+                "accent_color_id": 0, "max_reaction_count": 0}
+
+    async def api_getChatMember(self, params):
+        user_id = int(params["user_id"])
+        return {"status": "creator", "is_anonymous": False,
+                "user": {"id": user_id, "is_bot": False, "first_name": f"U{user_id}"}}
+
+
+async def start_fake_api(api: FakeBotAPI, host="127.0.0.1", port=0):
+    app = web.Application(client_max_size=16 * 1024 * 1024)
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{port}"
+
+
+# --------------------------
+# Kechikishlarni yozib olish
+# --------------------------
+
+class LatencyRecorder(BaseMiddleware):
+    """Har bir handler uchun aniq (gistogrammasiz) kechikishlar ro'yxati."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def setup(self, dp):
+        for event_name, observer in dp.observers.items():
+            if event_name not in ("update", "error"):
+                observer.middleware(self)
+
+    async def __call__(self, handler, event, data):
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.samples[data["handler"].callback.__name__].append(time.perf_counter() - started)
+
+    def count(self, name: str) -> int:
+        return len(self.samples.get(name, ()))
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+# --------------------------
+# Stsenariy
+# --------------------------
+
+def user(uid):
+    return {"id": uid, "is_bot": False, "first_name": f"U{uid}"}
+
+
+def private_chat(uid):
+    return {"id": uid, "type": "private", "first_name": f"U{uid}"}
+
+
+def group_chat(gid):
+    return {"id": gid, "type": "supergroup", "title": f"Guruh {gid}"}
+
+
+def text_message(api, uid, text):
+    api.push(message={"message_id": next(api._message_ids), "date": int(time.time()),
+                      "chat": private_chat(uid), "from": user(uid), "text": text})
+
+
+def callback(api, uid, chat, data):
+    api.push(callback_query={
+        "id": str(next(api._message_ids)), "from": user(uid), "chat_instance": "load", "data": data,
+        "message": {"message_id": next(api._message_ids), "date": int(time.time()), "chat": chat,
+                    "text": "..."},
+    })
+
+
+async def run(args):
+    import main
+    from app import db, handlers, storage
+
+    tmp = tempfile.TemporaryDirectory(prefix="cyberquiz-load-")
+    db.DB_FILE = os.path.join(tmp.name, "cyberquiz.db")
+    # Ishchi papkadagi haqiqiy connected_groups.json ga tegilmaydi (import uni qayta nomlaydi)
+    storage.FILE = Path(tmp.name) / "connected_groups.json"
+    # Viktorinalar jurnali ham vaqtinchalik — haqiqiy jurnal/snapshot tiklanmaydi va to'ldirilmaydi
+    handlers.quiz_journal.path = os.path.join(tmp.name, "quiz_journal.log")
+    handlers.quiz_journal.snapshot_path = os.path.join(tmp.name, "quiz_snapshot.json")
+    if not args.real_limits:
+        # Soxta server limit qo'ymaydi — navbatni cheklamasdan botning o'zini o'lchaymiz
+        handlers.outbound.group_rate = handlers.outbound.group_burst = 1e9
+        handlers.outbound.private_rate = handlers.outbound.private_burst = 1e9
+        handlers.outbound._global.rate = handlers.outbound._global.capacity = 1e9
+        handlers.outbound._global.tokens = 1e9
+    # Egalar savollarni kutmasdan ketma-ket yuboradi — bu spam emas, kiruvchi cheklov olinadi
+    main.throttle.limits = {kind: (1e9, 1e9) for kind in main.throttle.limits}
+
+    api = FakeBotAPI()
+    runner, base_url = await start_fake_api(api)
+    session = AiohttpSession(api=TelegramAPIServer.from_base(base_url))
+    bot = main.create_bot(TOKEN, session=session)
+    recorder = LatencyRecorder()
+    recorder.setup(main.dp)
+
+    # Har bir foydalanuvchining nechta update i ishlangani — egalar qadamma-qadam yuradi
+    handled = defaultdict(int)
+
+    class SenderCounter(BaseMiddleware):
+        async def __call__(self, handler, event, data):
+            try:
+                return await handler(event, data)
+            finally:
+                sender = data.get("event_from_user")
+                if sender is not None:
+                    handled[sender.id] += 1
+
+    main.dp.update.outer_middleware(SenderCounter())
+
+    await db.init_db()
+    polling = asyncio.create_task(main.dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+
+    N, M, K = args.groups, args.users, args.questions
+    groups = [GROUP_BASE - g for g in range(N)]
+    owners = [OWNER_BASE + g for g in range(N)]
+    timings = {}
+
+    # 1) Bot guruhlarga admin qilinadi
+    started = time.perf_counter()
+    for gid, owner in zip(groups, owners):
+        api.push(my_chat_member={
+            "chat": group_chat(gid), "from": user(owner), "date": int(time.time()),
+            "old_chat_member": {"status": "left", "user": user(BOT_ID) | {"is_bot": True}},
+            "new_chat_member": {"status": "member", "user": user(BOT_ID) | {"is_bot": True}},
+        })
+    await api.wait_for(lambda: recorder.count("on_bot_my_chat_member") >= N, args.timeout)
+
+    # 2) Viktorina tuziladi va tasdiqlanadi (har bir ega o'z navbatida, egalar parallel)
+    async def create(g, owner):
+        step = handled[owner]
+
+        async def send(fn, *a):
+            nonlocal step
+            step += 1
+            fn(api, *a)
+            await api.wait_for(lambda: handled[owner] >= step, args.timeout)
+
+        await send(text_message, owner, "📋 Yangi viktorina")
+        await send(callback, owner, private_chat(owner), f"quiz_size:{K}")
+        for k in range(K):
+            await send(text_message, owner, f"Savol {g}-{k}: 2 + {k} = ?")
+            for opt in range(args.options):
+                await send(text_message, owner, f"{2 + k + opt}")
+            await send(text_message, owner, "/done")
+            await send(text_message, owner, "0")
+        await send(callback, owner, private_chat(owner), "quiz:confirm")
+
+    await asyncio.gather(*(create(g, owner) for g, owner in enumerate(owners)))
+    await api.wait_for(lambda: all(len(api.polls[gid]) >= K for gid in groups), args.timeout)
+    timings["setup"] = time.perf_counter() - started
+
+    # 3) Javoblar
+    answers = N * M * K
+    started = time.perf_counter()
+    for g, gid in enumerate(groups):
+        for poll_id, n_options in api.polls[gid][:K]:
+            for u in range(M):
+                uid = USER_BASE + g * M + u
+                api.push(poll_answer={"poll_id": poll_id, "user": user(uid),
+                                      "option_ids": [(uid + int(poll_id)) % n_options]})
+    await api.wait_for(lambda: recorder.count("handle_poll_answer") >= answers, args.timeout)
+    timings["answers"] = time.perf_counter() - started
+
+    # Hali yozilmagan javoblarni DB ga yozamiz — yozish tezligi shu oraliqda o'lchanadi
+    flush_started = time.perf_counter()
+    await handlers.result_writer.flush()
+    timings["answers_persisted"] = timings["answers"] + time.perf_counter() - flush_started
+
+    # 4) Egalar viktorinani tugatadi
+    started = time.perf_counter()
+    for gid, owner in zip(groups, owners):
+        callback(api, owner, group_chat(gid), "quiz:end")
+    await api.wait_for(lambda: recorder.count("end_quiz") >= N, args.timeout)
+    timings["end"] = time.perf_counter() - started
+
+    await main.dp.stop_polling()
+    await polling
+    await runner.cleanup()
+
+    conn = sqlite3.connect(db.DB_FILE)
+    rows_written, result_rows = conn.execute(
+        "SELECT COALESCE(SUM(total_answers), 0), COUNT(*) FROM quiz_results").fetchone()
+    conn.close()
+    tmp.cleanup()
+
+    from app.metrics import metrics, DB_SECONDS
+    db_calls = metrics.histograms(DB_SECONDS)
+    write_batches = db_calls["add_results"].count if "add_results" in db_calls else 0
+
+    report = {
+        "groups": N, "users_per_group": M, "questions": K,
+        "answers": answers,
+        "answers_per_sec": round(answers / timings["answers"], 1),
+        "db_answers_written": rows_written,
+        "db_result_rows": result_rows,
+        "db_write_batches": write_batches,
+        "db_answers_per_sec": round(rows_written / timings["answers_persisted"], 1),
+        "timings_sec": {k: round(v, 3) for k, v in timings.items()},
+        "handlers": {
+            name: {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+            }
+            for name, values in sorted(recorder.samples.items())
+        },
+        "api_calls": dict(sorted(api.calls.items())),
+    }
+    return report
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="CyberQuizBot uchun end-to-end yuklama sinovi")
+    p.add_argument("--groups", type=int, default=20, help="guruhlar soni (N)")
+    p.add_argument("--users", type=int, default=100, help="har bir guruhdagi qatnashchilar (M)")
+    p.add_argument("--questions", type=int, default=5, help="viktorinadagi savollar (K)")
+    p.add_argument("--options", type=int, default=4, help="har bir savoldagi variantlar")
+    p.add_argument("--timeout", type=float, default=300, help="har bir bosqich uchun kutish (soniya)")
+    p.add_argument("--real-limits", action="store_true",
+                   help="outbound limitlarini o'chirmaslik (Telegram limitlari bilan o'lchash)")
+    p.add_argument("--json", metavar="FILE", help="hisobotni JSON faylga ham yozish")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.json:
+        Path(args.json).write_text(text + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""app/db.py va QuizManager uchun oflayn mikro-benchmarklar.
+
+Har bir benchmark vaqtinchalik papkada o'zining sintetik `cyberquiz.db` sini
+yaratadi. Natijalar — bitta amal uchun soniya (kamroq — yaxshiroq). Ular
+`bench/baseline.json` bilan solishtiriladi: biror qiymat bazaviydan
+`tolerance` ulushdan ko'proq sekinlashsa, skript 1 kodi bilan chiqadi.
+Boshlashdan oldin bench/query_plans.py issiq so'rovlarning EXPLAIN QUERY PLAN
+rejalarini tekshiradi.
+
+    python -m bench.micro                     # to'liq to'plam, baseline bilan solishtirish
+    python -m bench.micro --quick             # 10^6 qatorli holatlarsiz
+    python -m bench.micro --update-baseline   # joriy natijalarni baseline qilib yozish
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import db  # noqa: E402
+from app.quiz_manager import QuizManager  # noqa: E402
+from bench import query_plans  # noqa: E402
+
+BASELINE_FILE = Path(__file__).with_name("baseline.json")
+DEFAULT_TOLERANCE = 0.5
+
+QUIZ_ID = 1_700_000_000
+GROUP_ID = -1_000_000_001
+
+
+async def fresh_db(tmpdir: str, name: str, populate=None):
+    """Yangi DB fayl: sxema init_db orqali, ma'lumotlar to'g'ridan-to'g'ri sqlite3 bilan."""
+    await db.close_db()
+    db.DB_FILE = os.path.join(tmpdir, f"{name}.db")
+    await db.init_db()
+    if populate is not None:
+        conn = sqlite3.connect(db.DB_FILE)
+        with conn:
+            populate(conn)
+        conn.close()
+
+
+def median_time(fn_async, repeat: int):
+    async def run():
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await fn_async()
+            samples.append(time.perf_counter() - started)
+        return statistics.median(samples)
+    return run()
+
+
+# --------------------------
+# Benchmarklar
+# --------------------------
+
+async def bench_add_result(tmpdir, quick):
+    results = {}
+    per_writer = 100 if quick else 250
+    for writers in (1, 16):
+        await fresh_db(tmpdir, f"add_result_{writers}")
+
+        async def writer(w):
+            for i in range(per_writer):
+                await db.add_result(QUIZ_ID, w * per_writer + i, GROUP_ID, i % 2 == 0)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(writer(w) for w in range(writers)))
+        elapsed = time.perf_counter() - started
+        results[f"add_result/writers={writers}"] = elapsed / (writers * per_writer)
+    return results
+
+
+async def bench_get_leaderboard(tmpdir, quick):
+    results = {}
+    sizes = (10**3, 10**4, 10**5) if quick else (10**3, 10**4, 10**5, 10**6)
+    rnd = random.Random(1)
+    for rows in sizes:
+        def populate(conn, rows=rows):
+            conn.executemany(
+                "INSERT INTO quiz_results (quiz_id, user_id, group_id, correct_answers, total_answers) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((QUIZ_ID, uid, GROUP_ID, rnd.randint(0, 50), 50) for uid in range(rows)),
+            )
+
+        await fresh_db(tmpdir, f"leaderboard_{rows}", populate)
+        await db.get_leaderboard(QUIZ_ID, GROUP_ID, 10)  # ulanish va kesh isitiladi
+        results[f"get_leaderboard/rows={rows}"] = await median_time(
+            lambda: db.get_leaderboard(QUIZ_ID, GROUP_ID, 10), 50)
+    return results
+
+
+async def bench_get_groups(tmpdir, quick):
+    results = {}
+    background_users = 20_000 if quick else 100_000
+    for groups in (10, 1000):
+        def populate(conn, groups=groups):
+            # Fon: ko'p foydalanuvchi, har biri 3 ta guruhda
+            conn.executemany(
+                "INSERT INTO user_groups (user_id, group_id, group_title) VALUES (?, ?, ?)",
+                ((uid, GROUP_ID - uid % 5000 - k, None) for uid in range(1, background_users) for k in range(3)),
+            )
+            conn.executemany(
+                "INSERT INTO user_groups (user_id, group_id, group_title) VALUES (?, ?, ?)",
+                ((0, GROUP_ID - g, f"Guruh {g}") for g in range(groups)),
+            )
+
+        await fresh_db(tmpdir, f"groups_{groups}", populate)
+        await db.get_groups(0)
+        results[f"get_groups/groups={groups}"] = await median_time(lambda: db.get_groups(0), 50)
+
+    # remove_group guruh bo'yicha o'chiradi — idx_user_groups_group bo'lmasa to'liq skaner.
+    # Kalitda hajm yo'q: --quick (kamroq fon qatori) ham shu baseline bilan solishtiriladi
+    victims = iter(range(100))
+    results["remove_group"] = await median_time(
+        lambda: db.remove_group(GROUP_ID - next(victims)), 50)
+    return results
+
+
+async def bench_find_poll(tmpdir, quick):
+    results = {}
+    rnd = random.Random(2)
+    for polls in ((10**4, 10**5) if quick else (10**4, 10**5, 10**6)):
+        manager = QuizManager()
+        per_quiz = 50
+        for g in range(polls // per_quiz):
+            group_id = GROUP_ID - g
+            manager.start_quiz(g, group_id, per_quiz, QUIZ_ID + g)
+            for i in range(per_quiz):
+                manager.add_question(group_id, "q", ("a", "b"), 0)
+                manager.set_poll_id(group_id, i, f"{g}:{i}")
+        lookups = [f"{rnd.randrange(polls // per_quiz)}:{rnd.randrange(per_quiz)}" for _ in range(100_000)]
+        find = manager.find_poll
+        started = time.perf_counter()
+        for poll_id in lookups:
+            find(poll_id)
+        results[f"find_poll/polls={polls}"] = (time.perf_counter() - started) / len(lookups)
+    return results
+
+
+BENCHMARKS = (bench_add_result, bench_get_leaderboard, bench_get_groups, bench_find_poll)
+
+
+async def run_all(quick: bool, only=None):
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="cyberquiz-bench-") as tmpdir:
+        try:
+            for bench in BENCHMARKS:
+                if only and not any(name in bench.__name__ for name in only):
+                    continue
+                started = time.perf_counter()
+                results.update(await bench(tmpdir, quick))
+                logging.info("%s: %.1fs", bench.__name__, time.perf_counter() - started)
+        finally:
+            await db.close_db()
+    return results
+
+
+# --------------------------
+# Baseline bilan solishtirish
+# --------------------------
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """[(name, joriy, bazaviy, nisbat), ...] — faqat sekinlashganlar."""
+    regressions = []
+    for name, value in sorted(results.items()):
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = value / base
+        if ratio > 1 + tolerance:
+            regressions.append((name, value, base, ratio))
+    return regressions
+
+
+def write_baseline(results: dict, tolerance: float, path: Path = BASELINE_FILE):
+    data = {
+        "unit": "seconds per operation (lower is better)",
+        "tolerance": tolerance,
+        "results": {name: float(f"{value:.3g}") for name, value in sorted(results.items())},
+    }
+    path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="app/db.py va QuizManager mikro-benchmarklari")
+    p.add_argument("--quick", action="store_true", help="katta (10^6) holatlarni o'tkazib yuborish")
+    p.add_argument("--only", nargs="*", help="faqat nomida shu so'z bor benchmarklar (masalan: leaderboard)")
+    p.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    p.add_argument("--tolerance", type=float, help="ruxsat etilgan sekinlashish ulushi (standart: baseline dagi)")
+    p.add_argument("--update-baseline", action="store_true", help="natijalarni baseline faylga yozish")
+    p.add_argument("--output", type=Path, help="natijalarni JSON faylga ham yozish")
+    args = p.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("app.db").setLevel(logging.WARNING)
+
+    # Avval so'rov rejalari: indeks yo'qolsa vaqtlarni o'lchashdan oldin yiqilamiz
+    problems = query_plans.check_fresh_db()
+    if problems:
+        print("❌ So'rov rejalari indekslardan foydalanmayapti:", file=sys.stderr)
+        for problem in problems:
+            print("  " + problem, file=sys.stderr)
+        return 1
+
+    results = asyncio.run(run_all(args.quick, args.only))
+    report = {name: float(f"{value:.3g}") for name, value in sorted(results.items())}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+    if args.update_baseline:
+        write_baseline(results, args.tolerance or DEFAULT_TOLERANCE, args.baseline)
+        print(f"Baseline yangilandi: {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"Baseline topilmadi ({args.baseline}); --update-baseline bilan yarating.")
+        return 0
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    tolerance = args.tolerance if args.tolerance is not None else baseline.get("tolerance", DEFAULT_TOLERANCE)
+    regressions = compare(results, baseline["results"], tolerance)
+    if regressions:
+        print(f"\n❌ REGRESSIYA (ruxsat: +{tolerance:.0%}):", file=sys.stderr)
+        for name, value, base, ratio in regressions:
+            print(f"  {name}: {value:.3g}s  (baseline {base:.3g}s, x{ratio:.2f})", file=sys.stderr)
+        return 1
+    print(f"\n✅ Regressiya yo‘q (ruxsat: +{tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Issiq so'rovlar kerakli indekslardan foydalanishini EXPLAIN QUERY PLAN bilan tekshiradi.
+
+Migratsiyalar vaqtinchalik bazaga qo'llanadi, so'ng har bir so'rovning rejasi
+kutilgan indeks bilan solishtiriladi. Biror so'rov to'liq skanerga (SCAN) yoki
+kutilmagan saralashga o'tsa, skript 1 kodi bilan chiqadi. Xuddi shu tekshiruvlar
+tests/test_query_plans.py da pytest orqali ham ishlaydi.
+
+    python -m bench.query_plans
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import db  # noqa: E402
+
+# (nom, SQL, parametrlar, kutilgan indeks(lar), vaqtinchalik B-tree (saralash) ruxsat etiladimi)
+HOT_QUERIES = [
+    ("get_leaderboard", db.SQL_GET_LEADERBOARD, (1, -1, 10), "idx_quiz_results_board", False),
+    ("get_rank", db.SQL_GET_RANK, (1, -1, 5, 5, 10), "idx_quiz_results_board", False),
+    ("get_quiz_groups", db.SQL_GET_QUIZ_GROUPS, (1,), "idx_quiz_results_board", False),
+    # user_id bo'yicha guruhlash UNIQUE (quiz_id, user_id, group_id) tartibida ham arzon
+    ("get_combined_leaderboard", db.SQL_GET_COMBINED_LEADERBOARD, (1, 10, 0),
+     ("idx_quiz_results_board", "sqlite_autoindex_quiz_results_1"), True),
+    ("get_groups", db.SQL_GET_GROUPS, (1,), "sqlite_autoindex_user_groups_1", False),
+    ("remove_group", db.SQL_REMOVE_GROUP, (-1,), "idx_user_groups_group", False),
+    ("set_group_title", db.SQL_SET_GROUP_TITLE, ("t", -1), "idx_user_groups_group", False),
+    ("get_user_stats", db.SQL_GET_USER_STATS, (1,), "sqlite_autoindex_user_group_stats_1", False),
+    ("get_group_stats", db.SQL_GET_GROUP_STATS, (-1, 10, 0), "idx_user_group_stats_board", False),
+    ("fsm_purge", db.SQL_FSM_PURGE, (0.0,), "idx_fsm_states_updated", False),
+    ("get_last_stats_quiz", db.SQL_GET_LAST_STATS_QUIZ, (-1,), "idx_question_stats_group", False),
+    ("group_history", db.SQL_GROUP_HISTORY_BEFORE, (-1, 100, 11), "idx_quiz_runs_group", False),
+    ("group_history_after", db.SQL_GROUP_HISTORY_AFTER, (-1, 100, 11), "idx_quiz_runs_group", False),
+    ("owner_history", db.SQL_OWNER_HISTORY_BEFORE, (1, 100, 11), "idx_quizzes_owner", False),
+    ("owner_history_after", db.SQL_OWNER_HISTORY_AFTER, (1, 100, 11), "idx_quizzes_owner", False),
+    ("count_players", db.SQL_COUNT_PLAYERS, (1, -1), "idx_quiz_results_board", False),
+]
+
+
+def explain(conn, sql, params) -> list[str]:
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def check_query(conn, name, sql, params, indexes, temp_sort_ok):
+    """Bitta so'rov rejasidagi muammo (matn) yoki None."""
+    if isinstance(indexes, str):
+        indexes = (indexes,)
+    plan = explain(conn, sql, params)
+    text = " | ".join(plan)
+    if not any(index in step for step in plan for index in indexes):
+        return f"{name}: {' / '.join(indexes)} ishlatilmadi ({text})"
+    if any(step.startswith("SCAN") and "USING" not in step for step in plan):
+        return f"{name}: to'liq skaner ({text})"
+    if not temp_sort_ok and any("TEMP B-TREE" in step for step in plan):
+        return f"{name}: vaqtinchalik saralash ({text})"
+    return None
+
+
+def check(conn) -> list[str]:
+    """Muammolar ro'yxatini qaytaradi (bo'sh ro'yxat — hammasi joyida)."""
+    return [problem for problem in (check_query(conn, *query) for query in HOT_QUERIES) if problem]
+
+
+def check_fresh_db() -> list[str]:
+    """Vaqtinchalik bazaga migratsiyalarni qo'llab, rejalarni tekshiradi."""
+    with tempfile.TemporaryDirectory(prefix="cyberquiz-plans-") as tmpdir:
+        previous, db.DB_FILE = db.DB_FILE, os.path.join(tmpdir, "cyberquiz.db")
+
+        async def init():
+            await db.init_db()
+            await db.close_db()
+
+        try:
+            asyncio.run(init())
+            conn = sqlite3.connect(db.DB_FILE)
+            try:
+                return check(conn)
+            finally:
+                conn.close()
+        finally:
+            db.DB_FILE = previous
+
+
+def main():
+    problems = check_fresh_db()
+    if problems:
+        print("❌ So'rov rejalari indekslardan foydalanmayapti:", file=sys.stderr)
+        for problem in problems:
+            print("  " + problem, file=sys.stderr)
+        return 1
+    print(f"✅ {len(HOT_QUERIES)} ta so'rov kerakli indekslardan foydalanadi")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
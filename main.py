@@ -3,30 +3,126 @@ import logging
 import os
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
-from aiogram.fsm.storage.memory import MemoryStorage
 from dotenv import load_dotenv
 from app.handlers import set_bot_commands
 
-from app.handlers import router
-from app.db import init_db
+from app.handlers import (
+    router, result_writer, membership, outbound, timers, restore_timers, quiz_manager, analytics,
+    quiz_journal, restore_quizzes, leaderboard_pages
+)
+from app.db import init_db, close_db
+from app.dedup import DedupMiddleware
+from app.throttle import ThrottlingMiddleware
+from app import metrics
+from app.fsm_storage import SQLiteStorage
+from app import storage as legacy_groups
+from app.webhook import run_webhook
 
 load_dotenv()
 TOKEN = os.getenv("BOT_TOKEN")
 
+# Ishlash rejimi: "polling" (standart) yoki "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")          # ochiq manzil; bo'sh bo'lsa setWebhook chaqirilmaydi
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")    # X-Telegram-Bot-Api-Secret-Token; WEBHOOK_URL bilan majburiy
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "64"))
+
+# Prometheus metrikalari: http://METRICS_HOST:METRICS_PORT/metrics (0 — o'chirilgan)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
 logging.basicConfig(level=logging.INFO)
 
-# ✅ Default parse_mode ishlatamiz
-bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
-dp = Dispatcher(storage=MemoryStorage())
+# FSM holatlari bot bazasida saqlanadi — restartda yo'qolmaydi
+storage = SQLiteStorage()
+dp = Dispatcher(storage=storage)
+# Telegram qayta yuborgan update lar handlerlarga ikki marta yetib bormaydi
+dedup = DedupMiddleware()
+dp.update.outer_middleware(dedup)
+# Spam (ketma-ket xabarlar, /rating toshqini) handlerlarga yetmay tashlanadi
+throttle = ThrottlingMiddleware(outbound=outbound)
+dp.update.outer_middleware(throttle)
+metrics.HandlerMetricsMiddleware().setup(dp)
 dp.include_router(router)
 
+# Holat ko'rsatkichlari /metrics va /stats da ko'rinadi
+metrics.metrics.gauge("cyberquiz_active_quizzes", lambda: len(quiz_manager.active_quizzes), "Faol viktorinalar")
+metrics.metrics.gauge("cyberquiz_journal_records", lambda: quiz_journal.records, "Oxirgi snapshotdan keyingi jurnal yozuvlari")
+metrics.metrics.counter_fn("cyberquiz_leaderboard_page_hits_total", lambda: leaderboard_pages.hits, "Keshdan berilgan reyting sahifalari")
+metrics.metrics.counter_fn("cyberquiz_leaderboard_page_misses_total", lambda: leaderboard_pages.misses, "Qayta hisoblangan reyting sahifalari")
+metrics.metrics.gauge("cyberquiz_fsm_sessions", lambda: storage.sessions, "Xotiradagi FSM sessiyalari")
+metrics.metrics.gauge("cyberquiz_outbound_queue_depth", lambda: outbound.queue_depth, "Yuborilishini kutayotgan so'rovlar")
+metrics.metrics.counter_fn("cyberquiz_outbound_retry_after_total", lambda: outbound.retry_after_hits, "TelegramRetryAfter soni")
+metrics.metrics.gauge("cyberquiz_pending_results", lambda: result_writer.pending_rows, "DB ga yozilmagan javoblar")
+metrics.metrics.counter_fn("cyberquiz_duplicate_updates_total", lambda: sum(dedup.hits.values()), "Ushlangan takroriy update lar")
+metrics.metrics.counter_fn("cyberquiz_throttled_total", lambda: sum(throttle.dropped.values()), "Cheklov tufayli tashlangan update lar")
+metrics_runner = None
 
-async def main():
-    init_db()
-    logging.info("🤖 Bot ishga tushyapti...")
-    await dp.start_polling(bot)
 
-    await set_bot_commands(bot) 
+async def on_startup(bot: Bot):
+    global metrics_runner
+    if METRICS_PORT and metrics_runner is None:
+        metrics_runner = await metrics.start_server(METRICS_HOST, METRICS_PORT)
+    result_writer.start()
+    analytics.start()
+    # Jarayondagi viktorinalar (poll_id lar bilan) jurnaldan tiklanadi — javoblar yo'qolmaydi
+    await restore_quizzes()
+    # Eski connected_groups.json (bo'lsa) bir marta user_groups ga ko'chiriladi
+    await legacy_groups.import_json()
+    # Guruhlar va bot ma'lumotlarini bir marta yuklab olamiz
+    await membership.load(bot)
+    await set_bot_commands(bot)
+    # Vaqtli viktorinalar taymerlari saqlangan muddatlardan tiklanadi
+    await restore_timers(bot)
+
+
+async def on_shutdown():
+    # Navbatdagi xabarlarni yuborib, xotirada qolgan natijalarni DB ga yozib chiqamiz
+    await timers.close()
+    await outbound.drain()
+    await quiz_journal.close()
+    await result_writer.close()
+    await analytics.close()
+    await storage.close()
+    await close_db()
+    if metrics_runner is not None:
+        await metrics_runner.cleanup()
+    logging.info("Takroriy update lar: %s (jami %s)", dedup.hits, dedup.seen)
+    logging.info("Cheklangan update lar: %s (tekshirilgan %s)", throttle.dropped, throttle.checked)
+
+
+dp.startup.register(on_startup)
+dp.shutdown.register(on_shutdown)
+
+
+def create_bot(token: str = None, **kwargs) -> Bot:
+    """Bot obyektini yaratadi. Modul tokensiz ham import qilinadi (masalan, bench/ uchun)."""
+    # ✅ Default parse_mode ishlatamiz
+    bot = Bot(token=token or TOKEN, default=DefaultBotProperties(parse_mode="HTML"), **kwargs)
+    bot.session.middleware(metrics.BotApiMetricsMiddleware())
+    return bot
+
+
+async def main():
+    bot = create_bot()
+    await init_db()
+    logging.info("🤖 Bot ishga tushyapti (%s)...", BOT_MODE)
+    if BOT_MODE == "webhook":
+        await run_webhook(
+            dp, bot,
+            host=WEBHOOK_HOST,
+            port=WEBHOOK_PORT,
+            path=WEBHOOK_PATH,
+            url=WEBHOOK_URL,
+            secret=WEBHOOK_SECRET,
+            concurrency=WEBHOOK_CONCURRENCY,
+        )
+    else:
+        await bot.delete_webhook()
+        await dp.start_polling(bot)
 
 if __name__ == "__main__":
     asyncio.run(main())
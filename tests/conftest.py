@@ -0,0 +1,36 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import db  # noqa: E402
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    """Har bir test uchun alohida (hali yaratilmagan) baza fayli."""
+    path = tmp_path / "cyberquiz.db"
+    monkeypatch.setattr(db, "DB_FILE", str(path))
+    yield path
+    # Test o'rtasida yiqilsa ham ishchi oqimlar va ulanishlar yopiladi
+    asyncio.run(db.close_db())
+
+
+@pytest.fixture
+def run_db(db_file):
+    """Korutinani yangi bazada bajaradi: init_db -> coro -> close_db (bitta event loop da)."""
+
+    def run(coro_fn):
+        async def scenario():
+            await db.init_db()
+            try:
+                return await coro_fn()
+            finally:
+                await db.close_db()
+
+        return asyncio.run(scenario())
+
+    return run
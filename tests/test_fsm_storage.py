@@ -0,0 +1,99 @@
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+
+from app import db
+from app.fsm_storage import SQLiteStorage
+
+BOT_ID = 42
+
+
+def key(user_id, chat_id=None):
+    return StorageKey(bot_id=BOT_ID, chat_id=chat_id or user_id, user_id=user_id)
+
+
+def count_fsm_get(monkeypatch):
+    calls = []
+    fsm_get = db.fsm_get
+
+    async def counted(k):
+        calls.append(k)
+        return await fsm_get(k)
+
+    monkeypatch.setattr(db, "fsm_get", counted)
+    return calls
+
+
+def test_state_survives_restart(run_db):
+    async def scenario():
+        storage = SQLiteStorage(flush_interval=3600)
+        await storage.set_state(key(1), "Quiz:waiting")
+        await storage.update_data(key(1), {"a": 1})
+        await storage.update_data(key(1), {"b": [2]})
+        await storage.close()  # fon vazifani to'xtatadi va flush qiladi
+
+        fresh = SQLiteStorage()
+        data = await fresh.get_data(key(1))
+        data["b"].append(3)  # qaytgan nusxa keshdagi yozuvni o'zgartirmaydi
+        return await fresh.get_state(key(1)), await fresh.get_data(key(1))
+
+    assert run_db(scenario) == ("Quiz:waiting", {"a": 1, "b": [2]})
+
+
+def test_unknown_key_is_not_read_nor_cached(run_db, monkeypatch):
+    calls = count_fsm_get(monkeypatch)
+
+    async def scenario():
+        await db.fsm_write([(SQLiteStorage().key_builder.build(key(1)), "S", "{}", time.time())])
+        storage = SQLiteStorage()
+        for user_id in range(2, 12):
+            assert await storage.get_state(key(user_id)) is None
+            assert await storage.get_data(key(user_id)) == {}
+        assert await storage.get_state(key(1)) == "S"
+        return storage
+
+    storage = run_db(scenario)
+    assert len(calls) == 1  # faqat bazada qatori bor kalit o'qiladi
+    assert len(storage._cache) == 1 and storage.sessions == 1
+
+
+def test_clear_deletes_row_and_stored_key(run_db, monkeypatch):
+    calls = count_fsm_get(monkeypatch)
+
+    async def scenario():
+        storage = SQLiteStorage(flush_interval=3600)
+        k = storage.key_builder.build(key(1))
+        await storage.set_state(key(1), "S")
+        await storage.set_data(key(1), {"x": 1})
+        await storage.get_state(key(2))  # _stored ni yuklaydi
+        await storage.flush()
+        assert k in storage._stored
+        assert await db.fsm_get(k) is not None
+
+        await storage.set_state(key(1), None)
+        await storage.set_data(key(1), {})
+        await storage.close()
+        assert k not in storage._stored
+        row = await db.fsm_get(k)
+
+        before = len(calls)
+        fresh = SQLiteStorage()
+        state = await fresh.get_state(key(1))
+        # Yangi storage o'chirilgan kalit uchun bazaga bormaydi
+        assert len(calls) == before
+        return row, state
+
+    assert run_db(scenario) == (None, None)
+
+
+def test_expired_state_is_dropped(run_db):
+    async def scenario():
+        stale = time.time() - 100
+        k = SQLiteStorage().key_builder.build(key(1))
+        await db.fsm_write([(k, "Old", '{"a": 1}', stale)])
+        storage = SQLiteStorage(ttl=10)
+        state = await storage.get_state(key(1))
+        removed = await db.fsm_purge(time.time() - storage.ttl)
+        return state, removed
+
+    assert run_db(scenario) == (None, 1)
@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+from app import importer
+
+
+def load(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    return importer.load_questions(path, name)
+
+
+def summary(questions):
+    return [(q.question, q.options, q.correct_index) for q in questions]
+
+
+def test_csv_with_header_and_bad_rows(tmp_path):
+    questions, issues = load(tmp_path, "quiz.csv", (
+        "question,a,b,c,correct\n"
+        "2+2?,3,4,5,1\n"
+        "\n"
+        "faqat savol\n"
+        "Poytaxt?,Toshkent,Samarqand,7\n"
+        '"Vergul, ichida",ha,yo\'q,0\n'
+    ))
+    assert summary(questions) == [
+        ("2+2?", ["3", "4", "5"], 1),
+        ("Vergul, ichida", ["ha", "yo'q"], 0),
+    ]
+    assert [str(issue) for issue in issues] == [
+        "4-qator: ustunlar yetarli emas",
+        "5-qator: to‘g‘ri javob raqami noto‘g‘ri",
+    ]
+
+
+def test_jsonl_reports_broken_lines(tmp_path):
+    questions, issues = load(tmp_path, "quiz.jsonl", "\n".join([
+        json.dumps({"question": "Q1", "options": ["a", "b"], "correct": 0}),
+        "{buzilgan",
+        json.dumps(["ro'yxat"]),
+        json.dumps({"question": "Q2", "options": "a,b", "correct": 0}),
+        json.dumps({"question": "", "options": ["a"], "correct": 3}),
+    ]))
+    assert summary(questions) == [("Q1", ["a", "b"], 0)]
+    where = [issue.where for issue in issues]
+    assert where == ["2-qator", "3-qator", "4-qator", "5-qator"]
+    assert "JSON xato" in issues[0].message
+    assert "savol matni bo‘sh" in issues[3].message and "variantlar soni" in issues[3].message
+
+
+@pytest.mark.parametrize("chunk", [7, 64 * 1024])
+def test_json_array_streams_across_chunks(tmp_path, monkeypatch, chunk):
+    monkeypatch.setattr(importer, "JSON_CHUNK_SIZE", chunk)
+    items = [{"question": f"Savol {i} — ünïcode", "options": ["x", "y", "z"], "correct": i % 3} for i in range(50)]
+    questions, issues = load(tmp_path, "quiz.json", json.dumps(items, ensure_ascii=False, indent=1))
+    assert issues == []
+    assert summary(questions) == [(item["question"], item["options"], item["correct"]) for item in items]
+
+
+def test_json_array_unclosed_and_broken(tmp_path):
+    _, issues = load(tmp_path, "open.json", '[{"question": "Q", "options": ["a", "b"], "correct": 0}')
+    assert [str(issue) for issue in issues] == ["fayl oxiri: massiv yopilmagan (']' yo‘q)"]
+
+    questions, issues = load(tmp_path, "bad.json", '[{"question": "Q", "options": ["a", "b"], "correct": 0}, {oops}]')
+    assert len(questions) == 1
+    assert issues[0].where == "2-element" and "JSON xato" in issues[0].message
+
+
+def test_json_file_with_json_lines_content(tmp_path):
+    questions, issues = load(tmp_path, "lines.json", json.dumps({"question": "Q", "options": ["a", "b"], "correct": 1}))
+    assert summary(questions) == [("Q", ["a", "b"], 1)] and issues == []
+
+
+def test_text_blocks(tmp_path):
+    questions, issues = load(tmp_path, "quiz.txt", (
+        "2+2?\n3\n*4\n5\n"
+        "\n\n"
+        "Belgisiz savol\na\nb\n"
+        "\n"
+        "Ikki javob\n*a\n*b\n"
+        "\n"
+        "Oxirgi\n*ha\nyo'q"
+    ))
+    assert summary(questions) == [("2+2?", ["3", "4", "5"], 1), ("Oxirgi", ["ha", "yo'q"], 0)]
+    assert [issue.where for issue in issues] == ["7-qator", "11-qator"]
+
+
+def test_telegram_limits_and_unsupported_format(tmp_path):
+    long_question = "q" * (importer.MAX_QUESTION_LEN + 1)
+    options = ",".join(str(i) for i in range(importer.MAX_OPTIONS + 1))
+    questions, issues = load(tmp_path, "limits.csv", f"{long_question},a,b,0\nKo'p variant,{options},0\n")
+    assert questions == []
+    assert "belgidan uzun" in issues[0].message
+    assert "variantlar soni" in issues[1].message
+
+    questions, issues = load(tmp_path, "quiz.xlsx", "")
+    assert questions == [] and "format qo‘llab-quvvatlanmaydi" in issues[0].message
+
+
+def test_non_utf8_file(tmp_path):
+    path = tmp_path / "cp1251.txt"
+    path.write_bytes("Савол\n*а\nб\n".encode("cp1251"))
+    questions, issues = importer.load_questions(path, path.name)
+    assert questions == [] and "UTF-8" in issues[-1].message
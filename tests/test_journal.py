@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import pytest
+
+from app.journal import QuizJournal
+from app.quiz_manager import QuizManager
+
+GROUP = -100
+OTHER = -200
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "quiz_journal.log"), str(tmp_path / "quiz_snapshot.json")
+
+
+def make_journal(paths):
+    path, snapshot_path = paths
+    return QuizJournal(path, snapshot_path)
+
+
+def restored(paths):
+    """Yangi jarayonni taqlid qiladi: bo'sh manager diskdagi holatdan tiklanadi."""
+    async def restore():
+        manager, journal = QuizManager(), make_journal(paths)
+        await journal.restore(manager)
+        journal._file.close()  # close() siqib qo'yadi — bu yerda "yiqilish"ni saqlaymiz
+        return manager
+    return asyncio.run(restore())
+
+
+def play(manager):
+    manager.start_quiz(1, GROUP, 2, 10)
+    manager.add_question(GROUP, "2+2?", ("3", "4"), 1)
+    manager.add_question(GROUP, "3+3?", ("6", "7"), 0)
+    manager.copy_quiz(GROUP, OTHER)
+    manager.set_poll_id(GROUP, 0, "p0")
+    manager.set_poll_id(OTHER, 1, "p1")
+    manager.set_pace(OTHER, 30, 1)
+
+
+def open_live(paths):
+    """Ishlayotgan jarayon: jurnal ulangan manager (snapshot/jurnal siqilmaydi)."""
+    async def start():
+        manager, journal = QuizManager(), make_journal(paths)
+        await journal.restore(manager)
+        return manager, journal
+    return asyncio.run(start())
+
+
+def test_replay_after_crash_restores_state_and_indexes(paths):
+    manager, journal = open_live(paths)
+    play(manager)
+    journal._file.close()  # compact/close siz — faqat jurnal qatorlari qoladi
+
+    copy = restored(paths)
+    assert copy.dump() == manager.dump()
+    quiz, question = copy.find_poll("p1")
+    assert (quiz.group_id, question.index, quiz.open_period) == (OTHER, 1, 30)
+    assert copy.get_owner_group(1) == GROUP
+    assert copy.get_groups_by_quiz_id(10) == {GROUP, OTHER}
+
+
+def test_compaction_writes_snapshot_and_truncates_journal(paths):
+    path, snapshot_path = paths
+    manager, journal = open_live(paths)
+    play(manager)
+    assert journal.records > 0
+
+    asyncio.run(journal.compact())
+    assert journal.records == 0
+    with open(snapshot_path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert snapshot["seq"] == journal.seq
+    assert open(path, encoding="utf-8").read() == ""
+
+    # Snapshotdan keyingi o'zgarishlar jurnaldan qo'shiladi, oldingilari takrorlanmaydi
+    manager.clear_quiz(OTHER)
+    manager.set_poll_id(GROUP, 1, "p2")
+    journal._file.close()
+
+    copy = restored(paths)
+    assert copy.dump() == manager.dump()
+    assert copy.find_poll("p1") is None
+    assert copy.get_groups_by_quiz_id(10) == {GROUP}
+
+
+def test_torn_last_line_is_skipped(paths):
+    path, _ = paths
+    manager, journal = open_live(paths)
+    manager.start_quiz(1, GROUP, 1, 10)
+    journal._file.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('[99,"add",-100,"chala')  # yiqilish paytida yarim yozilgan qator
+
+    manager, journal = open_live(paths)  # tiklaydi va chala qatordan keyin yangi qatordan yozadi
+    assert manager.get_quiz_id(GROUP) == 10
+    manager.add_question(GROUP, "q", ("a", "b"), 0)
+    journal._file.close()
+
+    copy = restored(paths)
+    assert [q.question for q in copy.get_quiz(GROUP).questions] == ["q"]
+
+
+def test_load_rebuilds_indexes_from_dump():
+    manager = QuizManager()
+    play(manager)
+    copy = QuizManager()
+    copy.load(json.loads(json.dumps(manager.dump())))
+
+    assert copy.dump() == manager.dump()
+    assert copy.find_poll("p0")[0].group_id == GROUP
+    assert copy.get_groups_by_quiz_id(10) == {GROUP, OTHER}
+    copy.clear_quiz(GROUP)
+    assert copy.find_poll("p0") is None
+    assert copy.get_owner_group(1) is None
+    assert copy.get_groups_by_quiz_id(10) == {OTHER}
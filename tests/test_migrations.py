@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+from app import migrations
+from app.migrations import MIGRATIONS, current_version, migrate
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_fresh_db_applies_every_step(tmp_path):
+    conn = sqlite3.connect(tmp_path / "fresh.db")
+    assert migrate(conn) == [step for step, _, _ in MIGRATIONS]
+    assert current_version(conn) == LATEST
+    assert {"user_groups", "quiz_results", "quizzes", "user_group_stats", "questions",
+            "quiz_timers", "fsm_states", "question_stats", "quiz_runs"} <= tables(conn)
+    assert [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")] == \
+        [step for step, _, _ in MIGRATIONS]
+
+
+def test_rerun_on_migrated_db_is_noop(tmp_path):
+    path = tmp_path / "twice.db"
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.execute("INSERT INTO user_groups (user_id, group_id, group_title) VALUES (1, -10, 'G')")
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(path)
+    assert migrate(conn) == []
+    assert current_version(conn) == LATEST
+    assert conn.execute("SELECT user_id, group_id, group_title FROM user_groups").fetchall() == [(1, -10, "G")]
+
+
+def test_unversioned_legacy_db_is_upgraded(tmp_path):
+    # Versiyasiz eski baza: group_title ustunisiz user_groups va natijalar (vaqt asosidagi quiz_id)
+    conn = sqlite3.connect(tmp_path / "legacy.db")
+    conn.executescript("""
+        CREATE TABLE user_groups (user_id INTEGER NOT NULL, group_id INTEGER NOT NULL,
+                                  PRIMARY KEY (user_id, group_id));
+        CREATE TABLE quiz_results (id INTEGER PRIMARY KEY AUTOINCREMENT, quiz_id INTEGER NOT NULL,
+                                   user_id INTEGER NOT NULL, group_id INTEGER NOT NULL,
+                                   correct_answers INTEGER DEFAULT 0, total_answers INTEGER DEFAULT 0,
+                                   CONSTRAINT unique_quiz_user_group UNIQUE (quiz_id, user_id, group_id));
+        INSERT INTO user_groups VALUES (1, -10);
+        INSERT INTO quiz_results (quiz_id, user_id, group_id, correct_answers, total_answers)
+        VALUES (1700000000, 1, -10, 3, 5), (1700000001, 1, -10, 1, 5);
+    """)
+    migrate(conn)
+
+    assert "group_title" in migrations._columns(conn, "user_groups")
+    # user_group_stats mavjud natijalardan to'ldiriladi
+    assert conn.execute(
+        "SELECT correct_answers, total_answers, quizzes_played FROM user_group_stats WHERE user_id = 1"
+    ).fetchone() == (4, 10, 2)
+    # Yangi quiz_id lar eski (vaqt asosidagi) id lardan keyin davom etadi
+    conn.execute("INSERT INTO quizzes (group_id) VALUES (-10)")
+    assert conn.execute("SELECT MAX(quiz_id) FROM quizzes").fetchone()[0] == 1700000002
+
+
+def test_failed_step_is_rolled_back_and_retried(tmp_path):
+    path = tmp_path / "broken.db"
+
+    def create_then_fail(conn):
+        conn.execute("CREATE TABLE half_done (x INTEGER)")
+        raise RuntimeError("boom")
+
+    broken = MIGRATIONS[:2] + [(3, "broken", create_then_fail)]
+    conn = sqlite3.connect(path)
+    with pytest.raises(RuntimeError):
+        migrate(conn, broken)
+    assert current_version(conn) == 2
+    assert "half_done" not in tables(conn)
+
+    # Tuzatilgan qadam keyingi ishga tushishda qo'llanadi
+    assert migrate(conn) == [step for step, _, _ in MIGRATIONS[2:]]
+    assert current_version(conn) == LATEST
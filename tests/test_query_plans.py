@@ -0,0 +1,25 @@
+import sqlite3
+
+import pytest
+
+from app.migrations import migrate
+from bench import query_plans
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    conn = sqlite3.connect(tmp_path_factory.mktemp("plans") / "cyberquiz.db")
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("query", query_plans.HOT_QUERIES, ids=[q[0] for q in query_plans.HOT_QUERIES])
+def test_hot_query_uses_index(conn, query):
+    assert query_plans.check_query(conn, *query) is None
+
+
+def test_check_reports_full_scan(conn):
+    problem = query_plans.check_query(
+        conn, "no_index", "SELECT * FROM quiz_results WHERE total_answers = ?", (1,), "idx_quiz_results_board", False)
+    assert problem is not None and problem.startswith("no_index:")